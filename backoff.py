@@ -0,0 +1,175 @@
+import re
+import sys
+import time
+import random
+import threading
+from rate_limiter import sheets_limiter
+from instrumentation import recorder
+
+# HTTP statuses worth retrying: rate limited or a transient server error
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+# Raised instead of calling the API while the circuit breaker is open
+class CircuitOpenError(Exception):
+    pass
+
+# gspread is only imported by whoever builds a client, so the bot can load this
+# module without paying for it; until gspread is loaded no call can raise APIError
+def is_api_error(e):
+    gspread = sys.modules.get('gspread')
+    return gspread is not None and isinstance(e, gspread.exceptions.APIError)
+
+# HTTP status of a gspread APIError, falling back to the message for odd responses
+def error_status(e):
+    response = getattr(e, 'response', None)
+    status = getattr(response, 'status_code', None)
+    if status:
+        return status
+    if 'quota' in str(e).lower() or 'rate limit' in str(e).lower():
+        return 429
+    return None
+
+# Seconds the server asked us to wait, from Retry-After or a RetryInfo retryDelay
+def retry_after(e):
+    response = getattr(e, 'response', None)
+    headers = getattr(response, 'headers', None) or {}
+    value = headers.get('Retry-After')
+    if value:
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+    match = re.search(r'"retryDelay"\s*:\s*"([\d.]+)s"', getattr(response, 'text', '') or '')
+    if match:
+        return float(match.group(1))
+    return None
+
+# AIMD controller shared by every Sheets caller.
+# Successful calls grow the batch size and the limiter rate additively;
+# 429/5xx responses halve both. After `failure_threshold` consecutive failed
+# calls (retries used up, or a 5xx that is not worth retrying) the circuit
+# opens and further calls fail fast for `cooldown` seconds. Then a single
+# trial call goes through, without retries, while every other caller keeps
+# failing fast: its success closes the circuit, its failure re-opens it.
+class AdaptiveBackoff:
+    def __init__(self, limiter=sheets_limiter, min_batch=50, max_batch=2000, start_batch=500,
+                 batch_step=100, min_scale=0.1, scale_step=0.05, max_retries=6,
+                 max_delay=64, failure_threshold=5, cooldown=120):
+        self.limiter = limiter
+        self.min_batch = min_batch
+        self.max_batch = max_batch
+        self.batch_size = start_batch
+        self.batch_step = batch_step
+        self.min_scale = min_scale
+        self.scale = 1.0
+        self.scale_step = scale_step
+        self.max_retries = max_retries
+        self.max_delay = max_delay
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.trial_running = False
+        self.lock = threading.Lock()
+
+    # Additive increase after a successful call
+    def on_success(self):
+        with self.lock:
+            self.consecutive_failures = 0
+            self.opened_at = None
+            self.trial_running = False
+            self.batch_size = min(self.max_batch, self.batch_size + self.batch_step)
+            if self.scale < 1.0:
+                self.scale = min(1.0, self.scale + self.scale_step)
+                self.limiter.set_scale(self.scale)
+
+    # Multiplicative decrease after a throttled or failed call
+    def on_throttle(self):
+        with self.lock:
+            self.batch_size = max(self.min_batch, self.batch_size // 2)
+            self.scale = max(self.min_scale, self.scale / 2)
+            self.limiter.set_scale(self.scale)
+
+    def on_failure(self, trial=False):
+        with self.lock:
+            self.consecutive_failures += 1
+            self.trial_running = False
+            if trial:
+                self.opened_at = time.monotonic()
+                print(f"Circuit breaker trial call failed, pausing Sheets calls for {self.cooldown} seconds")
+            elif self.consecutive_failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+                print(f"Circuit breaker open after {self.consecutive_failures} failed calls, "
+                      f"pausing Sheets calls for {self.cooldown} seconds")
+
+    # True when this call is the half-open trial; raises while the circuit is
+    # open or another caller's trial is still running
+    def check_circuit(self):
+        with self.lock:
+            if self.opened_at is None:
+                return False
+            remaining = self.cooldown - (time.monotonic() - self.opened_at)
+            if remaining > 0:
+                raise CircuitOpenError(f"Sheets circuit breaker is open, retry in {remaining:.0f} seconds")
+            if self.trial_running:
+                raise CircuitOpenError("Sheets circuit breaker is half-open, waiting for the trial call")
+            self.trial_running = True
+            return True
+
+    # A trial that ended without an API verdict (e.g. a network error) lets
+    # the next caller try instead
+    def end_trial(self):
+        with self.lock:
+            self.trial_running = False
+
+    def delay_for(self, e, retry_count):
+        hint = retry_after(e)
+        if hint is not None:
+            return min(hint, self.max_delay * 4)
+        return min(self.max_delay, (2 ** retry_count) + random.uniform(0, 1))
+
+    # Run one API call through the rate limiter, retrying 429/5xx responses
+    def call(self, kind, call, *args, **kwargs):
+        trial = self.check_circuit()
+        try:
+            return self._call(kind, call, trial, *args, **kwargs)
+        finally:
+            if trial:
+                self.end_trial()
+
+    def _call(self, kind, call, trial, *args, **kwargs):
+        run = self.limiter.read if kind == 'read' else self.limiter.write
+        retry_count = 0
+        while True:
+            try:
+                result = run(call, *args, **kwargs)
+            except Exception as e:
+                if not is_api_error(e):
+                    raise
+                status = error_status(e)
+                if status not in RETRYABLE_STATUSES:
+                    # A server error not worth retrying still says the API is unwell
+                    if isinstance(status, int) and status >= 500:
+                        self.on_failure(trial)
+                    raise
+                self.on_throttle()
+                if trial or retry_count >= self.max_retries:
+                    self.on_failure(trial)
+                    raise
+                retry_count += 1
+                wait_time = self.delay_for(e, retry_count)
+                print(f"Sheets returned {status}. Retry {retry_count} of {self.max_retries} in {wait_time:.1f} seconds...")
+                time.sleep(wait_time)
+                recorder.wait(f"retry backoff after {status}", wait_time)
+                continue
+            self.on_success()
+            return result
+
+    def read(self, call, *args, **kwargs):
+        return self.call('read', call, *args, **kwargs)
+
+    def write(self, call, *args, **kwargs):
+        return self.call('write', call, *args, **kwargs)
+
+# Controller shared by every script in the process
+sheets_backoff = AdaptiveBackoff()
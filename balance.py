@@ -1,96 +1,117 @@
 import gspread
+from gspread.utils import rowcol_to_a1
 from google.oauth2.service_account import Credentials
-import time
 import os
+import sys
 from dotenv import load_dotenv
+from backoff import sheets_backoff
+from sheets_snapshot import read_snapshot, a1_range
+from sheets_writer import update_ranges
+from instrumentation import instrument, recorder
 
 # Load environment variables
 load_dotenv()
 
-def calculate_balance_in_sheets(sheet_name, json_key_file):
+# Running balance formulas for rows first_row..last_row of one sheet.
+# 'range' writes the chained =E{n-1}+C{n}-D{n} formula into every row;
+# 'array' writes a single open-ended SCAN formula into the first row, which
+# has no row-to-row dependency chain and also covers rows appended later.
+# The cells below it are cleared so the array result can spill.
+def balance_column(first_row, last_row, col, mode='range'):
+    letter = rowcol_to_a1(1, col).rstrip('1')
+    if mode == 'array':
+        formula = (f'=ARRAYFORMULA(IF(A{first_row}:A="",,SCAN(0,C{first_row}:C-D{first_row}:D,'
+                   f'LAMBDA(total,amount,total+amount))))')
+        return [[formula]] + [[''] for _ in range(first_row + 1, last_row + 1)]
+    column = []
+    for row_idx in range(first_row, last_row + 1):
+        if row_idx == first_row:  # First row (E4)
+            column.append([f"=C{row_idx}-D{row_idx}"])
+        else:  # Subsequent rows (E5, E6, ...)
+            column.append([f"={letter}{row_idx - 1}+C{row_idx}-D{row_idx}"])
+    return column
+
+def calculate_balance_in_sheets(sheet_name, json_key_file, mode='range'):
     # Authenticate
     SCOPES = ['https://www.googleapis.com/auth/spreadsheets',
               'https://www.googleapis.com/auth/userinfo.email',
               'https://www.googleapis.com/auth/drive.readonly']
     creds = Credentials.from_service_account_file(json_key_file, scopes=SCOPES)
-    client = gspread.authorize(creds)
+    client = instrument(gspread.authorize(creds), 'sheets')
 
     try:
         # Open the Google Sheet
-        spreadsheet = client.open(sheet_name)
-        total_requests = 0  # Track the number of API requests
-        
+        spreadsheet = sheets_backoff.read(client.open, sheet_name)
+
+        worksheets = sheets_backoff.read(spreadsheet.worksheets)
+
+        # Read every firm sheet up front in a handful of batchGet calls
+        with recorder.stage('read snapshot'):
+            snapshot = read_snapshot(spreadsheet, [ws.title for ws in worksheets if ws.title.lower() != 'index'], columns='A:Z')
+
+        merge_requests = []
+        balance_data = []
+
         # Process all worksheets
-        for worksheet in spreadsheet.worksheets():
+        for worksheet in worksheets:
             if worksheet.title.lower() == 'index':
                 print(f"Skipping sheet: {worksheet.title}")
                 continue
-                
+
             print(f"Processing sheet: {worksheet.title}")
-            
+
             # Merge cells A1 to E1 without changing the content
-            sheet_id = worksheet.id
-            body = {
-                "requests": [
-                    {
-                        "mergeCells": {
-                            "range": {
-                                "sheetId": sheet_id,
-                                "startRowIndex": 0,
-                                "endRowIndex": 1,
-                                "startColumnIndex": 0,  # Column A (0-based index)
-                                "endColumnIndex": 5   # Column E (exclusive, 0-based index)
-                            },
-                            "mergeType": "MERGE_ALL"
-                        }
-                    }
-                ]
-            }
-            spreadsheet.batch_update(body)
-            total_requests += 1
-            print(f"Merged cells A1 to E1 in sheet: {worksheet.title}")
-            
+            merge_requests.append({
+                "mergeCells": {
+                    "range": {
+                        "sheetId": worksheet.id,
+                        "startRowIndex": 0,
+                        "endRowIndex": 1,
+                        "startColumnIndex": 0,  # Column A (0-based index)
+                        "endColumnIndex": 5   # Column E (exclusive, 0-based index)
+                    },
+                    "mergeType": "MERGE_ALL"
+                }
+            })
+
             # Get all values
-            values = worksheet.get_all_values()
+            values = snapshot.all_values(worksheet.title)
             if len(values) < 4:  # Skip if sheet is too small
                 print(f"Sheet {worksheet.title} is too small, skipping...")
                 continue
-                
+
             header_row = 3  # Headers are in row 3 (1-based index)
             headers = values[header_row - 1]  # Adjust for 1-based index
-            
+
             # Check if "Balance" column exists
             balance_col = None
             for idx, header in enumerate(headers, start=1):  # Start index from 1
                 if header == 'Balance':
                     balance_col = idx
                     break
-            
+
             # If "Balance" column doesn't exist, create it at column E (index 5)
             if balance_col is None:
                 balance_col = 5  # Column E (1-based index is 5)
-                worksheet.update_cell(header_row, balance_col, 'Balance')  # Add "Balance" header to E3
-                total_requests += 1
-                print(f"Added 'Balance' column at E3.")
-            
-            # Apply formulas for the "Balance" column
+                balance_data.append({'range': a1_range(worksheet.title, rowcol_to_a1(header_row, balance_col)),
+                                     'values': [['Balance']]})
+                print(f"Adding 'Balance' column at E3.")
+
+            # Formulas for the whole "Balance" column go out as one range
             last_row = len(values)
-            for row_idx in range(header_row + 1, last_row + 1):  # Start from row 4 (1-based index)
-                if row_idx == header_row + 1:  # First row (E4)
-                    formula = f"=C{row_idx}-D{row_idx}"
-                else:  # Subsequent rows (E5, E6, ...)
-                    formula = f"=E{row_idx - 1}+C{row_idx}-D{row_idx}"
-                worksheet.update_cell(row_idx, balance_col, formula)
-                total_requests += 1
-                print(f"Added formula to row {row_idx}: {formula}")
-                
-                # Pause if requests exceed 25
-                if total_requests >= 25:
-                    print("Pausing for 60 seconds to avoid API quota limits...")
-                    time.sleep(60)
-                    total_requests = 0  # Reset the request counter
-
-            print(f"Completed processing sheet: {worksheet.title}")
+            first_cell = rowcol_to_a1(header_row + 1, balance_col)
+            last_cell = rowcol_to_a1(last_row, balance_col)
+            balance_data.append({'range': a1_range(worksheet.title, f"{first_cell}:{last_cell}"),
+                                 'values': balance_column(header_row + 1, last_row, balance_col, mode)})
+            print(f"Prepared balance formulas for rows {header_row + 1}-{last_row} of {worksheet.title}")
+
+        # All merges in one batch_update, all balance columns in as few values.batchUpdate calls as fit
+        with recorder.stage('write balances'):
+            if merge_requests:
+                sheets_backoff.write(spreadsheet.batch_update, {"requests": merge_requests})
+                print(f"Merged cells A1 to E1 in {len(merge_requests)} sheets")
+            calls = update_ranges(spreadsheet, balance_data)
+        print(f"Wrote {len(balance_data)} balance ranges in {calls} calls")
 
     except Exception as e:
         print(f"Error processing sheet: {str(e)}")
@@ -101,5 +122,8 @@ if __name__ == "__main__":
     JSON_KEY_FILE = os.getenv('GOOGLE_SHEETS_CREDENTIALS_FILE')
     if not JSON_KEY_FILE:
         raise ValueError("GOOGLE_SHEETS_CREDENTIALS_FILE environment variable is not set")
-    
-    calculate_balance_in_sheets(SHEET_NAME, JSON_KEY_FILE)
\ No newline at end of file
+
+    # Pass 'array' to write one SCAN array formula per sheet instead of a formula per row
+    MODE = sys.argv[1] if len(sys.argv) > 1 else 'range'
+    calculate_balance_in_sheets(SHEET_NAME, JSON_KEY_FILE, MODE)
+    recorder.print_summary()
@@ -0,0 +1,442 @@
+import re
+import random
+from contextlib import contextmanager
+import gspread
+from gspread.utils import a1_range_to_grid_range, rowcol_to_a1
+
+# In-memory stand-in for the parts of gspread the scripts use, for benchmarks
+# and offline runs. Every call advances a simulated clock by a configurable
+# latency instead of sleeping, is counted per endpoint, and counts against
+# per-minute read/write quotas that answer 429 like the real API.
+#
+#   clock = SimulatedClock()
+#   client = FakeClient(clock, latency=0.2)
+#   spreadsheet = client.create('2024-2025')
+#   with fake_sheets_session(client):
+#       ...run an uploader...
+#   print(client.stats.summary())
+
+# Virtual time source; sleep() advances it instantly. Like a real sleep it
+# always takes at least a microsecond, so wait loops keep moving.
+class SimulatedClock:
+    def __init__(self, start=1_000_000.0):
+        self.now = start
+        self.slept = 0.0
+
+    def monotonic(self):
+        return self.now
+
+    perf_counter = monotonic
+    time = monotonic
+
+    def sleep(self, seconds):
+        seconds = max(seconds, 1e-6)
+        self.now += seconds
+        self.slept += seconds
+
+    def advance(self, seconds):
+        self.now += seconds
+
+# The attributes of requests.Response that gspread.exceptions.APIError and backoff.py read
+class FakeResponse:
+    def __init__(self, status_code, message, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.error = {'code': status_code, 'message': message,
+                      'status': 'RESOURCE_EXHAUSTED' if status_code == 429 else 'UNAVAILABLE'}
+        self.text = str({'error': self.error})
+
+    def json(self):
+        return {'error': self.error}
+
+def api_error(status_code, message):
+    return gspread.exceptions.APIError(FakeResponse(status_code, message))
+
+# Per-endpoint call counts, cells moved and errors returned
+class FakeStats:
+    def __init__(self):
+        self.calls = {}
+        self.reads = 0
+        self.writes = 0
+        self.cells = 0
+        self.errors = {}
+        self.api_time = 0.0
+
+    def total_calls(self):
+        return sum(self.calls.values())
+
+    def summary(self):
+        return {
+            'calls': self.total_calls(),
+            'reads': self.reads,
+            'writes': self.writes,
+            'cells': self.cells,
+            'errors': dict(self.errors),
+            'api_time': round(self.api_time, 2),
+            'by_endpoint': dict(sorted(self.calls.items(), key=lambda item: -item[1])),
+        }
+
+class FakeClient:
+    # latency: seconds per call; per_cell: extra seconds per cell sent or received;
+    # reads/writes_per_minute: quota per rolling minute (None disables it);
+    # error_rate: share of calls failing with a 503; seed makes failures repeatable
+    def __init__(self, clock=None, latency=0.15, per_cell=0.00001, reads_per_minute=60,
+                 writes_per_minute=60, error_rate=0.0, seed=1):
+        self.clock = clock or SimulatedClock()
+        self.latency = latency
+        self.per_cell = per_cell
+        self.quota = {'read': reads_per_minute, 'write': writes_per_minute}
+        self.window = {'read': [], 'write': []}
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.stats = FakeStats()
+        self.spreadsheets = {}
+
+    # Account for one API call: quota, injected errors and latency
+    def request(self, endpoint, kind, cells=0):
+        now = self.clock.monotonic()
+        window = self.window[kind]
+        while window and window[0] <= now - 60:
+            window.pop(0)
+        self.stats.calls[endpoint] = self.stats.calls.get(endpoint, 0) + 1
+        cost = self.latency + cells * self.per_cell
+        self.stats.api_time += cost
+        self.clock.advance(cost)
+        limit = self.quota[kind]
+        if limit is not None and len(window) >= limit:
+            self.stats.errors[429] = self.stats.errors.get(429, 0) + 1
+            raise api_error(429, f"Quota exceeded for quota metric '{kind.capitalize()} requests'")
+        if self.error_rate and self.random.random() < self.error_rate:
+            self.stats.errors[503] = self.stats.errors.get(503, 0) + 1
+            raise api_error(503, "The service is currently unavailable.")
+        window.append(now)
+        if kind == 'read':
+            self.stats.reads += 1
+        else:
+            self.stats.writes += 1
+        self.stats.cells += cells
+
+    # Create a spreadsheet locally (not an API call)
+    def create(self, title):
+        spreadsheet = FakeSpreadsheet(self, title)
+        self.spreadsheets[title] = spreadsheet
+        return spreadsheet
+
+    def open(self, title):
+        self.request('open', 'read')
+        if title not in self.spreadsheets:
+            raise gspread.SpreadsheetNotFound(title)
+        return self.spreadsheets[title]
+
+def cell_count(rows):
+    return sum(len(row) for row in rows)
+
+# Displayed value of a stored cell, as FORMATTED_VALUE would return it
+def display(value):
+    if isinstance(value, bool):
+        return 'TRUE' if value else 'FALSE'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return '' if value is None else str(value)
+
+_SUM = re.compile(r'SUM\(([A-Z]+)(\d+):([A-Z]+)(\d+)\)')
+
+class FakeSpreadsheet:
+    def __init__(self, client, title):
+        self.client = client
+        self.title = title
+        self.id = f"fake-{title}"
+        self.sheets = []
+        self.next_sheet_id = 1
+
+    # Local helpers for setting up fixtures (no API call)
+    def create_worksheet(self, title, rows=1000, cols=26, values=None):
+        ws = FakeWorksheet(self, self.next_sheet_id, title, rows, cols)
+        self.next_sheet_id += 1
+        self.sheets.append(ws)
+        if values:
+            ws.set_values(1, 1, values)
+        return ws
+
+    def _by_title(self, title):
+        for ws in self.sheets:
+            if ws.title == title:
+                return ws
+        raise gspread.WorksheetNotFound(title)
+
+    def _by_id(self, sheet_id):
+        for ws in self.sheets:
+            if ws.id == sheet_id:
+                return ws
+        raise api_error(400, f"No grid with id: {sheet_id}")
+
+    # 'Title'!A1:D9 -> (worksheet, first row, first col, last row, last col), 1-based and inclusive
+    def _range(self, value_range):
+        title, _, cells = value_range.rpartition('!')
+        if not title:
+            title, cells = cells, ''
+        if title.startswith("'") and title.endswith("'"):
+            title = title[1:-1].replace("''", "'")
+        ws = self._by_title(title)
+        if not cells:
+            return ws, 1, 1, None, None
+        grid = a1_range_to_grid_range(cells)
+        return (ws, grid.get('startRowIndex', 0) + 1, grid.get('startColumnIndex', 0) + 1,
+                grid.get('endRowIndex'), grid.get('endColumnIndex'))
+
+    def worksheet(self, title):
+        self.client.request('worksheet', 'read')
+        return self._by_title(title)
+
+    def worksheets(self, exclude_hidden=False):
+        self.client.request('worksheets', 'read')
+        return list(self.sheets)
+
+    def fetch_sheet_metadata(self, params=None):
+        self.client.request('fetch_sheet_metadata', 'read')
+        return {'properties': {'title': self.title},
+                'sheets': [{'properties': ws.properties()} for ws in self.sheets]}
+
+    def add_worksheet(self, title, rows, cols, index=None):
+        self.client.request('add_worksheet', 'write')
+        if any(ws.title == title for ws in self.sheets):
+            raise api_error(400, f'A sheet with the name "{title}" already exists.')
+        return self.create_worksheet(title, int(rows), int(cols))
+
+    def values_batch_get(self, ranges, params=None):
+        value_ranges = []
+        for value_range in ranges:
+            ws, row, col, last_row, last_col = self._range(value_range)
+            values = ws.read(row, col, last_row, last_col)
+            value_ranges.append({'range': value_range, 'majorDimension': 'ROWS', 'values': values}
+                                if values else {'range': value_range, 'majorDimension': 'ROWS'})
+        self.client.request('values_batch_get', 'read',
+                            sum(cell_count(vr.get('values', [])) for vr in value_ranges))
+        return {'spreadsheetId': self.id, 'valueRanges': value_ranges}
+
+    def values_batch_update(self, body):
+        data = body.get('data', [])
+        self.client.request('values_batch_update', 'write', sum(cell_count(entry['values']) for entry in data))
+        for entry in data:
+            ws, row, col, _, _ = self._range(entry['range'])
+            ws.check_grid(row + len(entry['values']) - 1, col + max((len(r) for r in entry['values']), default=1) - 1)
+        for entry in data:
+            ws, row, col, _, _ = self._range(entry['range'])
+            ws.set_values(row, col, entry['values'])
+        return {'spreadsheetId': self.id, 'totalUpdatedRows': sum(len(entry['values']) for entry in data)}
+
+    def values_get(self, range_name, params=None):
+        ws, row, col, last_row, last_col = self._range(range_name)
+        values = ws.read(row, col, last_row, last_col)
+        self.client.request('values_get', 'read', cell_count(values))
+        return {'range': range_name, 'values': values} if values else {'range': range_name}
+
+    # Supports the request types the scripts send; others are counted and ignored
+    def batch_update(self, body):
+        requests = body.get('requests', [])
+        self.client.request('batch_update', 'write', len(requests))
+        replies = []
+        for request in requests:
+            kind, spec = next(iter(request.items()))
+            if kind == 'addSheet':
+                props = spec.get('properties', {})
+                grid = props.get('gridProperties', {})
+                if any(ws.title == props['title'] for ws in self.sheets):
+                    raise api_error(400, f'A sheet with the name "{props["title"]}" already exists.')
+                ws = self.create_worksheet(props['title'], grid.get('rowCount', 1000), grid.get('columnCount', 26))
+                if 'sheetId' in props:
+                    ws.id = props['sheetId']
+                replies.append({'addSheet': {'properties': ws.properties()}})
+                continue
+            if kind == 'deleteDimension':
+                grid = spec['range']
+                if grid.get('dimension', 'ROWS') == 'ROWS':
+                    self._by_id(grid['sheetId']).delete_rows(grid['startIndex'] + 1, grid['endIndex'])
+            elif kind == 'updateCells':
+                start = spec.get('start') or {'sheetId': spec['range']['sheetId'],
+                                              'rowIndex': spec['range'].get('startRowIndex', 0),
+                                              'columnIndex': spec['range'].get('startColumnIndex', 0)}
+                values = [[next(iter(cell.get('userEnteredValue', {'stringValue': ''}).values()))
+                           for cell in row.get('values', [])] for row in spec.get('rows', [])]
+                self._by_id(start['sheetId']).set_values(start.get('rowIndex', 0) + 1,
+                                                          start.get('columnIndex', 0) + 1, values)
+            elif kind == 'mergeCells':
+                self._by_id(spec['range']['sheetId']).merges += 1
+            replies.append({})
+        return {'spreadsheetId': self.id, 'replies': replies}
+
+class FakeWorksheet:
+    def __init__(self, spreadsheet, sheet_id, title, rows, cols):
+        self.spreadsheet = spreadsheet
+        self.client = spreadsheet.client
+        self.id = sheet_id
+        self.title = title
+        self.row_count = rows
+        self.col_count = cols
+        self.cells = []
+        self.merges = 0
+        self.formats = 0
+
+    def properties(self):
+        return {'sheetId': self.id, 'title': self.title, 'index': self.spreadsheet.sheets.index(self),
+                'gridProperties': {'rowCount': self.row_count, 'columnCount': self.col_count}}
+
+    # Local accessors (no API call)
+    def check_grid(self, row, col):
+        if row > self.row_count or col > self.col_count:
+            raise api_error(400, f"Range exceeds grid limits. Max rows: {self.row_count}, max columns: {self.col_count}")
+
+    def set_values(self, row, col, values):
+        for offset, values_row in enumerate(values):
+            index = row - 1 + offset
+            while len(self.cells) <= index:
+                self.cells.append([])
+            cells = self.cells[index]
+            end = col - 1 + len(values_row)
+            if len(cells) < end:
+                cells.extend([''] * (end - len(cells)))
+            cells[col - 1:end] = values_row
+        self.row_count = max(self.row_count, len(self.cells))
+
+    def delete_rows(self, first, last):
+        del self.cells[first - 1:last]
+        self.row_count -= last - first + 1
+
+    def last_row(self):
+        for index in range(len(self.cells) - 1, -1, -1):
+            if any(value not in ('', None) for value in self.cells[index]):
+                return index + 1
+        return 0
+
+    def value(self, row, col):
+        if row <= len(self.cells) and col <= len(self.cells[row - 1]):
+            value = self.cells[row - 1][col - 1]
+            if isinstance(value, str) and value.startswith('='):
+                return self.evaluate(value)
+            return display(value)
+        return ''
+
+    # Only SUM(...) arithmetic such as the B2 balance formula is evaluated;
+    # other formulas are shown as written
+    def evaluate(self, formula):
+        def column_sum(match):
+            col = gspread.utils.a1_to_rowcol(f"{match.group(1)}1")[1]
+            total = 0.0
+            for row in range(int(match.group(2)), min(int(match.group(4)), len(self.cells)) + 1):
+                try:
+                    total += float(str(self.cells[row - 1][col - 1]).replace(',', '')) if col <= len(self.cells[row - 1]) else 0.0
+                except ValueError:
+                    pass
+            return repr(total)
+        expression = _SUM.sub(column_sum, formula[1:])
+        if re.fullmatch(r'[\d.eE+\-() ]*', expression):
+            try:
+                return display(float(eval(expression, {'__builtins__': {}})))
+            except Exception:
+                pass
+        return formula
+
+    # Rows of displayed values in the block, with trailing blanks trimmed as the API does
+    def read(self, row, col, last_row=None, last_col=None):
+        last_row = min(last_row or len(self.cells), len(self.cells))
+        values = []
+        for r in range(row, last_row + 1):
+            width = len(self.cells[r - 1]) if last_col is None else min(last_col, len(self.cells[r - 1]))
+            values_row = [self.value(r, c) for c in range(col, width + 1)]
+            while values_row and values_row[-1] == '':
+                values_row.pop()
+            values.append(values_row)
+        while values and not values[-1]:
+            values.pop()
+        return values
+
+    # gspread Worksheet methods
+    def get_all_values(self):
+        values = self.read(1, 1)
+        self.client.request('get_all_values', 'read', cell_count(values))
+        width = max((len(r) for r in values), default=0)
+        return [r + [''] * (width - len(r)) for r in values]
+
+    def col_values(self, col):
+        values = [r[0] if r else '' for r in self.read(1, col, None, col)]
+        self.client.request('col_values', 'read', len(values))
+        return values
+
+    def cell(self, row, col):
+        self.client.request('cell', 'read', 1)
+        return gspread.cell.Cell(row, col, self.value(row, col))
+
+    def update_cell(self, row, col, value):
+        self.client.request('update_cell', 'write', 1)
+        self.check_grid(row, col)
+        self.set_values(row, col, [[value]])
+        return {'updatedRange': f"'{self.title}'!{rowcol_to_a1(row, col)}"}
+
+    # Accepts both update(range_name, values) (gspread 5) and update(values, range_name) (gspread 6)
+    def update(self, range_name=None, values=None, **kwargs):
+        if isinstance(range_name, list):
+            range_name, values = values, range_name
+        _, row, col, _, _ = self.spreadsheet._range(f"'{self.title}'!{range_name or 'A1'}")
+        self.client.request('update', 'write', cell_count(values))
+        self.check_grid(row + len(values) - 1, col + max((len(r) for r in values), default=1) - 1)
+        self.set_values(row, col, values)
+        return {'updatedRange': f"'{self.title}'!{range_name}", 'updatedRows': len(values)}
+
+    # values.append writes below the last non-empty row and grows the grid
+    def append_rows(self, values, value_input_option='RAW', **kwargs):
+        self.client.request('append_rows', 'write', cell_count(values))
+        first = self.last_row() + 1
+        self.set_values(first, 1, values)
+        width = max((len(r) for r in values), default=1)
+        last = first + len(values) - 1
+        return {'updates': {'updatedRange': f"'{self.title}'!A{first}:{rowcol_to_a1(last, width)}",
+                            'updatedRows': len(values)}}
+
+    def append_row(self, values, value_input_option='RAW', **kwargs):
+        self.client.request('append_row', 'write', len(values))
+        first = self.last_row() + 1
+        self.set_values(first, 1, [values])
+        return {'updates': {'updatedRange': f"'{self.title}'!A{first}:{rowcol_to_a1(first, len(values))}",
+                            'updatedRows': 1}}
+
+    def format(self, ranges, format=None):
+        self.client.request('format', 'write')
+        self.formats += 1
+
+    def merge_cells(self, name, merge_type='MERGE_ALL'):
+        self.client.request('merge_cells', 'write')
+        self.merges += 1
+
+    def get(self, range_name=None, **kwargs):
+        _, row, col, last_row, last_col = self.spreadsheet._range(f"'{self.title}'!{range_name or 'A1:ZZ'}")
+        values = self.read(row, col, last_row, last_col)
+        self.client.request('get', 'read', cell_count(values))
+        return values
+
+# Route gspread.authorize() and the time module of the rate limiter, backoff,
+# worksheet index and call recorder to the fake client and its simulated clock,
+# and give the shared limiter, backoff controller and recorder a fresh state.
+@contextmanager
+def fake_sheets_session(client):
+    import rate_limiter
+    import backoff
+    import worksheet_index
+    import instrumentation
+
+    modules = (rate_limiter, backoff, worksheet_index, instrumentation)
+    saved_time = [module.time for module in modules]
+    saved_authorize = gspread.authorize
+    for module in modules:
+        module.time = client.clock
+    gspread.authorize = lambda *args, **kwargs: client
+    rate_limiter.sheets_limiter.__init__()
+    backoff.sheets_backoff.__init__(rate_limiter.sheets_limiter)
+    instrumentation.recorder.reset()
+    try:
+        yield client
+    finally:
+        for module, saved in zip(modules, saved_time):
+            module.time = saved
+        gspread.authorize = saved_authorize
+        rate_limiter.sheets_limiter.__init__()
+        backoff.sheets_backoff.__init__(rate_limiter.sheets_limiter)
@@ -0,0 +1,81 @@
+import os
+import sys
+import time
+import random
+from datetime import date, timedelta
+
+# Memory and query time of a firm ledger held as get_all_values() rows
+# (list of lists of strings) against the columnar FirmLedger of ledger_store.py.
+# Queries: one month's totals, and the balance brought forward into that month.
+# Usage: python benchmarks/ledger_store_benchmark.py [years ...] [--rows-per-day N]
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'whatsapp bot')))
+from statement_pdf import month_rows
+from ledger_store import FirmLedger
+
+QUERIES = 200
+
+def option(name, default):
+    if name in sys.argv:
+        return type(default)(sys.argv[sys.argv.index(name) + 1])
+    return default
+
+# Header rows plus `years` years of entries ending in March 2025, as get_all_values() returns them
+def build_rows(years, rows_per_day, seed=11):
+    rng = random.Random(seed)
+    rows = [['FIRM', '', '', ''], ['BALANCE:', '0', '', ''], ['Date', 'Ref No', 'Credit', 'Debit']]
+    day = date(2025 - years, 4, 1)
+    while day < date(2025, 4, 1):
+        for _ in range(rows_per_day):
+            rows.append([day.strftime('%d-%m-%Y'), f"NEFT{rng.randrange(10 ** 8)}",
+                         str(rng.randrange(0, 500000) / 100), str(rng.randrange(0, 500000) / 100)])
+        day += timedelta(days=1)
+    return rows
+
+def deep_size(rows):
+    return sys.getsizeof(rows) + sum(sys.getsizeof(row) + sum(sys.getsizeof(cell) for cell in row) for row in rows)
+
+# Month totals and opening balance the way generate_pdf could compute them from rows
+def loop_query(rows, month, year):
+    credit = debit = 0.0
+    for record in month_rows(rows, month, year):
+        credit += float(record[2])
+        debit += float(record[3])
+    opening = 0.0
+    start = date(int(year), int(month), 1)
+    for record in rows[3:]:
+        day, month_text, year_text = record[0].split('-')
+        if date(int(year_text), int(month_text), int(day)) < start:
+            opening += float(record[2]) - float(record[3])
+    return credit, debit, opening
+
+def store_query(ledger, month, year):
+    credit, debit = ledger.month_totals(year, month)
+    return credit, debit, ledger.opening_balance(year, month)
+
+if __name__ == "__main__":
+    args = [arg for i, arg in enumerate(sys.argv[1:], start=1)
+            if not arg.startswith('--') and not sys.argv[i - 1].startswith('--')]
+    year_counts = [int(arg) for arg in args] or [1, 3, 5]
+    rows_per_day = option('--rows-per-day', 10)
+
+    for years in year_counts:
+        rows = build_rows(years, rows_per_day)
+        start = time.perf_counter()
+        ledger = FirmLedger.from_records(rows[3:])
+        build = time.perf_counter() - start
+
+        months = [(f"{m:02d}", '2025' if m <= 3 else '2024') for m in range(1, 13)]
+        start = time.perf_counter()
+        loop = [loop_query(rows, month, year) for month, year in months[:3]]
+        loop_time = (time.perf_counter() - start) / 3
+        start = time.perf_counter()
+        for i in range(QUERIES):
+            stored = store_query(ledger, *months[i % len(months)])
+        store_time = (time.perf_counter() - start) / QUERIES
+
+        agree = all(abs(a - b) < 0.005 for a, b in zip(loop[0], store_query(ledger, *months[0])))
+        print(f"{years} years ({len(ledger)} rows)  rows {deep_size(rows) / 1e6:6.1f}MB  "
+              f"columnar {ledger.nbytes() / 1e6:5.1f}MB (built in {build * 1000:.0f}ms)  "
+              f"month totals + opening balance: loop {loop_time * 1000:7.1f}ms, "
+              f"columnar {store_time * 1e6:5.1f}us{'' if agree else '  (totals differ)'}")
@@ -0,0 +1,72 @@
+import os
+import sys
+import time
+import random
+import tempfile
+import multiprocessing
+
+# Bot throughput and Sheets calls as the number of worker processes grows.
+# Each worker answers `balance` requests for firms the ledger mirror does not
+# have, so every answer needs a Sheets read (simulated with --latency seconds
+# of sleep). 'per-process' keeps a cache in each worker, as an in-memory cache
+# would under gunicorn; 'shared' uses the bot's SharedCache, where a value is
+# read by one worker and reused by all of them.
+# Usage: python benchmarks/multiworker_benchmark.py [workers ...] [--requests N] [--firms N] [--latency S]
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'whatsapp bot')))
+from shared_cache import SharedCache
+
+CACHE_TTL = 300
+
+def option(name, default):
+    if name in sys.argv:
+        return type(default)(sys.argv[sys.argv.index(name) + 1])
+    return default
+
+def worker(mode, cache_path, seed, requests, firms, latency, calls):
+    def read_balance(firm):
+        time.sleep(latency)
+        with calls.get_lock():
+            calls.value += 1
+        return f"{len(firm) * 1000:.2f}"
+
+    rng = random.Random(seed)
+    cache = SharedCache(cache_path) if mode == 'shared' else None
+    local = {}
+    for _ in range(requests):
+        firm = f"FIRM {rng.randrange(firms):04d}"
+        if cache is not None:
+            cache.get_or_load(f"balance:{firm}", lambda: read_balance(firm), CACHE_TTL)
+        elif firm not in local:
+            local[firm] = read_balance(firm)
+
+def run(mode, workers, requests, firms, latency):
+    with tempfile.TemporaryDirectory() as workdir:
+        cache_path = os.path.join(workdir, 'bot_cache.db')
+        SharedCache(cache_path)
+        calls = multiprocessing.Value('i', 0)
+        processes = [multiprocessing.Process(target=worker, args=(mode, cache_path, seed, requests // workers,
+                                                                 firms, latency, calls))
+                     for seed in range(workers)]
+        start = time.perf_counter()
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        elapsed = time.perf_counter() - start
+        return calls.value, elapsed
+
+if __name__ == "__main__":
+    args = [arg for i, arg in enumerate(sys.argv[1:], start=1)
+            if not arg.startswith('--') and not sys.argv[i - 1].startswith('--')]
+    worker_counts = [int(arg) for arg in args] or [1, 2, 4, 8]
+    requests = option('--requests', 800)
+    firms = option('--firms', 100)
+    latency = option('--latency', 0.05)
+
+    print(f"{requests} balance requests over {firms} firms, {latency * 1000:.0f}ms per Sheets read")
+    for mode in ('per-process', 'shared'):
+        for workers in worker_counts:
+            calls, elapsed = run(mode, workers, requests, firms, latency)
+            print(f"{mode:<12} {workers:>2} workers  {calls:>5} Sheets reads  {elapsed:6.2f}s  "
+                  f"{requests / elapsed:8.1f} requests/s")
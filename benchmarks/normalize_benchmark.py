@@ -0,0 +1,69 @@
+import os
+import sys
+import time
+import random
+import pandas as pd
+
+# Benchmark the vectorized beneficiary normalization against the old iterrows loop.
+# Usage: python benchmarks/normalize_benchmark.py [rows ...]
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'statement upload', 'new_statement')))
+from mapping import name_mapping, account_mapping
+from normalize import normalize_beneficiaries
+
+# The per-row loop process_data used before normalize_beneficiaries
+def normalize_iterrows(df):
+    for i, row in df.iterrows():
+        ben_name = row['Beneciary Name']
+        credit_no = row['Credit A/c No'].strip()
+        if isinstance(ben_name, (int, float)) or ben_name.strip().isdigit():
+            df.at[i, 'Beneciary Name'] = account_mapping.get(credit_no, credit_no)
+        else:
+            df.at[i, 'Beneciary Name'] = name_mapping.get(ben_name.strip(), ben_name.strip())
+    return df
+
+# A year of bank exports: mapped and unmapped names, padded names and numeric names
+def synthetic_payments(rows, seed=7):
+    rng = random.Random(seed)
+    names = list(name_mapping)
+    accounts = list(account_mapping)
+    ben_names, credit_nos = [], []
+    for i in range(rows):
+        pick = rng.random()
+        if pick < 0.6:
+            ben_names.append(f"  {rng.choice(names)} ")
+            credit_nos.append(str(rng.randrange(10 ** 10, 10 ** 11)))
+        elif pick < 0.75:
+            ben_names.append(f"Unknown Firm {rng.randrange(500)}")
+            credit_nos.append(str(rng.randrange(10 ** 10, 10 ** 11)))
+        elif pick < 0.9:
+            account = rng.choice(accounts)
+            ben_names.append(account)
+            credit_nos.append(f" {account} ")
+        else:
+            ben_names.append(rng.randrange(10 ** 10, 10 ** 11))
+            credit_nos.append(str(rng.randrange(10 ** 10, 10 ** 11)))
+    return pd.DataFrame({'Beneciary Name': ben_names, 'Credit A/c No': credit_nos})
+
+def timed(fn, df):
+    start = time.perf_counter()
+    result = fn(df)
+    return result, time.perf_counter() - start
+
+def run(rows):
+    df = synthetic_payments(rows)
+    df['Credit A/c No'] = df['Credit A/c No'].astype(str).str.strip()
+
+    vectorized, vectorized_time = timed(lambda d: normalize_beneficiaries(d, name_mapping, account_mapping), df.copy())
+    legacy, legacy_time = timed(normalize_iterrows, df.copy())
+
+    if vectorized['Beneciary Name'].tolist() != legacy['Beneciary Name'].tolist():
+        raise AssertionError("vectorized normalization differs from the iterrows loop")
+    sources = vectorized['Name Source'].value_counts().to_dict()
+    print(f"{rows:>8} rows  iterrows {legacy_time:8.3f}s  vectorized {vectorized_time:7.3f}s  "
+          f"speedup {legacy_time / vectorized_time:6.1f}x  {sources}")
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10_000, 100_000, 200_000]
+    for rows in sizes:
+        run(rows)
@@ -0,0 +1,71 @@
+import os
+import sys
+import json
+import tempfile
+import subprocess
+import statistics
+
+# Cold start of the WhatsApp bot: time to import sendmsg.py in a fresh
+# interpreter and to answer a first webhook message, without network access or
+# credentials. 'lazy' is the bot as it is; 'eager' first imports the libraries
+# the bot used to load at import (gspread, google-auth, the Twilio REST client,
+# fpdf and, when installed, fuzzywuzzy and reportlab). The eager start also
+# authorized gspread and opened the spreadsheet over the network, which this
+# benchmark cannot include, so it understates the old cold start.
+# Usage: python benchmarks/startup_benchmark.py [runs]
+
+BOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'whatsapp bot'))
+
+EAGER_IMPORTS = ['gspread', 'google.oauth2.service_account', 'twilio.rest', 'fpdf', 'fpdf.fonts',
+                 'fuzzywuzzy.process', 'reportlab.pdfgen.canvas']
+
+# Modules whose presence after import shows what a cold start paid for
+HEAVY_MODULES = ['gspread', 'google.oauth2', 'twilio.rest', 'fpdf', 'fuzzywuzzy', 'reportlab', 'numpy']
+
+CHILD = r"""
+import sys, time, json, importlib
+start = time.perf_counter()
+for name in EAGER:
+    try:
+        importlib.import_module(name)
+    except ImportError:
+        pass
+sys.path.insert(0, BOT_DIR)
+import sendmsg
+imported = time.perf_counter()
+client = sendmsg.app.test_client()
+response = client.post('/whatsapp', data={'Body': 'hi', 'From': 'whatsapp:+10000000000'})
+answered = time.perf_counter()
+print(json.dumps({'import': imported - start, 'first_reply': answered - imported, 'status': response.status_code,
+                  'heavy': [name for name in HEAVY if name in sys.modules]}))
+"""
+
+def run_once(mode, workdir):
+    env = dict(os.environ)
+    # No credentials: the bot must start without them and without network access
+    for key in ('GOOGLE_SHEETS_CREDENTIALS_FILE', 'TWILIO_ACCOUNT_SID', 'TWILIO_AUTH_TOKEN'):
+        env.pop(key, None)
+    env['FLASK_SECRET_KEY'] = 'benchmark'
+    env['LEDGER_MIRROR_PATH'] = os.path.join(workdir, 'ledger_mirror.db')
+    env['BOT_STATIC_DIR'] = os.path.join(workdir, 'static')
+    env['BOT_CACHE_PATH'] = os.path.join(workdir, 'bot_cache.db')
+    code = (f"EAGER = {EAGER_IMPORTS if mode == 'eager' else []!r}\n"
+            f"HEAVY = {HEAVY_MODULES!r}\nBOT_DIR = {BOT_DIR!r}\n" + CHILD)
+    result = subprocess.run([sys.executable, '-c', code], cwd=workdir, env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        return {'error': result.stderr.strip().splitlines()[-1] if result.stderr.strip() else 'failed'}
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+if __name__ == "__main__":
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    with tempfile.TemporaryDirectory() as workdir:
+        for mode in ('eager', 'lazy'):
+            results = [run_once(mode, workdir) for _ in range(runs)]
+            errors = [result['error'] for result in results if 'error' in result]
+            if errors:
+                print(f"{mode:<6} failed: {errors[0]}")
+                continue
+            import_ms = statistics.median(result['import'] for result in results) * 1000
+            reply_ms = statistics.median(result['first_reply'] for result in results) * 1000
+            print(f"{mode:<6} import {import_ms:7.1f}ms  first reply {reply_ms:6.1f}ms  (median of {runs})  "
+                  f"loaded: {', '.join(results[-1]['heavy']) or '-'}")
@@ -0,0 +1,90 @@
+import os
+import sys
+import time
+import random
+from datetime import date, timedelta
+
+# Reading one month of a multi-year firm ledger: the whole worksheet with
+# get_all_values() and month_rows(), against statement_fetch.read_month_rows()
+# (column A, then only the month's rows). Runs against the in-memory fake of
+# Google Sheets and reports calls, cells transferred, simulated API time and
+# the CPU time of the read and filter. --backdated moves a share of the rows
+# out of date order to exercise the scattered-rows path. The statement reads
+# with an opening balance (read_period_rows) are timed for a month and for a
+# whole financial year.
+# Usage: python benchmarks/statement_fetch_benchmark.py [years ...] [--rows-per-day N] [--backdated 0.02]
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(ROOT)
+sys.path.append(os.path.join(ROOT, 'whatsapp bot'))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from fake_sheets import SimulatedClock, FakeClient, fake_sheets_session
+from backoff import sheets_backoff
+from statement_pdf import month_rows
+from statement_fetch import read_month_rows, read_period_rows
+
+FIRM = 'SHRI SAI AGENCIES RKE'
+
+def option(name, default):
+    if name in sys.argv:
+        return type(default)(sys.argv[sys.argv.index(name) + 1])
+    return default
+
+# A ledger of `years` years ending in March 2025, appended day by day
+def build_ledger(client, years, rows_per_day, backdated, seed=7):
+    rng = random.Random(seed)
+    start = date(2025 - years, 4, 1)
+    rows = []
+    day = start
+    while day < date(2025, 4, 1):
+        for _ in range(rows_per_day):
+            entry_day = day - timedelta(days=rng.randrange(60)) if rng.random() < backdated else day
+            rows.append([entry_day.strftime('%d-%m-%Y'), f"R{rng.randrange(10 ** 6)}",
+                         rng.randrange(0, 50000), rng.randrange(0, 50000)])
+        day += timedelta(days=1)
+    spreadsheet = client.create('ledger')
+    last_row = 3 + len(rows)
+    worksheet = spreadsheet.create_worksheet(FIRM, rows=last_row, cols=4, values=[
+        [FIRM], ['BALANCE:', f'=SUM(C4:C{last_row})-SUM(D4:D{last_row})'], ['Date', 'Ref No', 'Credit', 'Debit']] + rows)
+    return worksheet, len(rows)
+
+def measure(read, years, rows_per_day, backdated):
+    client = FakeClient(SimulatedClock(), latency=0.15)
+    worksheet, total_rows = build_ledger(client, years, rows_per_day, backdated)
+    with fake_sheets_session(client):
+        cpu = time.process_time()
+        records = read(worksheet)
+        cpu = time.process_time() - cpu
+    return records, client.stats, cpu, total_rows
+
+def full_read(worksheet):
+    return month_rows(sheets_backoff.read(worksheet.get_all_values), '02', '2025')
+
+def targeted_read(worksheet):
+    return read_month_rows(worksheet, '02', '2025')
+
+def month_statement(worksheet):
+    return read_period_rows(worksheet, date(2025, 2, 1), date(2025, 2, 28))[0]
+
+def year_statement(worksheet):
+    return read_period_rows(worksheet, date(2024, 4, 1), date(2025, 3, 31))[0]
+
+if __name__ == "__main__":
+    args = [arg for i, arg in enumerate(sys.argv[1:], start=1)
+            if not arg.startswith('--') and not sys.argv[i - 1].startswith('--')]
+    year_counts = [int(arg) for arg in args] or [1, 3, 5]
+    rows_per_day = option('--rows-per-day', 10)
+    backdated = option('--backdated', 0.0)
+
+    for years in year_counts:
+        results = {}
+        for name, read in (('full', full_read), ('targeted', targeted_read),
+                           ('month', month_statement), ('FY', year_statement)):
+            records, stats, cpu, total_rows = measure(read, years, rows_per_day, backdated)
+            results[name] = records
+            print(f"{years} years ({total_rows} rows)  {name:<8}  {stats.total_calls()} calls  "
+                  f"{stats.cells:>7} cells  API {stats.api_time:5.2f}s  CPU {cpu * 1000:7.1f}ms  "
+                  f"{len(records)} rows in {'FY 2024-25' if name == 'FY' else 'Feb 2025'}")
+        if not ([record[:4] for record in results['full']] == [record[:4] for record in results['targeted']]
+                == [record[:4] for record in results['month']]):
+            print("  rows differ between the reads")
@@ -0,0 +1,81 @@
+import os
+import sys
+import time
+import random
+import tempfile
+import tracemalloc
+from fpdf import FPDF
+from babel.numbers import format_decimal
+
+# Benchmark the streaming statement renderer against the old single-buffer FPDF code.
+# Reports render time and peak Python memory (tracemalloc, measured in a second run).
+# Usage: python benchmarks/statement_render_benchmark.py [rows ...]
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'whatsapp bot')))
+from statement_pdf import render_statement
+
+# The FPDF rendering generate_pdf used before statement_pdf.render_statement
+def render_fpdf(firm_name, period_label, records, path):
+    pdf = FPDF()
+    pdf.add_page()
+    pdf.set_font("Arial", size=14, style='B')
+    pdf.cell(200, 10, txt=f"Statement for {firm_name} of {period_label}", ln=True, align='C')
+    start_x = (pdf.w - 4 * 40) / 2
+    pdf.set_font("Arial", size=12, style='B')
+    pdf.set_x(start_x)
+    for header in ["Date", "Ref No", "Credit", "Debit"]:
+        pdf.cell(40, 10, header, border=1, align='C', ln=False)
+    pdf.ln()
+    total_credit = 0.00
+    total_debit = 0.00
+    pdf.set_font("Arial", size=10)
+    for record in records:
+        pdf.set_x(start_x)
+        pdf.cell(40, 7, record[0].strip('()'), border=1, ln=False)
+        pdf.cell(40, 7, record[1], border=1, ln=False)
+        try:
+            credit = float(record[2])
+            debit = float(record[3])
+        except ValueError:
+            credit = 0.00
+            debit = 0.00
+        total_credit += credit
+        total_debit += debit
+        pdf.cell(40, 7, format_decimal(credit, format='#,##,##0.00', locale='en_IN'), border=1, align='R', ln=False)
+        pdf.cell(40, 7, format_decimal(debit, format='#,##,##0.00', locale='en_IN'), border=1, align='R')
+        pdf.ln()
+    pdf.set_x(start_x)
+    pdf.cell(80, 7, "Total:", border=1, ln=False)
+    pdf.cell(40, 7, format_decimal(total_credit, format='#,##,##0.00', locale='en_IN'), border=1, ln=False, align='R')
+    pdf.cell(40, 7, format_decimal(total_debit, format='#,##,##0.00', locale='en_IN'), border=1, align='R')
+    pdf.output(path)
+    return path
+
+# A busy firm's ledger, generated lazily so the input itself takes no memory
+def synthetic_rows(rows, seed=11):
+    rng = random.Random(seed)
+    for i in range(rows):
+        credit = f"{rng.uniform(100, 500000):.2f}" if rng.random() < 0.4 else '0'
+        debit = '0' if credit != '0' else f"{rng.uniform(100, 500000):.2f}"
+        yield [f"{i % 28 + 1:02d}-05-2024", f"NEFT{rng.randrange(10 ** 9)}", credit, debit]
+
+def measure(render, rows, path):
+    start = time.perf_counter()
+    render("BENCHMARK TRADERS RKE", "May 2024", synthetic_rows(rows), path)
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    render("BENCHMARK TRADERS RKE", "May 2024", synthetic_rows(rows), path)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak, os.path.getsize(path)
+
+def run(rows, directory):
+    for name, render in (('fpdf', render_fpdf), ('streaming', render_statement)):
+        elapsed, peak, size = measure(render, rows, os.path.join(directory, f"{name}.pdf"))
+        print(f"{rows:>8} rows  {name:<10} {elapsed:7.2f}s  peak {peak / 2 ** 20:8.1f} MiB  file {size / 2 ** 20:7.1f} MiB")
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10_000, 100_000]
+    with tempfile.TemporaryDirectory() as directory:
+        for rows in sizes:
+            run(rows, directory)
@@ -0,0 +1,136 @@
+import io
+import os
+import sys
+import time
+import types
+import random
+import importlib.util
+from contextlib import redirect_stdout
+from datetime import date, timedelta
+import pandas as pd
+
+# End-to-end benchmark of the statement uploader, the invoice uploader and
+# balance.py against the in-memory fake of Google Sheets. Reports API calls,
+# simulated wall-clock time (API latency plus rate-limit and retry waits)
+# and the CPU time spent in our own code.
+# Usage: python benchmarks/upload_benchmark.py [rows ...] [--latency 0.15] [--error-rate 0.0]
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+STATEMENT_DIR = os.path.join(ROOT, 'statement upload', 'new_statement')
+sys.path.append(ROOT)
+sys.path.append(STATEMENT_DIR)
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from fake_sheets import SimulatedClock, FakeClient, fake_sheets_session
+from mapping import name_mapping
+
+SHEET_NAME = '2024-2025'
+EXISTING_ROWS = 50
+
+# Load a script by path; several of them are called main.py
+def load_script(name, path):
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+statement_main = load_script('statement_main', os.path.join(STATEMENT_DIR, 'main.py'))
+invoice_main = load_script('invoice_main', os.path.join(ROOT, 'invoice upload', 'main.py'))
+balance = load_script('balance_script', os.path.join(ROOT, 'balance.py'))
+# balance.py authenticates itself; the fake client needs no credentials
+balance.Credentials = types.SimpleNamespace(from_service_account_file=lambda *args, **kwargs: None)
+
+EXISTING_FIRMS = sorted(set(name_mapping.values()))
+
+# The 2024-2025 book: INDEX plus every known firm with a few months of entries
+def build_book(client, seed=3):
+    rng = random.Random(seed)
+    spreadsheet = client.create(SHEET_NAME)
+    spreadsheet.create_worksheet('INDEX', values=[['FIRMS']] + [[firm] for firm in EXISTING_FIRMS])
+    for firm in EXISTING_FIRMS:
+        rows = [[f"{day % 28 + 1:02d}-{day % 12 + 1:02d}-2024", f"R{rng.randrange(10 ** 6)}",
+                 rng.randrange(0, 50000), rng.randrange(0, 50000)] for day in range(EXISTING_ROWS)]
+        last_row = 3 + len(rows)
+        spreadsheet.create_worksheet(firm, values=[[firm], ['BALANCE:', f'=SUM(C4:C{last_row})-SUM(D4:D{last_row})'],
+                                                   ['Date', 'Ref No', 'Credit', 'Debit']] + rows)
+    return spreadsheet
+
+# One month of bank payments: mostly known beneficiaries, some new ones
+def statement_month(rows, seed=5):
+    rng = random.Random(seed)
+    names = list(name_mapping)
+    new_firms = [f"New Supplier {i}" for i in range(max(5, rows // 200))]
+    start = date(2025, 2, 1)
+    return pd.DataFrame({
+        'Beneciary Name': [rng.choice(names) if rng.random() < 0.9 else rng.choice(new_firms) for _ in range(rows)],
+        'Credit A/c No': [str(rng.randrange(10 ** 10, 10 ** 11)) for _ in range(rows)],
+        'Transfer Amount': [round(rng.uniform(500, 500000), 2) for _ in range(rows)],
+        'Payment Date': [(start + timedelta(days=rng.randrange(28))).strftime('%d/%m/%Y') for _ in range(rows)],
+        'Reference No.': [f"NEFT{rng.randrange(10 ** 9)}" for _ in range(rows)],
+    })
+
+# One month of purchase invoices
+def invoice_month(rows, seed=9):
+    rng = random.Random(seed)
+    new_firms = [f"NEW PARTY {i}" for i in range(max(5, rows // 200))]
+    start = date(2025, 2, 1)
+    return pd.DataFrame({
+        'Particulars': [rng.choice(EXISTING_FIRMS) if rng.random() < 0.9 else rng.choice(new_firms) for _ in range(rows)],
+        'Date': [(start + timedelta(days=rng.randrange(28))).strftime('%d-%b-%y') for _ in range(rows)],
+        'Ref No': [f"INV{rng.randrange(10 ** 6)}" for _ in range(rows)],
+        'Credit': [round(rng.uniform(500, 500000), 2) for _ in range(rows)],
+        'Debit': [0.0] * rows,
+    })
+
+def run_statement(rows):
+    df = statement_main.process_data(statement_month(rows))
+    statement_main.upload_to_google_sheets(df, SHEET_NAME, None)
+
+def run_invoice(rows):
+    invoice_main.upload_to_google_sheets(invoice_month(rows), SHEET_NAME, None)
+
+def run_balance(rows):
+    # Load a month first so balance.py has the grown sheets to work on
+    invoice_main.upload_to_google_sheets(invoice_month(rows), SHEET_NAME, None)
+
+PIPELINES = [
+    ('statement upload', run_statement, None),
+    ('invoice upload', run_invoice, None),
+    ('balance.py', lambda rows: balance.calculate_balance_in_sheets(SHEET_NAME, None), run_balance),
+]
+
+def run(name, pipeline, setup, rows, latency, error_rate):
+    client = FakeClient(SimulatedClock(), latency=latency, error_rate=error_rate)
+    build_book(client)
+    output = io.StringIO()
+    with fake_sheets_session(client), redirect_stdout(output):
+        if setup:
+            setup(rows)
+            client.stats.__init__()
+        clock_start = client.clock.monotonic()
+        cpu_start = time.process_time()
+        real_start = time.perf_counter()
+        pipeline(rows)
+        cpu = time.process_time() - cpu_start
+        real = time.perf_counter() - real_start
+        simulated = client.clock.monotonic() - clock_start
+    errors = [line for line in output.getvalue().splitlines() if 'error' in line.lower()]
+    stats = client.stats.summary()
+    print(f"{name:<17} {rows:>7} rows  {stats['calls']:>5} calls ({stats['reads']:>4} r / {stats['writes']:>4} w)  "
+          f"429s {stats['errors'].get(429, 0):>3}  simulated {simulated:8.1f}s  cpu {cpu:6.2f}s  real {real:6.2f}s")
+    print(f"{'':<17} {'':>12}  {stats['by_endpoint']}")
+    for line in errors[:3]:
+        print(f"{'':<17} {'':>12}  ! {line}")
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    latency, error_rate = 0.15, 0.0
+    if '--latency' in args:
+        latency = float(args.pop(args.index('--latency') + 1))
+        args.remove('--latency')
+    if '--error-rate' in args:
+        error_rate = float(args.pop(args.index('--error-rate') + 1))
+        args.remove('--error-rate')
+    sizes = [int(arg) for arg in args] or [1_000, 10_000, 100_000]
+    for rows in sizes:
+        for name, pipeline, setup in PIPELINES:
+            run(name, pipeline, setup, rows, latency, error_rate)
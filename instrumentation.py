@@ -0,0 +1,263 @@
+import os
+import json
+import time
+import inspect
+import threading
+from collections import deque
+from contextlib import contextmanager
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Every Sheets and Twilio call made through an instrumented client is recorded
+# here with its latency, outcome and payload size, together with rate-limit
+# waits, retry sleeps and named stage timings. Set SHEETS_TRACE_FILE to also
+# write one JSON line per event.
+TRACE_PATH = os.getenv('SHEETS_TRACE_FILE')
+
+# Upper bounds (seconds) of the latency histogram buckets; the last is open-ended
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+# Latencies kept per endpoint for the percentiles: the most recent ones only, so
+# a long-running bot neither grows without limit nor sorts its whole history
+LATENCY_SAMPLES = int(os.getenv('LATENCY_SAMPLES', '1000'))
+
+# HTTP status of a failed call, or the exception name when there is none
+def failure_status(e):
+    status = getattr(getattr(e, 'response', None), 'status_code', None)
+    return status or type(e).__name__
+
+# Items of a long list whose size is measured; the rest are assumed alike
+PAYLOAD_SAMPLE = 32
+
+# Approximate wire size of a call's arguments or result, without serializing
+# it: strings by length plus quotes, numbers as 8 bytes, a separator per item,
+# and lists longer than PAYLOAD_SAMPLE from evenly spaced items scaled up
+def payload_size(value):
+    if value is None or isinstance(value, bool):
+        return 4
+    if isinstance(value, bytes):
+        return len(value)
+    if isinstance(value, str):
+        return len(value) + 2
+    if isinstance(value, (int, float)):
+        return 8
+    if isinstance(value, dict):
+        return 2 + sum(payload_size(key) + payload_size(item) + 2 for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        if len(value) <= PAYLOAD_SAMPLE:
+            return 2 + sum(payload_size(item) + 1 for item in value)
+        step = len(value) / PAYLOAD_SAMPLE
+        sample = sum(payload_size(value[int(i * step)]) + 1 for i in range(PAYLOAD_SAMPLE))
+        return 2 + int(sample * len(value) / PAYLOAD_SAMPLE)
+    return 0
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+# Totals, maximum and histogram cover every call; p50/p95 the last LATENCY_SAMPLES
+class EndpointStats:
+    def __init__(self):
+        self.calls = 0
+        self.errors = {}
+        self.seconds = 0.0
+        self.max_seconds = 0.0
+        self.latencies = deque(maxlen=LATENCY_SAMPLES)
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.bytes_out = 0
+        self.bytes_in = 0
+        self.targets = {}
+
+    def add(self, seconds):
+        self.seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+        self.latencies.append(seconds)
+        index = 0
+        while index < len(LATENCY_BUCKETS) and seconds > LATENCY_BUCKETS[index]:
+            index += 1
+        self.buckets[index] += 1
+
+    def histogram(self):
+        labels = [f"<={bound}s" for bound in LATENCY_BUCKETS] + [f">{LATENCY_BUCKETS[-1]}s"]
+        return dict(zip(labels, self.buckets))
+
+class CallRecorder:
+    def __init__(self, trace_path=TRACE_PATH):
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.trace = None
+        self.reset(trace_path)
+
+    # Stage of the calling thread, so the bot's concurrent requests keep apart
+    @property
+    def current_stage(self):
+        return getattr(self.local, 'stage', None)
+
+    # Start a new run, optionally tracing to a JSON lines file
+    def reset(self, trace_path=None):
+        with self.lock:
+            if self.trace:
+                self.trace.close()
+            self.endpoints = {}
+            self.waits = {}
+            self.stages = {}
+            self.local = threading.local()
+            self.started = time.perf_counter()
+            self.trace = open(trace_path, 'a', encoding='utf-8') if trace_path else None
+
+    def _emit(self, event):
+        if self.trace:
+            self.trace.write(json.dumps(event, default=str) + '\n')
+
+    # One API call attempt; status is 'ok', an HTTP status or an exception name
+    def record(self, service, endpoint, target, seconds, status, bytes_out=0, bytes_in=0):
+        with self.lock:
+            stats = self.endpoints.setdefault((service, endpoint), EndpointStats())
+            stats.calls += 1
+            stats.add(seconds)
+            stats.bytes_out += bytes_out
+            stats.bytes_in += bytes_in
+            if target:
+                stats.targets[target] = stats.targets.get(target, 0) + 1
+            if status != 'ok':
+                stats.errors[status] = stats.errors.get(status, 0) + 1
+            self._emit({'event': 'call', 'ts': round(time.time(), 3), 'service': service, 'endpoint': endpoint,
+                        'target': target, 'seconds': round(seconds, 4), 'status': status,
+                        'bytes_out': bytes_out, 'bytes_in': bytes_in, 'stage': self.current_stage})
+
+    # Time spent not calling the API, e.g. 'rate limit read' or 'retry backoff'
+    def wait(self, reason, seconds):
+        if seconds <= 0:
+            return
+        with self.lock:
+            self.waits[reason] = self.waits.get(reason, 0.0) + seconds
+            self._emit({'event': 'wait', 'ts': round(time.time(), 3), 'reason': reason,
+                        'seconds': round(seconds, 4), 'stage': self.current_stage})
+
+    # Time a named stage of the run; stages entered repeatedly (e.g. once per
+    # worksheet) are summed
+    @contextmanager
+    def stage(self, name):
+        previous = self.current_stage
+        self.local.stage = name
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            self.local.stage = previous
+            with self.lock:
+                count, total = self.stages.get(name, (0, 0.0))
+                self.stages[name] = (count + 1, total + seconds)
+                self._emit({'event': 'stage', 'ts': round(time.time(), 3), 'name': name, 'seconds': round(seconds, 4)})
+
+    def summary(self):
+        with self.lock:
+            endpoints = []
+            for (service, endpoint), stats in sorted(self.endpoints.items(), key=lambda item: -item[1].seconds):
+                retryable = sum(count for status, count in stats.errors.items() if status in (429, 500, 502, 503, 504))
+                endpoints.append({
+                    'service': service,
+                    'endpoint': endpoint,
+                    'calls': stats.calls,
+                    'errors': dict(stats.errors),
+                    'retries': retryable,
+                    'seconds': round(stats.seconds, 3),
+                    'p50': round(percentile(stats.latencies, 0.5), 4),
+                    'p95': round(percentile(stats.latencies, 0.95), 4),
+                    'max': round(stats.max_seconds, 4),
+                    'bytes_out': stats.bytes_out,
+                    'bytes_in': stats.bytes_in,
+                    'histogram': stats.histogram(),
+                    'top_targets': dict(sorted(stats.targets.items(), key=lambda item: -item[1])[:5]),
+                })
+            return {
+                'elapsed': round(time.perf_counter() - self.started, 3),
+                'calls': sum(entry['calls'] for entry in endpoints),
+                'endpoints': endpoints,
+                'waits': {reason: round(seconds, 3) for reason, seconds in self.waits.items()},
+                'stages': [{'name': name, 'count': count, 'seconds': round(seconds, 3)}
+                           for name, (count, seconds) in self.stages.items()],
+            }
+
+    # Print the run summary and append it to the trace
+    def print_summary(self):
+        summary = self.summary()
+        print(f"Run summary: {summary['calls']} API calls in {summary['elapsed']:.1f}s")
+        for stage in summary['stages']:
+            print(f"  stage {stage['name']:<24} {stage['seconds']:8.2f}s  ({stage['count']}x)")
+        for entry in summary['endpoints']:
+            errors = ', '.join(f"{status}x{count}" for status, count in entry['errors'].items()) or '-'
+            print(f"  {entry['service']:<7} {entry['endpoint']:<36} {entry['calls']:>5} calls  {entry['seconds']:8.2f}s  "
+                  f"p50 {entry['p50'] * 1000:7.1f}ms  p95 {entry['p95'] * 1000:7.1f}ms  "
+                  f"out {entry['bytes_out'] / 1024:8.1f}KB  in {entry['bytes_in'] / 1024:8.1f}KB  errors {errors}")
+        for reason, seconds in summary['waits'].items():
+            print(f"  waited {seconds:8.2f}s for {reason}")
+        with self.lock:
+            self._emit({'event': 'summary', **summary})
+            if self.trace:
+                self.trace.flush()
+        return summary
+
+# Recorder shared by every script in the process
+recorder = CallRecorder()
+
+# Transparent proxy that records every method call on the wrapped client.
+# Objects the client hands back from its own package (spreadsheets,
+# worksheets, Twilio resource lists) are wrapped as well, so
+#   client = instrument(gspread.authorize(creds), 'sheets')
+# records calls on every spreadsheet and worksheet reached through it.
+class Instrumented:
+    def __init__(self, target, service, package=None, recorder=recorder):
+        object.__setattr__(self, '_target', target)
+        object.__setattr__(self, '_service', service)
+        object.__setattr__(self, '_package', package or type(target).__module__.split('.')[0])
+        object.__setattr__(self, '_recorder', recorder)
+
+    def _wrap(self, value):
+        if isinstance(value, list) and value and self._owned(value[0]):
+            return [self._wrap(item) for item in value]
+        if self._owned(value):
+            return Instrumented(value, self._service, self._package, self._recorder)
+        return value
+
+    def _owned(self, value):
+        return (not isinstance(value, (str, bytes, int, float, bool, dict, list, tuple, type(None), type))
+                and not inspect.isroutine(value)
+                and type(value).__module__.split('.')[0] == self._package)
+
+    def __getattr__(self, name):
+        value = getattr(self._target, name)
+        if not inspect.isroutine(value):
+            return self._wrap(value)
+        target = self._target
+        endpoint = f"{type(target).__name__}.{name}"
+
+        def call(*args, **kwargs):
+            label = getattr(target, 'title', None)
+            bytes_out = payload_size([args, kwargs]) if args or kwargs else 0
+            start = time.perf_counter()
+            try:
+                result = value(*args, **kwargs)
+            except Exception as e:
+                self._recorder.record(self._service, endpoint, label, time.perf_counter() - start,
+                                      failure_status(e), bytes_out)
+                raise
+            self._recorder.record(self._service, endpoint, label, time.perf_counter() - start,
+                                  'ok', bytes_out, payload_size(result) if isinstance(result, (dict, list, str)) else 0)
+            return self._wrap(result)
+
+        call.__name__ = name
+        return call
+
+    def __setattr__(self, name, value):
+        setattr(self._target, name, value)
+
+    def __repr__(self):
+        return f"Instrumented({self._target!r})"
+
+def instrument(client, service):
+    return Instrumented(client, service)
@@ -1,8 +1,13 @@
 import gspread
 from google.oauth2.service_account import Credentials
 import os
+import sys
 from dotenv import load_dotenv
 
+# Shared Sheets helpers live in the repository root
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from backoff import sheets_backoff
+
 # Load environment variables
 load_dotenv()
 
@@ -21,9 +26,9 @@ creds = Credentials.from_service_account_file(credentials_file, scopes=SCOPES)
 client = gspread.authorize(creds)
 
 # Open the Google Sheet by name
-spreadsheet = client.open('2024-2025')
+spreadsheet = sheets_backoff.read(client.open, '2024-2025')
 
 # Count the number of worksheets
-worksheet_count = len(spreadsheet.worksheets())
+worksheet_count = len(sheets_backoff.read(spreadsheet.worksheets))
 
 print(f"The number of worksheets in the spreadsheet is: {worksheet_count}")
\ No newline at end of file
@@ -1,10 +1,18 @@
 import pandas as pd
 import gspread
 from google.oauth2.service_account import Credentials
-import time
 import os
+import sys
 from dotenv import load_dotenv
 
+# Shared Sheets helpers live in the repository root
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from backoff import sheets_backoff
+from worksheet_index import WorksheetIndex
+from instrumentation import instrument, recorder
+from upload_journal import UploadJournal
+from upload_plan import read_workbook, plan_upload, print_plan, execute_plan, dry_run
+
 # Load environment variables
 load_dotenv()
 
@@ -31,111 +39,86 @@ def authenticate():
     creds = Credentials.from_service_account_file(credentials_file, scopes=SCOPES)
     return creds
 
-# Process data and upload to Google Sheets
-def upload_to_google_sheets(df, sheet_name, creds):
-    client = gspread.authorize(creds)
-    total_operations = 0
-    total_entries = 0
+# Convert the purchase list columns to the types written to the sheet
+def process_data(df):
+    df['Ref No'] = df['Ref No'].astype(str)
+    df['Credit'] = df['Credit'].astype(float)
+    df['Debit'] = df['Debit'].astype(float)
+
+    # Parse the 'Date' column once and format it as the sheet expects
+    df['Date'] = pd.to_datetime(df['Date'], format='%d-%b-%y').dt.strftime('%d-%m-%Y')
+    return df
+
+# Process data and upload to Google Sheets. Each particular's rows go out with
+# its own values.append calls. With a journal, rows it already records are
+# skipped and every confirmed write is recorded under run_id.
+# Returns True when every row is in the sheet.
+def upload_to_google_sheets(df, sheet_name, creds, journal=None, run_id=None):
+    client = instrument(gspread.authorize(creds), 'sheets')
+    on_written = (lambda ws, rows, first_row: journal.commit(ws.title, rows, run_id, ws.id, first_row)) if journal else None
+    on_created = (lambda title, sheet_id: journal.record_created(run_id, title, sheet_id)) if journal else None
 
     try:
         # Open the Google Sheet
-        spreadsheet = client.open(sheet_name)
-
-        # Process each particular
-        for particular in df['Particulars'].unique():
-            # Filter data for the particular and exclude the header row
-            particular_df = df[df['Particulars'] == particular].copy()  
-
-            # Convert 'Credit' and 'Debit' to float
-            particular_df['Ref No'] = particular_df['Ref No'].astype(str)
-            particular_df['Credit'] = particular_df['Credit'].astype(float)
-            particular_df['Debit'] = particular_df['Debit'].astype(float)
-
-            # Convert the 'Date' column to datetime format
-            particular_df['Date'] = pd.to_datetime(particular_df['Date'], format='%d-%b-%y')
-
-            # Format the 'Date' column to the desired string format
-            particular_df['Date'] = particular_df['Date'].dt.strftime('%d-%m-%Y')
-
-            # Select or create the sheet for the particular
-            try:
-                worksheet = spreadsheet.worksheet(particular)
-                print(f"worksheet {particular} found")
-            except gspread.WorksheetNotFound:
-                total_operations += 10  # Account for header, balance, and table headers
-                if total_operations >= 35:
-                    print(f"Pausing for 60 seconds after {total_operations} write operations...")
-                    time.sleep(60)
-                    total_operations = 0
-
-                # Add new worksheet and format
-                worksheet = spreadsheet.add_worksheet(title=particular, rows="1000", cols="20")
-                header_format = {
-                    "horizontalAlignment": "CENTER",
-                    "textFormat": {"bold": True}
-                }
-                worksheet.format("A1:D1", header_format)
-                worksheet.merge_cells('A1:D1')
-                worksheet.update_cell(1, 1, particular.upper())
-                
-                # Add balance formula
-                worksheet.update_cell(2, 1, "BALANCE:")
-                total_operations = 0  # Reset count after adding header and balance
-                
-                # Add table headers
-                headers = ['Date', 'Ref No', 'Credit', 'Debit']
-                worksheet.append_row(headers)
-                total_operations += 1  # Count for table headers
-
-            # Prepare data to upload and convert to strings
-            particular_df = particular_df[['Date', 'Ref No', 'Credit', 'Debit']]
-            data = particular_df.values.tolist()
-
-            # Upload data rows
-            for row in data:
-                retry = True
-                while retry:
-                    try:
-                        total_operations += 1
-                        if total_operations >= 25:
-                            print(f"Pausing for 60 seconds after {total_operations} write operations...")
-                            time.sleep(60)
-                            total_operations = 0  # Reset count after pause
-                        worksheet.append_row(row)
-                        total_entries += 1
-                        retry = False  # Successful, so no need to retry
-
-                        
-                    except gspread.exceptions.APIError as e:
-                        if 'quota' in str(e).lower():
-                            print(f"Quota exceeded. Retrying in 60 seconds...")
-                            time.sleep(60)
-                        else:
-                            print(f"API Error: {e}")
-                            retry = False  # Exit retry loop on other errors
-                print(f"Total entries uploaded: {total_entries}")
-            
-            # Update balance formula dynamically
-            values = worksheet.get_all_values()
-            data_length = len(values)
-            if data_length > 3:  # Check if there are data rows to sum
-                worksheet.update_cell(2, 2, f'=(SUM(C4:C{data_length})-SUM(D4:D{data_length}))')
+        spreadsheet = sheets_backoff.read(client.open, sheet_name)
+        worksheet_index = WorksheetIndex(spreadsheet)
 
+        # Convert types once for the whole frame
+        with recorder.stage('normalize'):
+            df = process_data(df)
+
+        # Plan against the current contents of the particulars' worksheets
+        with recorder.stage('plan worksheets'):
+            snapshot = read_workbook(spreadsheet, worksheet_index, df['Particulars'].unique().tolist())
+            plan = plan_upload(df, 'Particulars', snapshot, journal, bulk_scope='worksheet')
+        print_plan(plan)
+
+        # Upload data rows, retrying whole batches on 429/5xx responses
+        report = execute_plan(spreadsheet, worksheet_index, plan, on_written, on_created)
+        return not any(entry['failed'] for entry in report)
 
     except gspread.exceptions.APIError as e:
         print(f"API Error: {e}")
     except Exception as e:
         print(f"Unexpected error: {e}")
+    return False
+
+# Print the upload plan without writing, using the cached snapshot when fresh
+def plan_only(df, sheet_name, creds, journal=None):
+    client = instrument(gspread.authorize(creds), 'sheets')
+    return dry_run(client, sheet_name, process_data(df), 'Particulars', journal, bulk_scope='worksheet')
 
 if __name__ == "__main__":
     # Define paths and sheet name
     excel_file_path = 'C:/Users/arukh/Desktop/moradabadhouse/invoice upload/purchase list/twentyfour-five/fwdpurchaselist/PUR FEB 2025.xlsx'
     google_sheet_name = '2024-2025'
 
+    # --resume continues the last unfinished upload, from its own Excel file;
+    # --dry-run prints what the upload would do and writes nothing
+    journal = UploadJournal()
+    run = journal.last_unfinished_run('invoice') if '--resume' in sys.argv else None
+    if run:
+        run_id, excel_file_path = run
+        print(f"Resuming upload {run_id} of {excel_file_path}: {journal.committed_rows(run_id)} rows already written")
+    elif '--resume' in sys.argv:
+        print("No unfinished invoice upload to resume")
+        sys.exit(0)
+
     try:
         # Load, process, and upload data
-        df = load_excel(excel_file_path)
+        with recorder.stage('load excel'):
+            df = load_excel(excel_file_path)
         creds = authenticate()
-        upload_to_google_sheets(df, google_sheet_name, creds)
+        if '--dry-run' in sys.argv:
+            plan_only(df, google_sheet_name, creds, journal=journal)
+        else:
+            if not run:
+                run_id = journal.start_run('invoice', excel_file_path, len(df), google_sheet_name)
+            with recorder.stage('upload'):
+                if upload_to_google_sheets(df, google_sheet_name, creds, journal=journal, run_id=run_id):
+                    journal.finish_run(run_id)
+                else:
+                    print(f"Upload {run_id} is incomplete; run again with --resume to continue")
     except Exception as e:
-        print(f"Failed to upload data to Google Sheets: {e}")
\ No newline at end of file
+        print(f"Failed to upload data to Google Sheets: {e}")
+    recorder.print_summary()
\ No newline at end of file
@@ -1,10 +1,16 @@
 import pandas as pd
 import gspread
 from google.oauth2.service_account import Credentials
-import time
 import os
+import sys
 from dotenv import load_dotenv
 
+# Shared Sheets helpers live in the repository root
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from backoff import sheets_backoff
+from worksheet_index import WorksheetIndex
+from sheets_writer import provision_worksheets
+
 # Load environment variables
 load_dotenv()
 
@@ -25,54 +31,24 @@ def authenticate():
     creds = Credentials.from_service_account_file(credentials_file, scopes=SCOPES)
     return creds
 
-# Process data and upload to Google Sheets
+# Create a worksheet for every particular that does not have one yet, all in
+# one batch_update, and print the sheetIds of the new worksheets
 def upload_to_google_sheets(df, sheet_name, creds):
     client = gspread.authorize(creds)
-    total_operations = 0
-    total_entries = 0
 
     try:
         # Open the Google Sheet
-        spreadsheet = client.open(sheet_name)
-        # Process each particular
-        for particular in df['Particulars'].unique():
-            # Filter data for the particular and exclude the header row
-            try:
-                worksheet = spreadsheet.worksheet(particular)
+        spreadsheet = sheets_backoff.read(client.open, sheet_name)
+        worksheet_index = WorksheetIndex(spreadsheet)
+        particulars = df['Particulars'].unique().tolist()
+        for particular in particulars:
+            if particular in worksheet_index:
                 print(f"worksheet {particular} found")
-                total_operations+=1
-            except gspread.WorksheetNotFound:
-                print(f"{particular} not found making worksheet")
-                total_operations += 10  # Account for header, balance, and table headers
-                if total_operations >= 35:
-                    print(f"Pausing for 60 seconds after {total_operations} write operations...")
-                    time.sleep(60)
-                    total_operations = 0
 
-                # Add new worksheet and format
-                
-                worksheet = spreadsheet.add_worksheet(title=particular, rows="1000", cols="20")
-                header_format = {
-                    "horizontalAlignment": "CENTER",
-                    "textFormat": {"bold": True}
-                }
-                worksheet.format("A1:D1", header_format)
-                worksheet.merge_cells('A1:D1')
-                worksheet.update_cell(1, 1, particular.upper())
-                
-                # Add balance formula
-                worksheet.update_cell(2, 1, "BALANCE:")
-                total_operations = 0  # Reset count after adding header and balance
-                
-                # Add table headers
-                headers = ['Date', 'Ref No', 'Credit', 'Debit']
-                worksheet.append_row(headers)
-                total_operations += 1  # Count for table headers
-                # Update balance formula dynamically
-                values = worksheet.get_all_values()
-                data_length = len(values)
-                if data_length > 3:  # Check if there are data rows to sum
-                    worksheet.update_cell(2, 2, f'=(SUM(C4:C{data_length})-SUM(D4:D{data_length}))')
+        created = provision_worksheets(spreadsheet, worksheet_index, particulars)
+        for particular, sheet_id in created.items():
+            print(f"{particular} not found, made worksheet with sheetId {sheet_id}")
+        print(f"Created {len(created)} worksheets")
 
     except gspread.exceptions.APIError as e:
         print(f" API Error:{e.response.text}")
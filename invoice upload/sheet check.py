@@ -2,8 +2,14 @@ import pandas as pd
 import gspread
 from google.oauth2.service_account import Credentials
 import os
+import sys
 from dotenv import load_dotenv
 
+# Shared Sheets helpers live in the repository root
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from backoff import sheets_backoff
+from worksheet_index import WorksheetIndex
+
 # Load environment variables
 load_dotenv()
 
@@ -29,12 +35,13 @@ def upload_to_google_sheets(df, sheet_name, creds):
     client = gspread.authorize(creds)
     try:
         # Open the Google Sheet
-        spreadsheet = client.open(sheet_name)
+        spreadsheet = sheets_backoff.read(client.open, sheet_name)
+        worksheet_index = WorksheetIndex(spreadsheet)
 
         # Process each particular
         for particular in df['Particulars'].unique():
             try:
-                worksheet = spreadsheet.worksheet(particular)
+                worksheet = worksheet_index.worksheet(particular)
                 # print(f"{particular} found")
             except gspread.WorksheetNotFound:
                 print(f"❌ {particular} NOT FOUND")
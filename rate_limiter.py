@@ -0,0 +1,74 @@
+import os
+import time
+import threading
+from dotenv import load_dotenv
+from instrumentation import recorder
+
+# Load environment variables
+load_dotenv()
+
+# Google Sheets allows 60 read and 60 write requests per minute per user by default.
+# Projects with a raised quota can override these from the .env file.
+READS_PER_MINUTE = int(os.getenv('SHEETS_READS_PER_MINUTE', '60'))
+WRITES_PER_MINUTE = int(os.getenv('SHEETS_WRITES_PER_MINUTE', '60'))
+
+# Calls allowed back to back before the steady refill rate applies
+BURST = int(os.getenv('SHEETS_BURST', '10'))
+
+# Token bucket that refills continuously instead of resetting once a minute
+class TokenBucket:
+    def __init__(self, per_minute, burst):
+        self.capacity = max(1, min(burst, per_minute))
+        # Refill so that the burst plus a minute of refill stays inside the quota
+        self.max_rate = max(per_minute - self.capacity, 1) / 60.0
+        self.rate = self.max_rate
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    # Scale the refill rate, e.g. 0.5 after a 429 and back up to 1.0 as calls succeed
+    def set_scale(self, scale):
+        with self.lock:
+            self._refill()
+            self.rate = self.max_rate * scale
+
+    # Block until `tokens` are available, then take them. Returns seconds waited.
+    def acquire(self, tokens=1):
+        waited = 0.0
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return waited
+                wait_time = (tokens - self.tokens) / self.rate
+            time.sleep(wait_time)
+            waited += wait_time
+
+# Separate read and write buckets matching the two Sheets quotas
+class SheetsRateLimiter:
+    def __init__(self, reads_per_minute=READS_PER_MINUTE, writes_per_minute=WRITES_PER_MINUTE, burst=BURST):
+        self.reads = TokenBucket(reads_per_minute, burst)
+        self.writes = TokenBucket(writes_per_minute, burst)
+
+    def set_scale(self, scale):
+        self.reads.set_scale(scale)
+        self.writes.set_scale(scale)
+
+    # Run a read call such as get_all_values, worksheet() or values_batch_get
+    def read(self, call, *args, **kwargs):
+        recorder.wait('rate limit (reads)', self.reads.acquire())
+        return call(*args, **kwargs)
+
+    # Run a write call such as append_rows, update or batch_update
+    def write(self, call, *args, **kwargs):
+        recorder.wait('rate limit (writes)', self.writes.acquire())
+        return call(*args, **kwargs)
+
+# Limiter shared by every script in the process
+sheets_limiter = SheetsRateLimiter()
@@ -0,0 +1,145 @@
+import gspread
+from google.oauth2.service_account import Credentials
+import os
+import sys
+from dotenv import load_dotenv
+from backoff import sheets_backoff
+from sheets_writer import balance_formula
+from upload_journal import UploadJournal
+from instrumentation import instrument, recorder
+
+# Load environment variables
+load_dotenv()
+
+# Undo one upload run: every row range the run appended is deleted and the B2
+# balance formula of each touched worksheet is pointed back at its previous
+# last row, all in a single batch_update. Worksheets the run created are
+# deleted outright, unless another run has written to them since.
+# Usage: python rollback_upload.py            (list recent runs)
+#        python rollback_upload.py <run id>   (roll that run back)
+
+# Merge touching ranges of one worksheet, e.g. rows 5-9 and 10-14 -> 5-14
+def merge_ranges(ranges):
+    merged = []
+    for first, last in sorted(ranges):
+        if merged and first <= merged[-1][1] + 1:
+            merged[-1][1] = max(merged[-1][1], last)
+        else:
+            merged.append([first, last])
+    return merged
+
+# deleteDimension and B2 updateCells requests for a run's ranges, and a
+# deleteSheet request for each of delete_sheet_ids instead. Rows are deleted
+# bottom-up so earlier deletions do not shift the later ones.
+def rollback_requests(ranges, delete_sheet_ids=()):
+    by_sheet = {}
+    for worksheet, sheet_id, first, last in ranges:
+        if sheet_id not in delete_sheet_ids:
+            by_sheet.setdefault(sheet_id, []).append((first, last))
+
+    requests = []
+    for sheet_id, spans in by_sheet.items():
+        spans = merge_ranges(spans)
+        for first, last in reversed(spans):
+            requests.append({
+                "deleteDimension": {
+                    "range": {
+                        "sheetId": sheet_id,
+                        "dimension": "ROWS",
+                        "startIndex": first - 1,  # 0-based, inclusive
+                        "endIndex": last          # 0-based, exclusive
+                    }
+                }
+            })
+        # The run appended after the existing rows, so the balance ended just above
+        # its first row; a worksheet left without entries gets the open-ended formula
+        last_row = spans[0][0] - 1
+        cell = {"userEnteredValue": {"formulaValue": balance_formula(last_row if last_row > 3 else None)}}
+        requests.append({
+            "updateCells": {
+                "range": {
+                    "sheetId": sheet_id,
+                    "startRowIndex": 1,
+                    "endRowIndex": 2,
+                    "startColumnIndex": 1,
+                    "endColumnIndex": 2
+                },
+                "rows": [{"values": [cell]}],
+                "fields": "userEnteredValue"
+            }
+        })
+    for sheet_id in sorted(delete_sheet_ids):
+        requests.append({"deleteSheet": {"sheetId": sheet_id}})
+    return requests
+
+def print_runs(journal):
+    for run_id, source, input_path, spreadsheet, started, finished, rolled_back in journal.runs():
+        status = f"rolled back {rolled_back}" if rolled_back else (f"finished {finished}" if finished else "unfinished")
+        print(f"{run_id:>4}  {source:<9} {started}  {status:<30} {spreadsheet or '?'}  {input_path}")
+
+def rollback_run(client, journal, run_id, force=False):
+    run = journal.run(run_id)
+    if not run:
+        print(f"No upload run {run_id} in {journal.path}")
+        return False
+    if run[6]:
+        print(f"Run {run_id} was already rolled back on {run[6]}")
+        return False
+    if not run[3]:
+        print(f"Run {run_id} did not record its spreadsheet and cannot be rolled back")
+        return False
+
+    ranges = journal.ranges(run_id)
+    created = journal.created_sheets(run_id)
+    if not ranges and not created:
+        print(f"Run {run_id} wrote no rows")
+        journal.mark_rolled_back(run_id)
+        return True
+
+    # Row numbers recorded by this run are stale once a later run appended to the same worksheets
+    later = journal.later_runs(run_id, sorted({sheet_id for _, sheet_id, _, _ in ranges}
+                                              | {sheet_id for _, sheet_id in created}))
+    if later and not force:
+        print(f"Runs {', '.join(map(str, later))} wrote to the same worksheets after run {run_id}; "
+              f"roll them back first or pass --force")
+        return False
+
+    # A worksheet the run created holds only its rows unless another run wrote there too
+    shared = journal.shared_sheets(run_id, [sheet_id for _, sheet_id in created]) if created else set()
+    deleted = {sheet_id: worksheet for worksheet, sheet_id in created if sheet_id not in shared}
+
+    worksheets = sorted({worksheet for worksheet, sheet_id, _, _ in ranges if sheet_id not in deleted})
+    rows = sum(last - first + 1 for _, _, first, last in ranges)
+    print(f"Rolling back run {run_id} ({run[2]}): {rows} rows in {len(worksheets)} worksheets "
+          f"and {len(deleted)} created worksheets of {run[3]}")
+
+    spreadsheet = sheets_backoff.read(client.open, run[3])
+    sheets_backoff.write(spreadsheet.batch_update, {"requests": rollback_requests(ranges, set(deleted))})
+    journal.mark_rolled_back(run_id)
+    for worksheet in worksheets:
+        print(f"  {worksheet}: removed {sum(last - first + 1 for name, _, first, last in ranges if name == worksheet)} rows")
+    for worksheet in sorted(deleted.values()):
+        print(f"  {worksheet}: deleted the worksheet the run created")
+    return True
+
+if __name__ == "__main__":
+    journal = UploadJournal()
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    if not args:
+        print_runs(journal)
+        sys.exit(0)
+
+    json_key_file = os.getenv('GOOGLE_SHEETS_CREDENTIALS_FILE')
+    if not json_key_file:
+        raise ValueError("GOOGLE_SHEETS_CREDENTIALS_FILE environment variable is not set")
+    SCOPES = ['https://www.googleapis.com/auth/spreadsheets',
+              'https://www.googleapis.com/auth/userinfo.email',
+              'https://www.googleapis.com/auth/drive.readonly']
+    creds = Credentials.from_service_account_file(json_key_file, scopes=SCOPES)
+    client = instrument(gspread.authorize(creds), 'sheets')
+
+    try:
+        rollback_run(client, journal, int(args[0]), force='--force' in sys.argv)
+    except gspread.exceptions.APIError as e:
+        print(f"API Error: {e}")
+    recorder.print_summary()
@@ -0,0 +1,88 @@
+from urllib.parse import quote
+from backoff import sheets_backoff
+
+# values.batchGet sends every range in the query string, so chunk requests by
+# range count and by encoded length to stay well under the URL size limit
+MAX_RANGES_PER_CALL = 100
+MAX_RANGES_URL_LENGTH = 6000
+
+# Quote a worksheet title for use in an A1 range
+def a1_range(title, cells):
+    return "'" + title.replace("'", "''") + "'!" + cells
+
+# Split ranges into batchGet-sized chunks
+def chunk_ranges(ranges, max_ranges=MAX_RANGES_PER_CALL, max_length=MAX_RANGES_URL_LENGTH):
+    chunk, length = [], 0
+    for value_range in ranges:
+        size = len(quote(value_range)) + len('&ranges=')
+        if chunk and (len(chunk) >= max_ranges or length + size > max_length):
+            yield chunk
+            chunk, length = [], 0
+        chunk.append(value_range)
+        length += size
+    if chunk:
+        yield chunk
+
+# Read many ranges with as few values.batchGet calls as possible.
+# Returns the values of each range in the order given; trailing empty rows and
+# cells are trimmed by the API, as with worksheet.get(). Extra batchGet
+# parameters such as valueRenderOption can be passed in params.
+def read_ranges(spreadsheet, ranges, params=None):
+    values = []
+    for chunk in chunk_ranges(ranges):
+        response = sheets_backoff.read(spreadsheet.values_batch_get, chunk, params)
+        value_ranges = response.get('valueRanges', [])
+        values.extend(value_range.get('values', []) for value_range in value_ranges)
+        # Ranges past the end of a sheet come back without an entry
+        values.extend([] for _ in range(len(chunk) - len(value_ranges)))
+    return values
+
+# Pad rows to the same width, as worksheet.get_all_values() returns them
+def pad_rows(rows):
+    width = max((len(row) for row in rows), default=0)
+    return [row + [''] * (width - len(row)) for row in rows]
+
+# In-memory copy of many firm worksheets read in a handful of calls.
+# Each firm tab holds its name in row 1, the balance in B2, the table headers
+# in row 3 and one entry per row from row 4.
+class LedgerSnapshot:
+    HEADER_ROWS = 3
+
+    def __init__(self, values):
+        # Worksheet title -> rows, as get_all_values() would return them
+        self.values = values
+
+    def __contains__(self, title):
+        return title in self.values
+
+    def __len__(self):
+        return len(self.values)
+
+    def titles(self):
+        return list(self.values)
+
+    def all_values(self, title):
+        return self.values[title]
+
+    # Entry rows from row 4 on
+    def records(self, title):
+        return self.values[title][self.HEADER_ROWS:]
+
+    # Displayed value of B2, or None when the sheet has no balance yet
+    def balance(self, title):
+        rows = self.values[title]
+        if len(rows) > 1 and len(rows[1]) > 1 and rows[1][1] != '':
+            return rows[1][1]
+        return None
+
+    # Last used row number, as len(get_all_values()) would give
+    def last_row(self, title):
+        return len(self.values[title])
+
+# Read the given worksheets (by title) into a LedgerSnapshot.
+# columns limits the read, e.g. 'A:E' for the table plus a balance column.
+def read_snapshot(spreadsheet, titles, columns='A:E', params=None):
+    titles = list(titles)
+    ranges = [a1_range(title, columns) for title in titles]
+    values = read_ranges(spreadsheet, ranges, params)
+    return LedgerSnapshot({title: pad_rows(rows) for title, rows in zip(titles, values)})
@@ -0,0 +1,221 @@
+import random
+import gspread
+from backoff import sheets_backoff
+from sheets_snapshot import a1_range, read_ranges
+
+# Columns of a firm worksheet's table, starting at row 3
+LEDGER_COLUMNS = ['Date', 'Ref No', 'Credit', 'Debit']
+
+# Yield (worksheet title, rows) for each distinct value of `key` in one pass.
+# df must already hold the ledger columns in their final types; rows keep the
+# order they had in the frame and are materialised one worksheet at a time.
+def iter_row_blocks(df, key):
+    ledger = df[LEDGER_COLUMNS].to_numpy(dtype=object)
+    for title, positions in df.groupby(key, sort=False).indices.items():
+        yield title, ledger[positions].tolist()
+
+# Row number of the last cell touched by an update, e.g. "'X'!A5:D9" -> 9
+def last_row_of(updated_range):
+    cells = updated_range.rsplit('!', 1)[-1]
+    end = cells.split(':')[-1]
+    digits = ''.join(ch for ch in end if ch.isdigit())
+    return int(digits) if digits else 0
+
+# Balance formula kept in B2 of every firm worksheet. Without a last row the
+# ranges are open-ended, as on a freshly created worksheet.
+def balance_formula(last_row=None, data_start_row=4):
+    end = last_row or ''
+    return f'=SUM(C{data_start_row}:C{end})-SUM(D{data_start_row}:D{end})'
+
+# New worksheets created per batch_update call
+MAX_WORKSHEETS_PER_CALL = 100
+
+# addSheet plus the layout of a firm worksheet: merged bold title in A1:D1,
+# BALANCE: and an open-ended balance formula in row 2, table headers in row 3
+def provision_requests(sheet_id, title, rows=1000, cols=20):
+    def cell(value):
+        key = 'formulaValue' if value.startswith('=') else 'stringValue'
+        return {'userEnteredValue': {key: value}}
+
+    title_range = {"sheetId": sheet_id, "startRowIndex": 0, "endRowIndex": 1, "startColumnIndex": 0, "endColumnIndex": 4}
+    return [
+        {"addSheet": {"properties": {"sheetId": sheet_id, "title": title,
+                                     "gridProperties": {"rowCount": rows, "columnCount": cols}}}},
+        {"updateCells": {
+            "start": {"sheetId": sheet_id, "rowIndex": 0, "columnIndex": 0},
+            "rows": [{"values": [cell(title.upper())]},
+                     {"values": [cell("BALANCE:"), cell(balance_formula())]},
+                     {"values": [cell(header) for header in LEDGER_COLUMNS]}],
+            "fields": "userEnteredValue"
+        }},
+        {"repeatCell": {
+            "range": title_range,
+            "cell": {"userEnteredFormat": {"horizontalAlignment": "CENTER", "textFormat": {"bold": True}}},
+            "fields": "userEnteredFormat(horizontalAlignment,textFormat)"
+        }},
+        {"mergeCells": {"range": title_range, "mergeType": "MERGE_ALL"}},
+    ]
+
+# Create every missing firm worksheet, laid out, in one batch_update per
+# MAX_WORKSHEETS_PER_CALL worksheets instead of six calls each. sheetIds are
+# chosen up front so one request list can both add and format the sheets.
+# The index is refreshed once afterwards. Returns {title: sheetId}.
+def provision_worksheets(spreadsheet, worksheet_index, titles, rows=1000, cols=20):
+    titles = [title for title in dict.fromkeys(titles) if title not in worksheet_index]
+    if not titles:
+        return {}
+    used = {worksheet_index.sheet_id(title) for title in worksheet_index.titles()}
+    sheet_ids = {}
+    for title in titles:
+        sheet_id = random.randrange(1, 2 ** 31 - 1)
+        while sheet_id in used:
+            sheet_id = random.randrange(1, 2 ** 31 - 1)
+        used.add(sheet_id)
+        sheet_ids[title] = sheet_id
+
+    for start in range(0, len(titles), MAX_WORKSHEETS_PER_CALL):
+        requests = []
+        for title in titles[start:start + MAX_WORKSHEETS_PER_CALL]:
+            requests.extend(provision_requests(sheet_ids[title], title, rows, cols))
+        response = sheets_backoff.write(spreadsheet.batch_update, {"requests": requests})
+        for reply in response.get('replies', []):
+            properties = reply.get('addSheet', {}).get('properties')
+            if properties:
+                sheet_ids[properties['title']] = properties['sheetId']
+    worksheet_index.refresh()
+    return sheet_ids
+
+# Append rows to one worksheet in as few values.append calls as possible.
+# Without an explicit batch_size the shared backoff controller picks it.
+# on_written(worksheet, rows, first_row) is called after each call the API
+# confirmed, with the sheet row the batch starts at.
+def append_rows_in_batches(worksheet, rows, batch_size=None, on_written=None):
+    report = []
+    start = 0
+    while start < len(rows):
+        batch = rows[start:start + (batch_size or sheets_backoff.batch_size)]
+        start += len(batch)
+        try:
+            response = sheets_backoff.write(worksheet.append_rows, batch)
+        except gspread.exceptions.APIError as e:
+            print(f"API Error while appending to {worksheet.title}: {e}")
+            report.append({'worksheet': worksheet.title, 'rows': 0, 'failed': len(batch), 'range': None})
+            continue
+        updated_range = response.get('updates', {}).get('updatedRange', '')
+        print(f"values.append wrote {len(batch)} rows to {worksheet.title}")
+        if on_written:
+            on_written(worksheet, batch, last_row_of(updated_range) - len(batch) + 1 if updated_range else None)
+        report.append({'worksheet': worksheet.title, 'rows': len(batch), 'failed': 0, 'range': updated_range})
+    return report
+
+# Append each worksheet's rows with its own values.append calls.
+# blocks is a list of (worksheet, rows).
+def write_rows_per_worksheet(blocks, batch_size=None, on_written=None):
+    report = []
+    last_rows = {}
+    for ws, rows in blocks:
+        appended = append_rows_in_batches(ws, rows, batch_size, on_written)
+        report.extend(appended)
+        if appended and appended[-1]['range']:
+            last_rows[ws.id] = last_row_of(appended[-1]['range'])
+    return report, last_rows
+
+# Find the first empty row of each worksheet from column A, in chunked batchGets
+def next_free_rows(spreadsheet, worksheets):
+    columns = read_ranges(spreadsheet, [a1_range(ws.title, 'A:A') for ws in worksheets])
+    return {ws.id: len(column) + 1 for ws, column in zip(worksheets, columns)}
+
+# Write the rows of every worksheet with one values.batchUpdate per chunk.
+# blocks is a list of (worksheet, rows). Worksheets whose grid is too small
+# for the new rows fall back to values.append, which grows the grid.
+# next_rows (sheet id -> first row to write) skips reading column A.
+def write_rows_bulk(spreadsheet, blocks, batch_size=None, on_written=None, next_rows=None):
+    blocks = [(ws, rows) for ws, rows in blocks if rows]
+    if not blocks:
+        return [], {}
+
+    if next_rows is None:
+        next_rows = next_free_rows(spreadsheet, [ws for ws, _ in blocks])
+    report = []
+    last_rows = {}
+    pending = []
+    pending_rows = 0
+
+    def flush():
+        nonlocal pending, pending_rows
+        if not pending:
+            return
+        body = {
+            'valueInputOption': 'RAW',
+            'data': [{'range': a1_range(ws.title, f'A{first}:D{first + len(rows) - 1}'), 'values': rows}
+                     for ws, first, rows in pending]
+        }
+        try:
+            sheets_backoff.write(spreadsheet.values_batch_update, body)
+        except gspread.exceptions.APIError as e:
+            print(f"API Error while writing {len(pending)} worksheets: {e}")
+            for ws, first, rows in pending:
+                report.append({'worksheet': ws.title, 'rows': 0, 'failed': len(rows), 'range': None})
+        else:
+            print(f"values.batchUpdate wrote {pending_rows} rows across {len(pending)} worksheets")
+            for ws, first, rows in pending:
+                last_row = first + len(rows) - 1
+                last_rows[ws.id] = last_row
+                report.append({'worksheet': ws.title, 'rows': len(rows), 'failed': 0,
+                               'range': a1_range(ws.title, f'A{first}:D{last_row}')})
+                if on_written:
+                    on_written(ws, rows, first)
+        pending = []
+        pending_rows = 0
+
+    for ws, rows in blocks:
+        first = next_rows[ws.id]
+        if first + len(rows) - 1 > ws.row_count:
+            appended, appended_last_rows = write_rows_per_worksheet([(ws, rows)], batch_size, on_written)
+            report.extend(appended)
+            last_rows.update(appended_last_rows)
+            continue
+        # Split large blocks so a single call never exceeds the batch size
+        offset = 0
+        while offset < len(rows):
+            limit = batch_size or sheets_backoff.batch_size
+            if pending_rows >= limit:
+                flush()
+            chunk = rows[offset:offset + limit - pending_rows]
+            pending.append((ws, first + offset, chunk))
+            pending_rows += len(chunk)
+            offset += len(chunk)
+    flush()
+    return report, last_rows
+
+# Write many {'range', 'values'} entries with as few values.batchUpdate calls
+# as possible, starting a new call once max_cells cells are pending
+def update_ranges(spreadsheet, data, value_input_option='USER_ENTERED', max_cells=50000):
+    calls = 0
+    chunk, cells = [], 0
+    for entry in data + [None]:
+        size = sum(len(row) for row in entry['values']) if entry else 0
+        if chunk and (entry is None or cells + size > max_cells):
+            body = {'valueInputOption': value_input_option, 'data': chunk}
+            sheets_backoff.write(spreadsheet.values_batch_update, body)
+            calls += 1
+            chunk, cells = [], 0
+        if entry:
+            chunk.append(entry)
+            cells += size
+    return calls
+
+# Point the B2 balance formula of each worksheet at its last data row in one call
+def update_balance_formulas(spreadsheet, worksheets, last_rows):
+    data = [{'range': a1_range(ws.title, 'B2'), 'values': [[balance_formula(last_rows[ws.id])]]}
+            for ws in worksheets if last_rows.get(ws.id, 0) > 3]
+    update_ranges(spreadsheet, data)
+
+# Print how many rows each API call wrote
+def print_write_report(report):
+    written = sum(entry['rows'] for entry in report)
+    failed = sum(entry['failed'] for entry in report)
+    for entry in report:
+        status = f"{entry['rows']} rows -> {entry['range']}" if entry['range'] else f"FAILED ({entry['failed']} rows)"
+        print(f"  {entry['worksheet']}: {status}")
+    print(f"Total entries uploaded: {written}, failed: {failed}")
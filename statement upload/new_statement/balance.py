@@ -1,13 +1,19 @@
 import pandas as pd
 import gspread
 from google.oauth2.service_account import Credentials
-import time
-import random
 from mapping import name_mapping, account_mapping
+from normalize import normalize_beneficiaries
 import traceback
 import os
+import sys
 from dotenv import load_dotenv
 
+# Shared Sheets helpers live in the repository root
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+from backoff import sheets_backoff
+from worksheet_index import WorksheetIndex
+from sheets_writer import iter_row_blocks, write_rows_bulk, write_rows_per_worksheet, update_balance_formulas, print_write_report, provision_worksheets
+
 # Load environment variables
 load_dotenv()
 
@@ -44,76 +50,49 @@ def process_data(df):
     # Process Credit A/c No
     df['Credit A/c No'] = df['Credit A/c No'].astype(str).str.strip()
 
-    # Map Beneciary Names
-    for i, row in df.iterrows():
-        ben_name = row['Beneciary Name']
-        credit_no = row['Credit A/c No'].strip()
-
-        if isinstance(ben_name, (int, float)) or ben_name.strip().isdigit():
-            df.at[i, 'Beneciary Name'] = account_mapping.get(credit_no, credit_no)
-        else:
-            df.at[i, 'Beneciary Name'] = name_mapping.get(ben_name.strip(), ben_name.strip())
+    # Map Beneciary Names, recording the rule used in 'Name Source'
+    df = normalize_beneficiaries(df, name_mapping, account_mapping)
     return df
 
-# Exponential backoff for retry mechanism
-def exponential_backoff(retry_count):
-    wait_time = min(60, (2 ** retry_count) + random.uniform(0, 1))
-    time.sleep(wait_time)
-
-# Upload to Google Sheets
-def upload_to_google_sheets(df, sheet_name, creds):
+# Upload to Google Sheets.
+# bulk_scope='spreadsheet' writes every beneficiary's rows with one values.batchUpdate,
+# bulk_scope='worksheet' sends one values.append per beneficiary.
+def upload_to_google_sheets(df, sheet_name, creds, bulk_scope='spreadsheet'):
     client = gspread.authorize(creds)
-    total_operations = 0
-    total_entries = 0
 
     try:
-        spreadsheet = client.open(sheet_name)
-
-        for ben_name in df['Beneciary Name'].unique():
-            ben_df = df[df['Beneciary Name'] == ben_name].copy()
-            ben_df['Date'] = ben_df['Payment Date']
-            ben_df['Ref No'] = ben_df['Reference No.']
-            ben_df['Credit'] = 0
-            ben_df['Debit'] = ben_df['Transfer Amount']
-
-            try:
-                worksheet = spreadsheet.worksheet(ben_name)
-            except gspread.WorksheetNotFound:
-                try:
-                    worksheet = spreadsheet.add_worksheet(title=ben_name, rows="1000", cols="20")
-                except Exception as e:
-                    print(f"Failed to create worksheet for {ben_name}: {e}")
-                    continue
-                worksheet.update('A1:D1', [[ben_name.upper()]])
-                worksheet.update('A2:D2', [['BALANCE:', '', '', '']])
-                worksheet.update('A3:D3', [['Date', 'Ref No', 'Credit', 'Debit']])
-
-            data = ben_df[['Date', 'Ref No', 'Credit', 'Debit']].values.tolist()
-            for row in data:
-                retry = True
-                retry_count = 0
-                while retry:
-                    try:
-                        total_operations += 1
-                        if total_operations >= 25:
-                            time.sleep(60)
-                            total_operations = 0
-                        worksheet.append_row(row)
-                        total_entries += 1
-                        retry = False
-                    except gspread.exceptions.APIError as e:
-                        if 'quota' in str(e).lower():
-                            retry_count += 1
-                            exponential_backoff(retry_count)
-                        else:
-                            print(f"API Error: {e}")
-                            retry = False
-
-            values = worksheet.get_all_values()
-            data_length = len(values)
-            if data_length > 3:
-                data_start_row = 4  # Adjust this if headers change
-                worksheet.update_cell(2, 2, f'=SUM(C{data_start_row}:C{data_length})-SUM(D{data_start_row}:D{data_length})')
+        spreadsheet = sheets_backoff.read(client.open, sheet_name)
+        worksheet_index = WorksheetIndex(spreadsheet)
+        blocks = []
+
+        # Build the ledger columns once, then split the frame per beneficiary in one pass
+        df['Date'] = df['Payment Date']
+        df['Ref No'] = df['Reference No.']
+        df['Credit'] = 0
+        df['Debit'] = df['Transfer Amount']
+
+        # Create every missing beneficiary worksheet in one batch_update
+        try:
+            created = provision_worksheets(spreadsheet, worksheet_index, df['Beneciary Name'].unique().tolist())
+        except gspread.exceptions.APIError as e:
+            print(f"Failed to create worksheets: {e}")
+            created = {}
+        for ben_name, sheet_id in created.items():
+            print(f"Created worksheet {ben_name} (sheetId {sheet_id})")
+
+        for ben_name, data in iter_row_blocks(df, 'Beneciary Name'):
+            worksheet = worksheet_index.get(ben_name)
+            if worksheet is None:
+                continue
+            blocks.append((worksheet, data))
+
+        if bulk_scope == 'spreadsheet':
+            report, last_rows = write_rows_bulk(spreadsheet, blocks)
+        else:
+            report, last_rows = write_rows_per_worksheet(blocks)
+        print_write_report(report)
+
+        update_balance_formulas(spreadsheet, [worksheet for worksheet, _ in blocks], last_rows)
 
     except gspread.exceptions.APIError as e:
         print(f"API Error: {e}")
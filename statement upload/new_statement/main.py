@@ -1,10 +1,19 @@
 import pandas as pd
 import gspread
 from google.oauth2.service_account import Credentials
-import time
 import os
+import sys
 from dotenv import load_dotenv
 from mapping import name_mapping, account_mapping
+from normalize import normalize_beneficiaries
+
+# Shared Sheets helpers live in the repository root
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+from backoff import sheets_backoff
+from worksheet_index import WorksheetIndex
+from instrumentation import instrument, recorder
+from upload_journal import UploadJournal
+from upload_plan import read_workbook, plan_upload, print_plan, execute_plan, dry_run
 
 # Load environment variables
 load_dotenv()
@@ -44,104 +53,56 @@ def process_data(df):
     else:
         raise ValueError("Credit A/c No column is missing in the Excel file.")
     
-    # Iterate over the rows to map beneficiary names and handle exceptions
-    for i, row in df.iterrows():
-        ben_name = row['Beneciary Name']
-        credit_no = row['Credit A/c No'].strip()  # Ensure trailing spaces are removed
-        
-        # Check if the beneficiary name is numeric or contains leading/trailing spaces
-        if isinstance(ben_name, (int, float)) or ben_name.strip().isdigit():
-            df.at[i, 'Beneciary Name'] = account_mapping.get(credit_no, credit_no)
-        else:
-            # Map beneficiary name if exists in the dictionary
-            df.at[i, 'Beneciary Name'] = name_mapping.get(ben_name.strip(), ben_name.strip())
+    # Map beneficiary names for the whole frame, recording the rule used in 'Name Source'
+    df = normalize_beneficiaries(df, name_mapping, account_mapping)
     return df
 
-# Upload to Google Sheets
-def upload_to_google_sheets(df, sheet_name, creds):
-    client = gspread.authorize(creds)
-    total_operations = 0
-    total_entries = 0
+# Add the Date, Ref No, Credit and Debit columns written to each worksheet
+def prepare_ledger(df):
+    df['Date'] = df['Payment Date'].map(lambda x: x.strftime('%d-%m-%Y') if isinstance(x, pd.Timestamp) else str(x))
+    df['Ref No'] = df['Reference No.']
+    df['Credit'] = 0
+    df['Debit'] = df['Transfer Amount']
+    return df
+
+# Upload to Google Sheets.
+# bulk_scope='spreadsheet' writes every beneficiary's rows with one values.batchUpdate,
+# bulk_scope='worksheet' sends one values.append per beneficiary.
+# With a journal, rows it already records are skipped and every confirmed write
+# is recorded under run_id. Returns True when every row is in the sheet.
+def upload_to_google_sheets(df, sheet_name, creds, bulk_scope='spreadsheet', journal=None, run_id=None):
+    client = instrument(gspread.authorize(creds), 'sheets')
+    on_written = (lambda ws, rows, first_row: journal.commit(ws.title, rows, run_id, ws.id, first_row)) if journal else None
+    on_created = (lambda title, sheet_id: journal.record_created(run_id, title, sheet_id)) if journal else None
 
     try:
         # Open the Google Sheet
-        spreadsheet = client.open(sheet_name)
-
-        for ben_name in df['Beneciary Name'].unique():
-            # print(f"Searching for worksheet: {ben_name}")
-            ben_df = df[df['Beneciary Name'] == ben_name].copy()
-            ben_df['Date'] = ben_df['Payment Date'].apply(lambda x: x.strftime('%d-%m-%Y') if isinstance(x, pd.Timestamp) else str(x))
-            ben_df['Ref No'] = ben_df['Reference No.']
-            ben_df['Credit'] = 0
-            ben_df['Debit'] = ben_df['Transfer Amount']
-
-            # Select or create the sheet for the beneficiary
-            try:
-                worksheet = spreadsheet.worksheet(ben_name)
-                print(f"Worksheet found: {ben_name}")
-            except gspread.WorksheetNotFound:
-                print(f"Worksheet not found: {ben_name}")
-                total_operations += 10  # Account for header, balance, and table headers
-                if total_operations >= 25:
-                    print(f"Pausing for 60 seconds after {total_operations} write operations...")
-                    time.sleep(60)
-                    total_operations = 0
-
-                # Add new worksheet and format
-                worksheet = spreadsheet.add_worksheet(title=ben_name, rows="1000", cols="20")
-                header_format = {
-                    "horizontalAlignment": "CENTER",
-                    "textFormat": {"bold": True}
-                }
-                worksheet.format("A1:D1", header_format)
-                worksheet.merge_cells('A1:D1')
-                worksheet.update_cell(1, 1, ben_name.upper())
-                
-                # Add balance formula
-                worksheet.update_cell(2, 1, "BALANCE:")
-                total_operations = 0  # Reset count after adding header and balance
-                
-                # Add table headers
-                headers = ['Date', 'Ref No', 'Credit', 'Debit']
-                worksheet.append_row(headers)
-                total_operations += 1  # Count for table headers
-
-            # Prepare data to upload
-            data = ben_df[['Date', 'Ref No', 'Credit', 'Debit']].values.tolist()
-
-            # Upload data rows
-            for row in data:
-                retry = True
-                while retry:
-                    try:
-                        total_operations += 1
-                        if total_operations >= 25:
-                            print(f"Pausing for 60 seconds after {total_operations} write operations...")
-                            time.sleep(60)
-                            total_operations = 0  # Reset count after pause
-                        worksheet.append_row(row)
-                        total_entries += 1
-                        retry = False  # Successful, so no need to retry
-                        
-                    except gspread.exceptions.APIError as e:
-                        if 'quota' in str(e).lower():
-                            print(f"Quota exceeded. Retrying in 60 seconds...")
-                            time.sleep(60)
-                        else:
-                            print(f"API Error: {e}")
-                            retry = False  # Exit retry loop on other errors
-            print(f"Total entries uploaded: {total_entries}")
-            
-            # Update balance formula dynamically
-            values = worksheet.get_all_values()
-            data_length = len(values)
-            if data_length > 3:  # Check if there are data rows to sum
-                worksheet.update_cell(2, 2, f'=(SUM(C4:C{data_length})-SUM(D4:D{data_length}))')
+        spreadsheet = sheets_backoff.read(client.open, sheet_name)
+        worksheet_index = WorksheetIndex(spreadsheet)
+
+        # Build the ledger columns once for the whole frame
+        df = prepare_ledger(df)
+
+        # Plan against the current contents of the beneficiaries' worksheets
+        with recorder.stage('plan worksheets'):
+            snapshot = read_workbook(spreadsheet, worksheet_index, df['Beneciary Name'].unique().tolist())
+            plan = plan_upload(df, 'Beneciary Name', snapshot, journal, bulk_scope)
+        print_plan(plan)
+
+        # Upload data rows in bulk, retrying whole batches on quota errors
+        report = execute_plan(spreadsheet, worksheet_index, plan, on_written, on_created)
+        return not any(entry['failed'] for entry in report)
 
     except gspread.exceptions.APIError as e:
         print(f"API Error: {e}")
     except Exception as e:
         print(f"Unexpected error: {e}")
+    return False
+
+# Print the upload plan without writing, using the cached snapshot when fresh
+def plan_only(df, sheet_name, creds, bulk_scope='spreadsheet', journal=None):
+    client = instrument(gspread.authorize(creds), 'sheets')
+    return dry_run(client, sheet_name, prepare_ledger(df), 'Beneciary Name', journal, bulk_scope)
 
 if __name__ == "__main__":
     excel_file_path = 'C:/Users/arukh/Desktop/moradabadhouse/statement upload/new_statement/excel payment/feb 25.xlsx'
@@ -150,10 +111,33 @@ if __name__ == "__main__":
     if not json_key_file:
         raise ValueError("GOOGLE_SHEETS_CREDENTIALS_FILE environment variable is not set")
 
+    # --resume continues the last unfinished upload, from its own Excel file;
+    # --dry-run prints what the upload would do and writes nothing
+    journal = UploadJournal()
+    run = journal.last_unfinished_run('statement') if '--resume' in sys.argv else None
+    if run:
+        run_id, excel_file_path = run
+        print(f"Resuming upload {run_id} of {excel_file_path}: {journal.committed_rows(run_id)} rows already written")
+    elif '--resume' in sys.argv:
+        print("No unfinished statement upload to resume")
+        sys.exit(0)
+
     try:
-        df = load_excel(excel_file_path)
-        df = process_data(df)
+        with recorder.stage('load excel'):
+            df = load_excel(excel_file_path)
+        with recorder.stage('normalize'):
+            df = process_data(df)
         creds = authenticate(json_key_file)
-        upload_to_google_sheets(df, google_sheet_name, creds)
+        if '--dry-run' in sys.argv:
+            plan_only(df, google_sheet_name, creds, journal=journal)
+        else:
+            if not run:
+                run_id = journal.start_run('statement', excel_file_path, len(df), google_sheet_name)
+            with recorder.stage('upload'):
+                if upload_to_google_sheets(df, google_sheet_name, creds, journal=journal, run_id=run_id):
+                    journal.finish_run(run_id)
+                else:
+                    print(f"Upload {run_id} is incomplete; run again with --resume to continue")
     except Exception as e:
-        print(f"Failed to upload data to Google Sheets: {e}")
\ No newline at end of file
+        print(f"Failed to upload data to Google Sheets: {e}")
+    recorder.print_summary()
\ No newline at end of file
@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+
+# Values of the 'Name Source' column, saying which rule resolved each beneficiary
+ACCOUNT_MAPPING = 'account_mapping'
+ACCOUNT_NUMBER = 'account_number'
+NAME_MAPPING = 'name_mapping'
+NAME = 'name'
+
+# Distinct values of a column and the code of each row into them. Missing
+# values get their own slot at the end instead of pandas' -1 sentinel.
+def _factorize(series):
+    codes, uniques = pd.factorize(series)
+    uniques = pd.Series(np.append(np.asarray(uniques, dtype=object), np.nan), dtype=object)
+    return np.where(codes < 0, len(uniques) - 1, codes), uniques
+
+# Map beneficiary names to worksheet names for the whole frame at once.
+# Numeric beneficiary names (the bank exports the account number instead of a
+# name) are resolved from the credit account number through account_mapping,
+# falling back to the account number itself; other names are stripped and
+# resolved through name_mapping, falling back to the stripped name.
+# Each distinct name and account number is resolved once and broadcast back to
+# the rows, so the string work scales with the number of firms, not rows.
+def normalize_beneficiaries(df, name_mapping, account_mapping):
+    name_codes, names = _factorize(df['Beneciary Name'])
+    credit_codes, credit_nos = _factorize(df['Credit A/c No'])
+    credit_nos = credit_nos.astype(str).str.strip()
+
+    # Non-string names (ints, floats, NaN) and digit-only strings are numeric
+    is_text = names.map(lambda value: isinstance(value, str)).to_numpy(dtype=bool)
+    stripped = names.where(is_text).map(lambda value: value.strip() if isinstance(value, str) else value)
+    is_digits = stripped.map(lambda value: isinstance(value, str) and value.isdigit()).to_numpy(dtype=bool)
+    name_is_numeric = ~is_text | is_digits
+
+    by_name = stripped.map(name_mapping)
+    name_resolved = by_name.fillna(stripped).to_numpy(dtype=object)
+    name_found = by_name.notna().to_numpy()
+
+    by_account = credit_nos.map(account_mapping)
+    account_resolved = by_account.fillna(credit_nos).to_numpy(dtype=object)
+    account_found = by_account.notna().to_numpy()
+
+    is_numeric = name_is_numeric[name_codes]
+    df['Beneciary Name'] = np.where(is_numeric, account_resolved[credit_codes], name_resolved[name_codes])
+    df['Name Source'] = np.select(
+        [is_numeric & account_found[credit_codes], is_numeric, name_found[name_codes]],
+        [ACCOUNT_MAPPING, ACCOUNT_NUMBER, NAME_MAPPING],
+        default=NAME
+    )
+    return df
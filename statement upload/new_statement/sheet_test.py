@@ -2,7 +2,14 @@ import pandas as pd
 import gspread
 from google.oauth2.service_account import Credentials
 import os
+import sys
 from dotenv import load_dotenv
+from normalize import normalize_beneficiaries
+
+# Shared Sheets helpers live in the repository root
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+from backoff import sheets_backoff
+from worksheet_index import WorksheetIndex
 
 # Load environment variables
 load_dotenv()
@@ -164,18 +171,8 @@ def process_data(df):
     else:
         raise ValueError("Credit A/c No column is missing in the Excel file.")
     
-    # Iterate over the rows to map beneficiary names and handle exceptions
-    for i, row in df.iterrows():
-        ben_name = row['Beneciary Name']
-        credit_no = row['Credit A/c No']  # Ensure trailing spaces are removed
-        
-        # Check if the beneficiary name is numeric or contains leading/trailing spaces
-        if isinstance(ben_name, (int, float)) or ben_name.strip().isdigit():
-            df.at[i, 'Beneciary Name'] = account_mapping.get(credit_no, credit_no)
-        else:
-            # Map beneficiary name if exists in the dictionary
-            df.at[i, 'Beneciary Name'] = name_mapping.get(ben_name.strip(), ben_name.strip())
-    
+    # Map beneficiary names for the whole frame, recording the rule used in 'Name Source'
+    df = normalize_beneficiaries(df, name_mapping, account_mapping)
     return df
 
 # Upload to Google Sheets
@@ -184,11 +181,12 @@ def upload_to_google_sheets(df, sheet_name, creds):
 
     try:
         # Open the Google Sheet
-        spreadsheet = client.open(sheet_name)
+        spreadsheet = sheets_backoff.read(client.open, sheet_name)
+        worksheet_index = WorksheetIndex(spreadsheet)
         count = 1
         for ben_name in df['Beneciary Name'].unique():
             try:
-                worksheet = spreadsheet.worksheet(ben_name)
+                worksheet = worksheet_index.worksheet(ben_name)
                 print(f"{count} ✅ Worksheet found: {ben_name}")
                 count += 1
             except gspread.WorksheetNotFound:
@@ -0,0 +1,182 @@
+import os
+import sqlite3
+from datetime import datetime
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Local record of every row an uploader has written, so a crashed or killed
+# upload can be run again without appending rows twice. Rows are identified by
+# (worksheet, Ref No, date, credit, debit); identical rows in one upload are told
+# apart by their occurrence number. The journal is consulted instead of
+# re-reading the sheets. The row ranges each run wrote and the worksheets it
+# created are kept as well, so a run can be rolled back (see rollback_upload.py).
+JOURNAL_PATH = os.getenv('UPLOAD_JOURNAL_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'upload_journal.db'))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    source TEXT NOT NULL,
+    input_path TEXT NOT NULL,
+    total_rows INTEGER NOT NULL,
+    started TEXT NOT NULL,
+    finished TEXT,
+    spreadsheet TEXT,
+    rolled_back TEXT
+);
+CREATE TABLE IF NOT EXISTS rows (
+    worksheet TEXT NOT NULL,
+    ref_no TEXT NOT NULL,
+    date TEXT NOT NULL,
+    credit TEXT NOT NULL,
+    debit TEXT NOT NULL,
+    occurrence INTEGER NOT NULL,
+    run_id INTEGER NOT NULL,
+    committed_at TEXT NOT NULL,
+    PRIMARY KEY (worksheet, ref_no, date, credit, debit, occurrence)
+);
+CREATE TABLE IF NOT EXISTS ranges (
+    run_id INTEGER NOT NULL,
+    worksheet TEXT NOT NULL,
+    sheet_id INTEGER NOT NULL,
+    first_row INTEGER NOT NULL,
+    last_row INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ranges_by_run ON ranges (run_id);
+CREATE TABLE IF NOT EXISTS created_sheets (
+    run_id INTEGER NOT NULL,
+    worksheet TEXT NOT NULL,
+    sheet_id INTEGER NOT NULL
+);
+"""
+
+def _amount(value):
+    try:
+        return f"{float(value):.2f}"
+    except (TypeError, ValueError):
+        return str(value)
+
+# Journal key of a [date, ref no, credit, debit] row
+def row_key(row):
+    return (str(row[1]), str(row[0]), _amount(row[2]), _amount(row[3]))
+
+# The rows not accounted for by counts (row_key -> copies already written), in order
+def pending_rows(rows, counts):
+    seen = {}
+    pending = []
+    for row in rows:
+        key = row_key(row)
+        seen[key] = seen.get(key, 0) + 1
+        if seen[key] > counts.get(key, 0):
+            pending.append(row)
+    return pending
+
+class UploadJournal:
+    def __init__(self, path=JOURNAL_PATH):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        with self.conn:
+            self.conn.executescript(SCHEMA)
+            # Journals written before rollback support lack these columns
+            columns = {row[1] for row in self.conn.execute("PRAGMA table_info(runs)")}
+            for column in ('spreadsheet', 'rolled_back'):
+                if column not in columns:
+                    self.conn.execute(f"ALTER TABLE runs ADD COLUMN {column} TEXT")
+
+    def start_run(self, source, input_path, total_rows, spreadsheet=None):
+        with self.conn:
+            cursor = self.conn.execute(
+                "INSERT INTO runs (source, input_path, total_rows, started, spreadsheet) VALUES (?, ?, ?, ?, ?)",
+                (source, input_path, total_rows, datetime.now().isoformat(timespec='seconds'), spreadsheet))
+        return cursor.lastrowid
+
+    def finish_run(self, run_id):
+        with self.conn:
+            self.conn.execute("UPDATE runs SET finished = ? WHERE id = ?",
+                              (datetime.now().isoformat(timespec='seconds'), run_id))
+
+    # (run id, input path) of the latest unfinished run of an uploader, or None
+    def last_unfinished_run(self, source):
+        return self.conn.execute(
+            "SELECT id, input_path FROM runs WHERE source = ? AND finished IS NULL AND rolled_back IS NULL "
+            "ORDER BY id DESC LIMIT 1", (source,)).fetchone()
+
+    # Most recent runs as (id, source, input path, spreadsheet, started, finished, rolled back)
+    def runs(self, limit=10):
+        return self.conn.execute(
+            "SELECT id, source, input_path, spreadsheet, started, finished, rolled_back FROM runs "
+            "ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
+
+    def run(self, run_id):
+        return self.conn.execute(
+            "SELECT id, source, input_path, spreadsheet, started, finished, rolled_back FROM runs WHERE id = ?",
+            (run_id,)).fetchone()
+
+    # Row ranges a run wrote as (worksheet, sheet id, first row, last row)
+    def ranges(self, run_id):
+        return self.conn.execute(
+            "SELECT worksheet, sheet_id, first_row, last_row FROM ranges WHERE run_id = ? ORDER BY sheet_id, first_row",
+            (run_id,)).fetchall()
+
+    # Worksheets a run created as (worksheet, sheet id)
+    def created_sheets(self, run_id):
+        return self.conn.execute(
+            "SELECT worksheet, sheet_id FROM created_sheets WHERE run_id = ? ORDER BY sheet_id", (run_id,)).fetchall()
+
+    # Of the given worksheets, those other runs not rolled back also wrote to
+    def shared_sheets(self, run_id, sheet_ids):
+        marks = ', '.join('?' for _ in sheet_ids)
+        return {row[0] for row in self.conn.execute(
+            f"SELECT DISTINCT ranges.sheet_id FROM ranges JOIN runs ON runs.id = ranges.run_id "
+            f"WHERE ranges.run_id != ? AND runs.rolled_back IS NULL AND ranges.sheet_id IN ({marks})",
+            (run_id, *sheet_ids))}
+
+    # Later runs, not rolled back, that wrote to any of the given worksheets
+    def later_runs(self, run_id, sheet_ids):
+        marks = ', '.join('?' for _ in sheet_ids)
+        return [row[0] for row in self.conn.execute(
+            f"SELECT DISTINCT ranges.run_id FROM ranges JOIN runs ON runs.id = ranges.run_id "
+            f"WHERE ranges.run_id > ? AND runs.rolled_back IS NULL AND ranges.sheet_id IN ({marks})",
+            (run_id, *sheet_ids))]
+
+    # Forget a run's rows once they have been deleted from the sheets
+    def mark_rolled_back(self, run_id):
+        with self.conn:
+            self.conn.execute("DELETE FROM rows WHERE run_id = ?", (run_id,))
+            self.conn.execute("UPDATE runs SET rolled_back = ? WHERE id = ?",
+                              (datetime.now().isoformat(timespec='seconds'), run_id))
+
+    # Record a worksheet the run created, so rolling the run back can delete it
+    def record_created(self, run_id, worksheet, sheet_id):
+        with self.conn:
+            self.conn.execute("INSERT INTO created_sheets VALUES (?, ?, ?)", (run_id, worksheet, sheet_id))
+
+    def committed_rows(self, run_id):
+        return self.conn.execute("SELECT COUNT(*) FROM rows WHERE run_id = ?", (run_id,)).fetchone()[0]
+
+    # row_key -> number of copies recorded for one worksheet
+    def committed_counts(self, worksheet):
+        return {key[:4]: key[4] for key in self.conn.execute(
+            "SELECT ref_no, date, credit, debit, COUNT(*) FROM rows WHERE worksheet = ? "
+            "GROUP BY ref_no, date, credit, debit", (worksheet,))}
+
+    # The rows of one worksheet that have not been written yet, in order
+    def pending(self, worksheet, rows):
+        return pending_rows(rows, self.committed_counts(worksheet))
+
+    # Record rows the API has confirmed as written, and where they went when known
+    def commit(self, worksheet, rows, run_id, sheet_id=None, first_row=None):
+        counts = self.committed_counts(worksheet)
+        now = datetime.now().isoformat(timespec='seconds')
+        entries = []
+        for row in rows:
+            key = row_key(row)
+            occurrence = counts.get(key, 0)
+            counts[key] = occurrence + 1
+            entries.append((worksheet, *key, occurrence, run_id, now))
+        with self.conn:
+            self.conn.executemany("INSERT OR IGNORE INTO rows VALUES (?, ?, ?, ?, ?, ?, ?, ?)", entries)
+            if sheet_id is not None and first_row:
+                self.conn.execute("INSERT INTO ranges VALUES (?, ?, ?, ?, ?)",
+                                  (run_id, worksheet, sheet_id, first_row, first_row + len(rows) - 1))
@@ -0,0 +1,238 @@
+import os
+import json
+import math
+import time
+from dotenv import load_dotenv
+from backoff import sheets_backoff
+from rate_limiter import READS_PER_MINUTE, WRITES_PER_MINUTE, BURST
+from sheets_snapshot import LedgerSnapshot, read_snapshot
+from sheets_writer import (iter_row_blocks, write_rows_bulk, write_rows_per_worksheet, update_balance_formulas,
+                           print_write_report, provision_worksheets, MAX_WORKSHEETS_PER_CALL)
+from worksheet_index import WorksheetIndex
+from upload_journal import row_key, pending_rows
+from instrumentation import recorder
+
+# Load environment variables
+load_dotenv()
+
+# Both uploaders work in two steps. plan_upload() turns the processed frame and
+# a snapshot of the spreadsheet into an UploadPlan: worksheets to create, rows
+# to write to each worksheet and where, and rows skipped as already uploaded.
+# execute_plan() then carries out exactly that plan. A dry run (--dry-run)
+# prints the plan from a cached snapshot and makes no writes.
+SNAPSHOT_PATH = os.getenv('UPLOAD_SNAPSHOT_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'upload_snapshot.json'))
+# Seconds a cached snapshot is used for dry runs before it is read again
+SNAPSHOT_MAX_AGE = int(os.getenv('UPLOAD_SNAPSHOT_MAX_AGE', '900'))
+# Typical latency of one Sheets call, used for the run time estimate
+CALL_LATENCY = float(os.getenv('SHEETS_CALL_LATENCY', '0.3'))
+
+# Grid size and header rows of a newly created firm worksheet
+NEW_WORKSHEET_ROWS = 1000
+NEW_WORKSHEET_COLS = 20
+FIRST_DATA_ROW = 4
+
+# Read entries as stored: numbers unformatted, dates as shown
+SNAPSHOT_PARAMS = {'valueRenderOption': 'UNFORMATTED_VALUE', 'dateTimeRenderOption': 'FORMATTED_STRING'}
+
+# Worksheet grid metadata plus the A:D values of the firm worksheets
+class WorkbookSnapshot:
+    def __init__(self, spreadsheet, sheets, values, fetched=None):
+        self.spreadsheet = spreadsheet
+        # Title -> {'id', 'rows', 'cols'}
+        self.sheets = sheets
+        self.ledger = LedgerSnapshot(values)
+        self.fetched = fetched or time.time()
+
+    def exists(self, title):
+        return title in self.sheets
+
+    def grid_rows(self, title):
+        return self.sheets[title]['rows']
+
+    # First empty row of a worksheet, never inside the title and header rows
+    def next_row(self, title):
+        return max(FIRST_DATA_ROW, self.ledger.last_row(title) + 1 if title in self.ledger else 0)
+
+    def records(self, title):
+        return self.ledger.records(title) if title in self.ledger else []
+
+    # Read any of the given existing worksheets not yet in the snapshot
+    def ensure(self, spreadsheet, titles):
+        missing = [title for title in titles if title in self.sheets and title not in self.ledger]
+        if missing:
+            self.ledger.values.update(read_snapshot(spreadsheet, missing, columns='A:D', params=SNAPSHOT_PARAMS).values)
+
+    def save(self, path=SNAPSHOT_PATH):
+        data = {'spreadsheet': self.spreadsheet, 'fetched': self.fetched,
+                'sheets': self.sheets, 'values': self.ledger.values}
+        tmp = path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(data, f, default=str)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, spreadsheet, path=SNAPSHOT_PATH, max_age=SNAPSHOT_MAX_AGE):
+        try:
+            with open(path, encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if data.get('spreadsheet') != spreadsheet or time.time() - data.get('fetched', 0) > max_age:
+            return None
+        return cls(spreadsheet, data['sheets'], data['values'], data['fetched'])
+
+# Snapshot of the spreadsheet behind a WorksheetIndex, reading the given titles
+def read_workbook(spreadsheet, worksheet_index, titles):
+    sheets = {}
+    for title in worksheet_index.titles():
+        ws = worksheet_index.get(title)
+        sheets[title] = {'id': ws.id, 'rows': ws.row_count, 'cols': ws.col_count}
+    snapshot = WorkbookSnapshot(spreadsheet.title, sheets, {})
+    snapshot.ensure(spreadsheet, titles)
+    return snapshot
+
+# Drop the cached snapshot once the spreadsheet has been written to
+def invalidate_snapshot(path=SNAPSHOT_PATH):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+class UploadPlan:
+    def __init__(self, spreadsheet, bulk_scope):
+        self.spreadsheet = spreadsheet
+        self.bulk_scope = bulk_scope
+        # Titles of worksheets to create, in order
+        self.create = []
+        # {'worksheet', 'first_row', 'rows', 'grid_rows'} per worksheet to write to
+        self.blocks = []
+        # Worksheets whose rows were all uploaded before; their B2 is rewritten
+        self.completed = {}
+        # Title -> rows skipped because the journal or the sheet already has them
+        self.skipped = {}
+
+    def rows(self):
+        return sum(len(block['rows']) for block in self.blocks)
+
+    # API calls execute_plan() will make, by kind
+    def estimate_calls(self, batch_size=None):
+        batch_size = batch_size or sheets_backoff.batch_size
+        # Worksheets are created in batch_update calls, then the index is re-read once
+        writes = math.ceil(len(self.create) / MAX_WORKSHEETS_PER_CALL)
+        reads = 1 if self.create else 0
+        fitting = 0
+        for block in self.blocks:
+            overflows = block['first_row'] + len(block['rows']) - 1 > block['grid_rows']
+            if self.bulk_scope == 'spreadsheet' and not overflows:
+                fitting += len(block['rows'])
+            else:
+                writes += math.ceil(len(block['rows']) / batch_size)
+        writes += math.ceil(fitting / batch_size)
+        if self.blocks or self.completed:
+            writes += 1  # balance formulas
+        return {'reads': reads, 'writes': writes}
+
+    # Seconds the calls take at CALL_LATENCY each, plus waits once the burst is spent
+    def estimate_seconds(self, batch_size=None, latency=CALL_LATENCY):
+        seconds = 0.0
+        calls = self.estimate_calls(batch_size)
+        for kind, per_minute in (('reads', READS_PER_MINUTE), ('writes', WRITES_PER_MINUTE)):
+            count = calls[kind]
+            burst = max(1, min(BURST, per_minute))
+            quota_time = max(0, count - burst) * 60.0 / max(per_minute - burst, 1)
+            seconds += max(count * latency, quota_time)
+        return seconds
+
+# Build the plan for one upload. Rows are grouped by `key`; rows the journal
+# has recorded, and rows already present in the worksheet, are skipped.
+def plan_upload(df, key, snapshot, journal=None, bulk_scope='spreadsheet'):
+    plan = UploadPlan(snapshot.spreadsheet, bulk_scope)
+    for title, rows in iter_row_blocks(df, key):
+        # Copies of each row already uploaded, by the journal or by the sheet;
+        # counting copies lets repeated identical rows still go in
+        counts = journal.committed_counts(title) if journal else {}
+        present = {}
+        for record in snapshot.records(title):
+            if len(record) >= 4:
+                entry_key = row_key(record)
+                present[entry_key] = present.get(entry_key, 0) + 1
+        for entry_key, count in present.items():
+            counts[entry_key] = max(counts.get(entry_key, 0), count)
+        pending = pending_rows(rows, counts)
+        if len(pending) < len(rows):
+            plan.skipped[title] = len(rows) - len(pending)
+        if not pending:
+            if snapshot.exists(title):
+                plan.completed[title] = snapshot.next_row(title) - 1
+            continue
+
+        if snapshot.exists(title):
+            first_row, grid_rows = snapshot.next_row(title), snapshot.grid_rows(title)
+        else:
+            plan.create.append(title)
+            first_row, grid_rows = FIRST_DATA_ROW, NEW_WORKSHEET_ROWS
+        plan.blocks.append({'worksheet': title, 'first_row': first_row, 'rows': pending, 'grid_rows': grid_rows})
+    return plan
+
+def print_plan(plan):
+    print(f"Upload plan for {plan.spreadsheet}:")
+    for title in plan.create:
+        print(f"  create worksheet {title}")
+    for block in plan.blocks:
+        last_row = block['first_row'] + len(block['rows']) - 1
+        skipped = plan.skipped.get(block['worksheet'])
+        print(f"  {block['worksheet']}: {len(block['rows'])} rows -> rows {block['first_row']}-{last_row}"
+              + (f" ({skipped} already uploaded)" if skipped else ""))
+    for title in plan.completed:
+        print(f"  {title}: all {plan.skipped[title]} rows already uploaded")
+    calls = plan.estimate_calls()
+    print(f"Worksheets to create: {len(plan.create)}, rows to write: {plan.rows()}, "
+          f"duplicates skipped: {sum(plan.skipped.values())}")
+    print(f"Estimated {calls['reads']} read and {calls['writes']} write calls, about {plan.estimate_seconds():.0f}s")
+
+# Carry out a plan: create its worksheets, write its rows at the planned rows
+# and update the B2 formulas. on_created(title, sheet_id) is called for each
+# worksheet created. Returns the write report.
+def execute_plan(spreadsheet, worksheet_index, plan, on_written=None, on_created=None):
+    with recorder.stage('create worksheets'):
+        for title, sheet_id in provision_worksheets(spreadsheet, worksheet_index, plan.create,
+                                                    NEW_WORKSHEET_ROWS, NEW_WORKSHEET_COLS).items():
+            print(f"Created worksheet {title} (sheetId {sheet_id})")
+            if on_created:
+                on_created(title, sheet_id)
+
+    blocks = [(worksheet_index.worksheet(block['worksheet']), block['rows']) for block in plan.blocks]
+    with recorder.stage('write rows'):
+        if plan.bulk_scope == 'spreadsheet':
+            next_rows = {ws.id: block['first_row'] for (ws, _), block in zip(blocks, plan.blocks)}
+            report, last_rows = write_rows_bulk(spreadsheet, blocks, next_rows=next_rows, on_written=on_written)
+        else:
+            report, last_rows = write_rows_per_worksheet(blocks, on_written=on_written)
+    print_write_report(report)
+
+    # Worksheets finished by an earlier run may have been interrupted before
+    # their balance formula was updated
+    with recorder.stage('balance formulas'):
+        finished = [worksheet_index.worksheet(title) for title in plan.completed]
+        last_rows.update({ws.id: plan.completed[ws.title] for ws in finished})
+        update_balance_formulas(spreadsheet, [ws for ws, _ in blocks] + finished, last_rows)
+    invalidate_snapshot()
+    return report
+
+# Dry run: plan from the cached snapshot (reading and caching it when missing
+# or stale) and print the plan without writing anything
+def dry_run(client, sheet_name, df, key, journal=None, bulk_scope='spreadsheet'):
+    titles = df[key].unique().tolist()
+    snapshot = WorkbookSnapshot.load(sheet_name)
+    if snapshot is None or any(snapshot.exists(title) and title not in snapshot.ledger for title in titles):
+        spreadsheet = sheets_backoff.read(client.open, sheet_name)
+        if snapshot is None:
+            snapshot = read_workbook(spreadsheet, WorksheetIndex(spreadsheet), titles)
+        else:
+            snapshot.ensure(spreadsheet, titles)
+        snapshot.save()
+    else:
+        print(f"Using snapshot of {sheet_name} from {time.strftime('%H:%M:%S', time.localtime(snapshot.fetched))}")
+    plan = plan_upload(df, key, snapshot, journal, bulk_scope)
+    print_plan(plan)
+    return plan
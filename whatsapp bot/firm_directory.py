@@ -0,0 +1,144 @@
+import re
+import time
+import threading
+
+# Firm names are matched on upper-case letters and digits only, so
+# "k.k. narang" finds "K.K. NARANG TRADING CO. RKE"
+_NON_WORD = re.compile(r'[^A-Z0-9]+')
+
+def normalize(text):
+    return _NON_WORD.sub(' ', text.upper()).strip()
+
+# Character trigrams of each word, padded so short words and word starts count
+def trigrams(text):
+    grams = set()
+    for token in text.split():
+        padded = f"  {token} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+# Plain trigrams of the whole text, spaces included, so a query that starts or
+# ends inside a word ("ARANG" in "NARANG") shares all of them with the name
+def inner_trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+# Dice similarity of two trigram sets
+def similarity(a, b):
+    if not a or not b:
+        return 0.0
+    return 2.0 * len(a & b) / (len(a) + len(b))
+
+# Search index over the firm list, rebuilt whenever the list is reloaded
+class FirmIndex:
+    def __init__(self, names):
+        self.names = list(names)
+        self.normalized = [normalize(name) for name in self.names]
+        self.grams = [trigrams(name) for name in self.normalized]
+        self.by_gram = {}
+        self.by_inner = {}
+        self.by_prefix = {}
+        for firm_id, (name, grams) in enumerate(zip(self.normalized, self.grams)):
+            for gram in grams:
+                self.by_gram.setdefault(gram, set()).add(firm_id)
+            for gram in inner_trigrams(name):
+                self.by_inner.setdefault(gram, set()).add(firm_id)
+            for token in name.split():
+                for end in range(1, len(token) + 1):
+                    self.by_prefix.setdefault(token[:end], set()).add(firm_id)
+
+    def _ranked(self, firm_ids, query_grams, limit):
+        scored = sorted(((similarity(query_grams, self.grams[i]), i) for i in firm_ids),
+                        key=lambda item: (-item[0], self.names[item[1]]))
+        return [(self.names[i], round(score, 3)) for score, i in scored[:limit]]
+
+    # Tier and ranked (name, score) matches for a typed query, best tier first:
+    # 'exact' name, then names that 'contain' the query anywhere (the old
+    # behaviour), then names where every query word starts a word of the name
+    # ('prefix', "kapoor sre"), then 'fuzzy' trigram matches scoring at least
+    # min_score (typos). The tier is None when nothing matches.
+    def lookup(self, query, limit=10, min_score=0.35):
+        query = normalize(query)
+        if not query:
+            return None, []
+        query_grams = trigrams(query)
+
+        exact = [i for i, name in enumerate(self.normalized) if name == query]
+        if exact:
+            return 'exact', self._ranked(exact, query_grams, limit)
+
+        # A name containing the query has every unpadded trigram of it;
+        # queries under three characters are checked against every name
+        candidates = None
+        for gram in inner_trigrams(query):
+            postings = self.by_inner.get(gram, set())
+            candidates = postings if candidates is None else candidates & postings
+        if candidates is None:
+            candidates = range(len(self.names))
+        contains = [i for i in candidates if query in self.normalized[i]]
+        if contains:
+            return 'contains', self._ranked(contains, query_grams, limit)
+
+        prefixed = None
+        for token in query.split():
+            postings = self.by_prefix.get(token, set())
+            prefixed = postings if prefixed is None else prefixed & postings
+        if prefixed:
+            return 'prefix', self._ranked(prefixed, query_grams, limit)
+
+        fuzzy = set()
+        for gram in query_grams:
+            fuzzy |= self.by_gram.get(gram, set())
+        ranked = self._ranked(fuzzy, query_grams, len(fuzzy))
+        ranked = [match for match in ranked if match[1] >= min_score][:limit]
+        return ('fuzzy' if ranked else None), ranked
+
+    def search(self, query, limit=10, min_score=0.35):
+        return self.lookup(query, limit, min_score)[1]
+
+# Firm list cached for `ttl` seconds with its search index.
+# load() returns the firm names (e.g. from the ledger mirror or INDEX sheet);
+# version(), when given, is checked on every access and a change (such as a
+# new mirror sync time) reloads the list at once. invalidate() forces a reload.
+class FirmDirectory:
+    def __init__(self, load, ttl=300, version=None):
+        self.load = load
+        self.ttl = ttl
+        self.version = version
+        self.lock = threading.Lock()
+        self.index = None
+        self.loaded_at = 0.0
+        self.loaded_version = None
+
+    def invalidate(self):
+        with self.lock:
+            self.index = None
+
+    def _current(self):
+        version = self.version() if self.version else None
+        with self.lock:
+            fresh = (self.index is not None
+                     and time.monotonic() - self.loaded_at < self.ttl
+                     and version == self.loaded_version)
+            if fresh:
+                return self.index
+        index = FirmIndex(self.load())
+        with self.lock:
+            self.index = index
+            self.loaded_at = time.monotonic()
+            self.loaded_version = version
+        return index
+
+    def names(self):
+        return list(self._current().names)
+
+    # Firm names matching a typed query, best first
+    def search(self, query, limit=10):
+        return [name for name, _ in self._current().search(query, limit)]
+
+    # (names, certain): certain is True only when the query names one firm
+    # exactly or is contained in exactly one name, so the firm can be used
+    # without asking; prefix and fuzzy matches are always offered as options
+    def resolve(self, query, limit=10):
+        tier, matches = self._current().lookup(query, limit)
+        names = [name for name, _ in matches]
+        return names, tier in ('exact', 'contains') and len(names) == 1
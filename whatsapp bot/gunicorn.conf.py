@@ -0,0 +1,18 @@
+import os
+
+# Production server for the WhatsApp bot:
+#   cd "whatsapp bot" && gunicorn -c gunicorn.conf.py sendmsg:app
+# Workers share the ledger mirror, the statement PDF cache and the cache of
+# live Sheets reads through SQLite files in this directory, so adding workers
+# adds throughput without adding Sheets calls. Sessions are signed cookies and
+# need the same FLASK_SECRET_KEY in every worker, which .env provides.
+bind = os.getenv('BOT_BIND', '0.0.0.0:8000')
+workers = int(os.getenv('BOT_WORKERS', '2'))
+threads = int(os.getenv('BOT_THREADS', '4'))
+worker_class = 'gthread'
+# Twilio waits 15 seconds for the webhook; statements are sent in the background
+timeout = 30
+
+# The app is imported in each worker after the fork, so every worker opens its
+# own SQLite connections, Sheets/Twilio clients and statement thread pool
+preload_app = False
@@ -0,0 +1,167 @@
+import os
+import sys
+import sqlite3
+import threading
+from datetime import datetime
+from dotenv import load_dotenv
+
+# Shared Sheets helpers live in the repository root
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from sheets_snapshot import read_ranges, read_snapshot, a1_range
+
+# Load environment variables
+load_dotenv()
+
+# Local SQLite copy of the INDEX firm list, each firm's B2 balance and ledger rows.
+# The bot answers from it; `python ledger_mirror.py` refreshes it from Sheets
+# and is meant to run from cron (or after each upload).
+MIRROR_PATH = os.getenv('LEDGER_MIRROR_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ledger_mirror.db'))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS firms (
+    name TEXT PRIMARY KEY,
+    position INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS balances (
+    firm TEXT PRIMARY KEY,
+    balance TEXT
+);
+CREATE TABLE IF NOT EXISTS entries (
+    firm TEXT NOT NULL,
+    row INTEGER NOT NULL,
+    date TEXT,
+    date_text TEXT NOT NULL,
+    ref_no TEXT NOT NULL,
+    credit REAL NOT NULL,
+    debit REAL NOT NULL,
+    PRIMARY KEY (firm, row)
+);
+CREATE INDEX IF NOT EXISTS entries_firm_date ON entries (firm, date);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+# Date formats found in column A of the firm sheets
+DATE_FORMATS = ('%d-%m-%Y', '%Y-%m-%d', '%d/%m/%Y')
+
+# ISO date of a ledger date cell, or None when it cannot be parsed
+def parse_date(text):
+    text = text.strip().strip('()')
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(text, fmt).date().isoformat()
+        except ValueError:
+            continue
+    return None
+
+def parse_amount(text):
+    try:
+        return float(str(text).replace(',', ''))
+    except ValueError:
+        return 0.0
+
+# Ledger rows of one firm sheet in the shape stored in `entries`
+def ledger_entries(firm, rows, first_row=4):
+    entries = []
+    for row_number, record in enumerate(rows, start=first_row):
+        if len(record) < 3 or not record[0].strip():
+            continue
+        record = record + [''] * (4 - len(record))
+        entries.append((firm, row_number, parse_date(record[0]), record[0].strip('()'),
+                        record[1], parse_amount(record[2]), parse_amount(record[3])))
+    return entries
+
+class LedgerMirror:
+    def __init__(self, path=MIRROR_PATH):
+        self.path = path
+        self.local = threading.local()
+        with self.connect() as conn:
+            conn.executescript(SCHEMA)
+
+    # One connection per thread and process; the bot may run as several gunicorn
+    # workers with several threads each. WAL lets them read during a sync.
+    def connect(self):
+        conn = getattr(self.local, 'conn', None)
+        if conn is None or self.local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self.local.conn = conn
+            self.local.pid = os.getpid()
+        return conn
+
+    def is_empty(self):
+        return self.connect().execute("SELECT 1 FROM firms LIMIT 1").fetchone() is None
+
+    def last_synced(self):
+        row = self.connect().execute("SELECT value FROM meta WHERE key = 'synced_at'").fetchone()
+        return row[0] if row else None
+
+    def firm_names(self):
+        return [name for (name,) in self.connect().execute("SELECT name FROM firms ORDER BY position")]
+
+    # Balance as displayed in B2, or None when the firm has no sheet or no balance
+    def balance(self, firm):
+        row = self.connect().execute("SELECT balance FROM balances WHERE firm = ?", (firm,)).fetchone()
+        return row[0] if row else None
+
+    def has_firm(self, firm):
+        return self.connect().execute("SELECT 1 FROM balances WHERE firm = ?", (firm,)).fetchone() is not None
+
+    # [date, ref no, credit, debit] rows with start <= date <= end (ISO dates), in sheet order
+    def records(self, firm, start, end):
+        return [list(row) for row in self.connect().execute(
+            "SELECT date_text, ref_no, credit, debit FROM entries "
+            "WHERE firm = ? AND date BETWEEN ? AND ? ORDER BY row",
+            (firm, start, end))]
+
+    # (ISO date, ref no, credit, debit) of every entry of a firm, in sheet order
+    def entries(self, firm):
+        return self.connect().execute(
+            "SELECT date, ref_no, credit, debit FROM entries WHERE firm = ? ORDER BY row", (firm,)).fetchall()
+
+    # Replace the mirror with the current state of the spreadsheet in one transaction
+    def sync(self, spreadsheet, worksheet_titles):
+        index_rows = read_ranges(spreadsheet, [a1_range('INDEX', 'A2:A')])[0]
+        firms = [row[0] for row in index_rows if row and row[0]]
+        titles = [title for title in worksheet_titles if title.lower() != 'index']
+        snapshot = read_snapshot(spreadsheet, titles, columns='A:D')
+
+        conn = self.connect()
+        with conn:
+            conn.execute("DELETE FROM firms")
+            conn.execute("DELETE FROM balances")
+            conn.execute("DELETE FROM entries")
+            conn.executemany("INSERT OR IGNORE INTO firms (name, position) VALUES (?, ?)",
+                             [(name, position) for position, name in enumerate(firms)])
+            conn.executemany("INSERT INTO balances (firm, balance) VALUES (?, ?)",
+                             [(title, snapshot.balance(title)) for title in titles])
+            for title in titles:
+                conn.executemany("INSERT INTO entries VALUES (?, ?, ?, ?, ?, ?, ?)",
+                                 ledger_entries(title, snapshot.records(title)))
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('synced_at', ?)",
+                         (datetime.now().isoformat(timespec='seconds'),))
+        return len(firms), len(titles)
+
+if __name__ == "__main__":
+    import gspread
+    from google.oauth2.service_account import Credentials
+    from backoff import sheets_backoff
+    from worksheet_index import WorksheetIndex
+    from shared_cache import SharedCache
+
+    SCOPES = ['https://www.googleapis.com/auth/spreadsheets','https://www.googleapis.com/auth/userinfo.email','https://www.googleapis.com/auth/drive.readonly']
+    credentials_file = os.getenv('GOOGLE_SHEETS_CREDENTIALS_FILE')
+    if not credentials_file:
+        raise ValueError("GOOGLE_SHEETS_CREDENTIALS_FILE environment variable is not set")
+
+    creds = Credentials.from_service_account_file(credentials_file, scopes=SCOPES)
+    client = gspread.authorize(creds)
+    spreadsheet = sheets_backoff.read(client.open, '2024-2025')
+
+    mirror = LedgerMirror()
+    firm_count, sheet_count = mirror.sync(spreadsheet, WorksheetIndex(spreadsheet).titles())
+    print(f"Synced {firm_count} firms and {sheet_count} worksheets into {mirror.path}")
+    # Values the bot processes read live before the sync are now in the mirror
+    SharedCache().invalidate()
@@ -0,0 +1,177 @@
+import threading
+from collections import OrderedDict
+import numpy as np
+
+from ledger_mirror import parse_date, parse_amount
+
+# Columnar, in-memory copy of one firm's ledger for the bot. Entries are kept
+# in date order as NumPy arrays: day numbers (datetime64[D]), credit and debit
+# in paise (int64, so sums are exact) and ref numbers as indexes into a table
+# of the firm's distinct refs, stored as fixed-width UTF-8 bytes. Prefix sums over the amounts, with the row
+# offset at which each calendar month starts, make the totals of any month
+# and the balance brought forward into it O(1); any other date range costs
+# two binary searches.
+EPOCH_YEAR = 1970
+
+def month_number(year, month):
+    return (int(year) - EPOCH_YEAR) * 12 + int(month) - 1
+
+# 'dd-mm-YYYY' -> 'YYYY-mm-dd' by slicing; other formats go through parse_date
+def iso_date(text):
+    text = text.strip().strip('()')
+    if len(text) == 10 and text[2] == '-' and text[5] == '-':
+        return f"{text[6:]}-{text[3:5]}-{text[:2]}"
+    return parse_date(text)
+
+def to_paise(values):
+    return np.round(np.asarray(values, dtype=np.float64) * 100).astype(np.int64)
+
+class FirmLedger:
+    def __init__(self, days, refs, credit, debit):
+        order = np.argsort(days, kind='stable')  # ties keep sheet order
+        self.days = days[order]
+        encoded = np.array([ref.encode('utf-8') for ref in refs], dtype=bytes) if refs else np.array([], dtype='S1')
+        self.ref_table, ref_ids = np.unique(encoded[order], return_inverse=True)
+        self.ref_ids = ref_ids.astype(np.int32)
+        self.credit = credit[order]
+        self.debit = debit[order]
+        # cum_x[i] is the sum of the first i entries
+        self.cum_credit = np.concatenate(([0], np.cumsum(self.credit)))
+        self.cum_debit = np.concatenate(([0], np.cumsum(self.debit)))
+        # month_start[m] is the first entry of month first_month + m; one extra
+        # offset closes the last month
+        months = self.days.astype('datetime64[M]').astype(np.int64)
+        self.first_month = int(months[0]) if len(months) else 0
+        span = int(months[-1]) - self.first_month + 1 if len(months) else 0
+        self.month_start = np.searchsorted(months, self.first_month + np.arange(span + 1)).astype(np.int32)
+
+    # From [date, ref no, credit, debit] sheet rows (row 4 on). Rows without a
+    # credit cell or with an unreadable date are left out, as month_rows() would.
+    @classmethod
+    def from_records(cls, records):
+        dates, refs, credit, debit = [], [], [], []
+        for record in records:
+            if len(record) < 3 or not str(record[0]).strip():
+                continue
+            day = iso_date(str(record[0]))
+            if day is None:
+                continue
+            dates.append(day)
+            refs.append(str(record[1]))
+            credit.append(parse_amount(record[2]))
+            debit.append(parse_amount(record[3]) if len(record) > 3 else 0.0)
+        try:
+            days = np.array(dates, dtype='datetime64[D]')
+        except ValueError:
+            # A sliced date that is not a real day (e.g. 31-02-2024): check each one
+            keep = [parse_date(day) is not None for day in dates]
+            dates, refs, credit, debit = ([value for value, ok in zip(column, keep) if ok]
+                                          for column in (dates, refs, credit, debit))
+            days = np.array(dates, dtype='datetime64[D]')
+        return cls(days, refs, to_paise(credit), to_paise(debit))
+
+    # From (ISO date, ref no, credit, debit) rows of the ledger mirror
+    @classmethod
+    def from_entries(cls, entries):
+        entries = [entry for entry in entries if entry[0]]
+        return cls(np.array([entry[0] for entry in entries], dtype='datetime64[D]'),
+                   [str(entry[1]) for entry in entries],
+                   to_paise([entry[2] for entry in entries]), to_paise([entry[3] for entry in entries]))
+
+    def __len__(self):
+        return len(self.days)
+
+    # Entry offsets [first, last) of a calendar month, O(1)
+    def month_bounds(self, year, month):
+        m = month_number(year, month) - self.first_month
+        last_month = len(self.month_start) - 1
+        if m < 0:
+            return 0, 0
+        if m >= last_month:
+            return len(self.days), len(self.days)
+        return int(self.month_start[m]), int(self.month_start[m + 1])
+
+    # Entry offsets [first, last) of the ISO dates start..end, both inclusive
+    def date_bounds(self, start, end):
+        first = int(np.searchsorted(self.days, np.datetime64(start, 'D'), side='left'))
+        last = int(np.searchsorted(self.days, np.datetime64(end, 'D'), side='right'))
+        return first, max(first, last)
+
+    # (credit, debit) of the entries in [first, last), in rupees
+    def totals(self, first, last):
+        return ((int(self.cum_credit[last]) - int(self.cum_credit[first])) / 100,
+                (int(self.cum_debit[last]) - int(self.cum_debit[first])) / 100)
+
+    # Credit minus debit of every entry before offset first, as B2 would show it then
+    def balance_before(self, first):
+        return (int(self.cum_credit[first]) - int(self.cum_debit[first])) / 100
+
+    def month_totals(self, year, month):
+        return self.totals(*self.month_bounds(year, month))
+
+    # Balance brought forward into a month
+    def opening_balance(self, year, month):
+        return self.balance_before(self.month_bounds(year, month)[0])
+
+    # Net of the month alone: positive is payable, negative receivable
+    def month_net(self, year, month):
+        credit, debit = self.month_totals(year, month)
+        return credit - debit
+
+    # [date, ref no, credit, debit] rows of entries [first, last) for rendering
+    def records(self, first, last):
+        days = np.datetime_as_string(self.days[first:last])
+        refs = [ref.decode('utf-8') for ref in self.ref_table[self.ref_ids[first:last]].tolist()]
+        return [[f"{day[8:10]}-{day[5:7]}-{day[:4]}", ref, credit / 100, debit / 100]
+                for day, ref, credit, debit in zip(days, refs, self.credit[first:last].tolist(),
+                                                   self.debit[first:last].tolist())]
+
+    def month_records(self, year, month):
+        return self.records(*self.month_bounds(year, month))
+
+    # Bytes held by the arrays, ref table included
+    def nbytes(self):
+        arrays = (self.days, self.ref_ids, self.credit, self.debit, self.cum_credit, self.cum_debit,
+                  self.month_start, self.ref_table)
+        return sum(array.nbytes for array in arrays)
+
+# FirmLedgers of recently asked-for firms, at most max_firms of them.
+# load(firm) builds a FirmLedger, or returns None for an unknown firm.
+# version(), when given, is checked on every access and a change (a new
+# mirror sync) drops every ledger, as in FirmDirectory.
+class LedgerStore:
+    def __init__(self, load, version=None, max_firms=256):
+        self.load = load
+        self.version = version
+        self.max_firms = max_firms
+        self.lock = threading.Lock()
+        self.ledgers = OrderedDict()
+        self.loaded_version = None
+
+    def invalidate(self):
+        with self.lock:
+            self.ledgers.clear()
+
+    def get(self, firm):
+        version = self.version() if self.version else None
+        with self.lock:
+            if version != self.loaded_version:
+                self.ledgers.clear()
+                self.loaded_version = version
+            ledger = self.ledgers.get(firm)
+            if ledger is not None:
+                self.ledgers.move_to_end(firm)
+                return ledger
+        ledger = self.load(firm)
+        if ledger is None:
+            return None
+        with self.lock:
+            if version == self.loaded_version:
+                self.ledgers[firm] = ledger
+                while len(self.ledgers) > self.max_firms:
+                    self.ledgers.popitem(last=False)
+        return ledger
+
+    def nbytes(self):
+        with self.lock:
+            return sum(ledger.nbytes() for ledger in self.ledgers.values())
@@ -0,0 +1,99 @@
+import os
+import sys
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dotenv import load_dotenv
+
+from statement_pdf import parse_month_year, month_rows, render_statement
+
+# Shared Sheets helpers live in the repository root
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Load environment variables
+load_dotenv()
+
+# Month-end statements for every firm in INDEX.
+# The ledger is read once with a bulk snapshot; the PDFs are rendered in
+# parallel on a process pool, one firm per task.
+#   python month_end.py MAY 24 [--workers 8] [--out static/month_end]
+
+# Render one firm's statement; runs in a worker process.
+# Returns (firm, path or None, error or None, row count, seconds).
+def render_firm(firm_name, all_records, month_numeric, year, month_text, out_dir):
+    start = time.perf_counter()
+    try:
+        records = month_rows(all_records, month_numeric, year)
+        if not records:
+            return firm_name, None, None, 0, time.perf_counter() - start
+        path = os.path.join(out_dir, f"{firm_name.replace(' ', '_')}_{month_numeric}-{year}.pdf")
+        render_statement(firm_name, f"{month_text} {year}", records, path)
+        return firm_name, path, None, len(records), time.perf_counter() - start
+    except Exception as e:
+        return firm_name, None, str(e), 0, time.perf_counter() - start
+
+def render_all(snapshot, firms, month_year, out_dir, workers=None):
+    month_text, month_numeric, year = parse_month_year(month_year)
+    os.makedirs(out_dir, exist_ok=True)
+    results = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = []
+        for firm_name in firms:
+            if firm_name not in snapshot:
+                results.append((firm_name, None, "worksheet not found", 0, 0.0))
+                continue
+            futures.append(pool.submit(render_firm, firm_name, snapshot.all_values(firm_name),
+                                       month_numeric, year, month_text, out_dir))
+        for future in as_completed(futures):
+            results.append(future.result())
+    return results
+
+def print_report(results, elapsed):
+    rendered = [r for r in results if r[1]]
+    empty = [r for r in results if not r[1] and not r[2]]
+    failed = [r for r in results if r[2]]
+    for firm_name, path, error, rows, seconds in sorted(results, key=lambda r: -r[4]):
+        status = path if path else (f"FAILED: {error}" if error else "no entries")
+        print(f"{seconds * 1000:8.1f} ms  {rows:5} rows  {firm_name}: {status}")
+    render_time = sum(r[4] for r in results)
+    print(f"Rendered {len(rendered)} statements, {len(empty)} firms without entries, "
+          f"{len(failed)} failures in {elapsed:.1f}s ({render_time:.1f}s of rendering)")
+    for firm_name, _, error, _, _ in failed:
+        print(f"  {firm_name}: {error}")
+
+if __name__ == "__main__":
+    import gspread
+    from google.oauth2.service_account import Credentials
+    from backoff import sheets_backoff
+    from worksheet_index import WorksheetIndex
+    from sheets_snapshot import read_ranges, read_snapshot, a1_range
+
+    parser = argparse.ArgumentParser(description="Render month-end statements for every firm in INDEX")
+    parser.add_argument('month', help="month name, e.g. MAY")
+    parser.add_argument('year', help="year, e.g. 24 or 2024")
+    parser.add_argument('--workers', type=int, default=None, help="worker processes (default: one per core)")
+    parser.add_argument('--out', default=os.path.join('static', 'month_end'), help="output directory")
+    parser.add_argument('--spreadsheet', default='2024-2025')
+    args = parser.parse_args()
+
+    SCOPES = ['https://www.googleapis.com/auth/spreadsheets','https://www.googleapis.com/auth/userinfo.email','https://www.googleapis.com/auth/drive.readonly']
+    credentials_file = os.getenv('GOOGLE_SHEETS_CREDENTIALS_FILE')
+    if not credentials_file:
+        raise ValueError("GOOGLE_SHEETS_CREDENTIALS_FILE environment variable is not set")
+
+    start = time.perf_counter()
+    creds = Credentials.from_service_account_file(credentials_file, scopes=SCOPES)
+    client = gspread.authorize(creds)
+    spreadsheet = sheets_backoff.read(client.open, args.spreadsheet)
+
+    # INDEX and every firm sheet in a handful of batchGet calls
+    firms = [row[0] for row in read_ranges(spreadsheet, [a1_range('INDEX', 'A2:A')])[0] if row and row[0]]
+    titles = set(WorksheetIndex(spreadsheet).titles())
+    snapshot = read_snapshot(spreadsheet, [firm for firm in firms if firm in titles], columns='A:D')
+    print(f"Read {len(snapshot)} firm sheets in {time.perf_counter() - start:.1f}s")
+
+    month_year = f"{args.month} {args.year}"
+    _, month_numeric, year = parse_month_year(month_year)
+    out_dir = os.path.join(args.out, f"{month_numeric}-{year}")
+    results = render_all(snapshot, firms, month_year, out_dir, args.workers)
+    print_report(results, time.perf_counter() - start)
@@ -0,0 +1,152 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+
+# Generated statement PDFs, stored under a name derived from the firm, the
+# period and a hash of the ledger rows that went into them. The same rows
+# always map to the same file, so an unchanged statement is never rendered twice;
+# new rows give a new hash and the firm's older file for that period is dropped.
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static', 'statements')
+CACHE_MAX_BYTES = int(os.getenv('STATEMENT_CACHE_MAX_MB', '200')) * 1024 * 1024
+CACHE_MAX_AGE = int(os.getenv('STATEMENT_CACHE_MAX_AGE_DAYS', '90')) * 24 * 3600
+# How long a closed period's PDF is served without re-reading the sheet; back-dated
+# edits to the period show up once it has passed
+CLOSED_PERIOD_TTL = int(os.getenv('STATEMENT_CLOSED_TTL_MINUTES', '60')) * 60
+# PDFs used this recently are never evicted: Twilio may not have fetched them yet
+FETCH_GRACE = int(os.getenv('STATEMENT_FETCH_GRACE_MINUTES', '10')) * 60
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pdfs (
+    firm TEXT NOT NULL,
+    period TEXT NOT NULL,
+    rows_hash TEXT NOT NULL,
+    path TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    last_used REAL NOT NULL,
+    PRIMARY KEY (firm, period)
+);
+"""
+
+# Stable hash of the rows a statement is rendered from
+def rows_hash(rows):
+    payload = json.dumps([[str(cell) for cell in row] for row in rows], separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+class PdfCache:
+    def __init__(self, directory=CACHE_DIR, max_bytes=CACHE_MAX_BYTES, max_age=CACHE_MAX_AGE,
+                 grace=FETCH_GRACE):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.grace = grace
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        with self.connect() as conn:
+            conn.executescript(SCHEMA)
+
+    # One connection per thread and process, as statement jobs run on a worker
+    # pool in each gunicorn worker; all of them share the directory and index
+    def connect(self):
+        conn = getattr(self.local, 'conn', None)
+        if conn is None or self.local.pid != os.getpid():
+            conn = sqlite3.connect(os.path.join(self.directory, 'index.db'), timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self.local.conn = conn
+            self.local.pid = os.getpid()
+        return conn
+
+    def path_for(self, firm, period, digest):
+        return os.path.join(self.directory, f"{firm.replace(' ', '_')}_{period}_{digest[:16]}.pdf")
+
+    def _entry(self, firm, period):
+        row = self.connect().execute(
+            "SELECT rows_hash, path, created FROM pdfs WHERE firm = ? AND period = ?", (firm, period)).fetchone()
+        if row is None or not os.path.exists(row[1]):
+            return None
+        with self.connect() as conn:
+            conn.execute("UPDATE pdfs SET last_used = ? WHERE firm = ? AND period = ?",
+                         (time.time(), firm, period))
+        return row
+
+    # Path of the PDF rendered from exactly these rows, or None
+    def get(self, firm, period, digest):
+        entry = self._entry(firm, period)
+        return entry[1] if entry and entry[0] == digest else None
+
+    # Path of the last PDF rendered for the period whatever its rows, if it was
+    # rendered or confirmed against the sheet within max_age seconds, or None.
+    # Only meant for closed periods, whose rows rarely change.
+    def latest(self, firm, period, max_age=CLOSED_PERIOD_TTL):
+        entry = self._entry(firm, period)
+        return entry[1] if entry and entry[2] >= time.time() - max_age else None
+
+    # Mark the period's PDF as just checked against the sheet
+    def confirm(self, firm, period):
+        with self.connect() as conn:
+            conn.execute("UPDATE pdfs SET created = ? WHERE firm = ? AND period = ?",
+                         (time.time(), firm, period))
+
+    # Store a PDF rendered by render(path) for these rows and return its path
+    def put(self, firm, period, digest, render):
+        path = self.path_for(firm, period, digest)
+        partial = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        render(partial)
+        os.replace(partial, path)
+        now = time.time()
+        with self.lock:
+            conn = self.connect()
+            old = conn.execute("SELECT path FROM pdfs WHERE firm = ? AND period = ?", (firm, period)).fetchone()
+            with conn:
+                conn.execute("INSERT OR REPLACE INTO pdfs VALUES (?, ?, ?, ?, ?, ?, ?)",
+                             (firm, period, digest, path, os.path.getsize(path), now, now))
+            if old and old[0] != path:
+                self._remove(old[0])
+            self.evict()
+        return path
+
+    def invalidate(self, firm, period):
+        with self.lock:
+            conn = self.connect()
+            row = conn.execute("SELECT path FROM pdfs WHERE firm = ? AND period = ?", (firm, period)).fetchone()
+            with conn:
+                conn.execute("DELETE FROM pdfs WHERE firm = ? AND period = ?", (firm, period))
+            if row:
+                self._remove(row[0])
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    # Drop entries older than max_age, then least recently used ones until
+    # the cache fits in max_bytes. Entries handed out within the last `grace`
+    # seconds are kept either way, as a message may still be fetching them.
+    def evict(self):
+        conn = self.connect()
+        entries = conn.execute("SELECT firm, period, path, size, created, last_used FROM pdfs "
+                               "ORDER BY last_used DESC").fetchall()
+        now = time.time()
+        cutoff = now - self.max_age
+        kept_bytes = 0
+        evicted = []
+        for firm, period, path, size, created, last_used in entries:
+            if last_used >= now - self.grace:
+                kept_bytes += size
+            elif created < cutoff or kept_bytes + size > self.max_bytes:
+                evicted.append((firm, period, path))
+            else:
+                kept_bytes += size
+        if evicted:
+            with conn:
+                conn.executemany("DELETE FROM pdfs WHERE firm = ? AND period = ?",
+                                 [(firm, period) for firm, period, _ in evicted])
+            for _, _, path in evicted:
+                self._remove(path)
+            print(f"Evicted {len(evicted)} cached statements")
+        return len(evicted)
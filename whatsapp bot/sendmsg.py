@@ -1,166 +1,261 @@
 from flask import Flask, request, session
 from twilio.twiml.messaging_response import MessagingResponse
-from twilio.rest import Client
-import gspread
-from google.oauth2.service_account import Credentials
-from gspread.exceptions import WorksheetNotFound
-from fuzzywuzzy import process
-from fuzzywuzzy import fuzz
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
-from datetime import datetime
-from fpdf import FPDF
+from datetime import date
+from urllib.parse import quote
 import os
-from babel.numbers import format_decimal
+import sys
+import time
+import threading
 from dotenv import load_dotenv
 
+# Shared Sheets helpers live in the repository root
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from backoff import sheets_backoff
+from worksheet_index import WorksheetIndex
+from ledger_mirror import LedgerMirror
+from firm_directory import FirmDirectory
+from instrumentation import instrument, recorder
+from statement_worker import StatementWorker
+from pdf_cache import PdfCache, rows_hash
+from shared_cache import SharedCache
+from statement_fetch import read_period_rows
+from statement_pdf import parse_period, render_statement, char_widths
+
 # Load environment variables
 load_dotenv()
 
-app = Flask(__name__)
+app = Flask(__name__, static_folder=os.getenv('BOT_STATIC_DIR', 'static'))
 app.secret_key = os.getenv('FLASK_SECRET_KEY')
 
 
 SCOPES = ['https://www.googleapis.com/auth/spreadsheets','https://www.googleapis.com/auth/userinfo.email','https://www.googleapis.com/auth/drive.readonly']
 
-# Get credentials file path from environment variable
-credentials_file = os.getenv('GOOGLE_SHEETS_CREDENTIALS_FILE')
-if not credentials_file:
-    raise ValueError("GOOGLE_SHEETS_CREDENTIALS_FILE environment variable is not set")
-
-creds = Credentials.from_service_account_file(credentials_file, scopes=SCOPES)
-client = gspread.authorize(creds)
-spreadsheet = client.open('2024-2025')
+# The Sheets and Twilio clients are built on first use rather than at import,
+# together with their libraries, so the process starts fast and without
+# network access. GET /warmup builds them ahead of the first message.
+clients = {}
+clients_lock = threading.Lock()
+
+def lazy_client(name, build):
+    client = clients.get(name)
+    if client is None:
+        with clients_lock:
+            client = clients.get(name)
+            if client is None:
+                client = clients[name] = build()
+    return client
+
+def connect_sheets():
+    import gspread
+    from google.oauth2.service_account import Credentials
+
+    # Get credentials file path from environment variable
+    credentials_file = os.getenv('GOOGLE_SHEETS_CREDENTIALS_FILE')
+    if not credentials_file:
+        raise ValueError("GOOGLE_SHEETS_CREDENTIALS_FILE environment variable is not set")
+
+    creds = Credentials.from_service_account_file(credentials_file, scopes=SCOPES)
+    client = instrument(gspread.authorize(creds), 'sheets')
+    spreadsheet = sheets_backoff.read(client.open, '2024-2025')
+    # Firm tabs are looked up from one metadata fetch, refreshed when a new firm is missing
+    return WorksheetIndex(spreadsheet, refresh_after=300)
+
+def get_worksheet_index():
+    return lazy_client('sheets', connect_sheets)
+
+def connect_twilio():
+    from twilio.rest import Client
+
+    account_sid = os.getenv('TWILIO_ACCOUNT_SID')
+    if not account_sid:
+        raise ValueError("TWILIO_ACCOUNT_SID environment variable is not set")
+
+    auth_token = os.getenv('TWILIO_AUTH_TOKEN')
+    if not auth_token:
+        raise ValueError("TWILIO_AUTH_TOKEN environment variable is not set")
+
+    return instrument(Client(account_sid, auth_token), 'twilio')
+
+def get_twilio_client():
+    return lazy_client('twilio', connect_twilio)
+
+# Local copy of INDEX, balances and ledger rows, refreshed by `python ledger_mirror.py`.
+# Replies come from it; Sheets is only read for firms the mirror doesn't have yet.
+ledger_mirror = LedgerMirror()
+
+# Rendered statements, reused while the rows behind them are unchanged. They are
+# sent as links to Flask's static folder, so STATEMENT_CACHE_DIR is a folder
+# inside it whatever directory the bot is started from.
+def statement_cache_dir():
+    static = os.path.abspath(app.static_folder)
+    directory = os.path.abspath(os.path.join(static, os.getenv('STATEMENT_CACHE_DIR', 'statements')))
+    if os.path.commonpath([static, directory]) != static:
+        raise ValueError(f"STATEMENT_CACHE_DIR must be inside the static folder {static}")
+    return directory
+
+statement_cache = PdfCache(statement_cache_dir())
+
+# Public URL of a file in the static folder, as url_for('static', ..., _external=True)
+# would build it; statements are sent from worker threads, outside any request
+def static_url(base_url, path):
+    relative = os.path.relpath(path, os.path.abspath(app.static_folder)).replace(os.sep, '/')
+    return f"{base_url}{app.static_url_path}/{quote(relative)}"
+
+# Values read live from Sheets, shared by all worker processes so each one is
+# read once per BOT_CACHE_TTL seconds however many workers ask for it
+shared_cache = SharedCache()
+CACHE_TTL = int(os.getenv('BOT_CACHE_TTL', '120'))
 
 # Function to retrieve firm names from column A (excluding header)
 def get_firm_names():
-    index_sheet = spreadsheet.worksheet('INDEX')
-    firms = index_sheet.col_values(1)[1:]  # Get all values in column A starting from row 2
+    if not ledger_mirror.is_empty():
+        return ledger_mirror.firm_names()
+    return shared_cache.get_or_load('firms', read_firm_names, CACHE_TTL)
+
+def read_firm_names():
+    index_sheet = get_worksheet_index().worksheet('INDEX')
+    firms = sheets_backoff.read(index_sheet.col_values, 1)[1:]  # Get all values in column A starting from row 2
     return firms
 
-def get_balance(firm_name):
-    try:
-        sheet = spreadsheet.worksheet(firm_name)
-        balance = sheet.cell(2, 2).value  # Assuming balance is in cell B2
-        return balance
-    except WorksheetNotFound as e:
-        print(f"Worksheet '{firm_name}' not found: {e}")
+# Firm list and its search index, kept for FIRM_DIRECTORY_TTL seconds and
+# reloaded straight away when the mirror is synced or the shared cache is
+# invalidated, by this or any other worker
+firm_directory = FirmDirectory(get_firm_names, ttl=int(os.getenv('FIRM_DIRECTORY_TTL', '300')),
+                               version=lambda: (ledger_mirror.last_synced(), shared_cache.generation()))
+
+# Columnar ledgers of mirrored firms (ledger_store.py), built on first use
+# so NumPy is not imported at start-up; dropped when the mirror is synced
+def connect_ledger_store():
+    from ledger_store import FirmLedger, LedgerStore
+    return LedgerStore(lambda firm: FirmLedger.from_entries(ledger_mirror.entries(firm)),
+                       version=ledger_mirror.last_synced,
+                       max_firms=int(os.getenv('LEDGER_STORE_MAX_FIRMS', '256')))
+
+def get_ledger_store():
+    return lazy_client('ledgers', connect_ledger_store)
+
+def get_balance(firm_name, snapshot=None):
+    if snapshot is not None and firm_name in snapshot:
+        return snapshot.balance(firm_name)
+    if ledger_mirror.has_firm(firm_name):
+        return ledger_mirror.balance(firm_name)
+    return shared_cache.get_or_load(f"balance:{firm_name}", lambda: read_balance(firm_name), CACHE_TTL)
+
+def read_balance(firm_name):
+    sheet = get_worksheet_index().get(firm_name)
+    if sheet is None:
+        print(f"Worksheet '{firm_name}' not found")
         return None
-
-def generate_pdf(firm_name, month_year):
+    balance = sheets_backoff.read(sheet.cell, 2, 2).value  # Assuming balance is in cell B2
+    return balance
+
+# {'rows', 'opening'} of a firm's worksheet for a StatementPeriod, or None when
+# it has no worksheet. Only column A, the period's rows and the amounts dated
+# after it are read, not the whole ledger.
+def read_period(firm_name, period):
+    statement_sheet = get_worksheet_index().get(firm_name)
+    if statement_sheet is None:
+        return None
+    rows, opening = read_period_rows(statement_sheet, period.start, period.end)
+    return {'rows': rows, 'opening': opening}
+
+# Statement for a month ("JAN 24"), a quarter ("Q1 24-25"), a financial year
+# ("FY 24-25") or a range ("01-04-24 to 30-06-24"), with the balance brought
+# forward and a running balance. A year costs the same as a month: the rows are
+# one slice of a date-ordered ledger and the opening balance one prefix sum.
+# snapshot, when given, is a LedgerSnapshot already holding the firm's rows
+# (e.g. from a bulk read) and saves reading the worksheet again
+def generate_pdf(firm_name, period_text, snapshot=None):
     try:
-        # Convert month input to numeric format
-        month_text, year_input = month_year.split()
-        year = f"20{year_input}"
-        month_mapping = {
-            'january': '01', 'february': '02', 'march': '03', 'april': '04',
-            'may': '05', 'june': '06', 'july': '07', 'august': '08',
-            'september': '09', 'october': '10', 'november': '11', 'december': '12'
-        }
-        month_numeric = month_mapping[month_text.lower()]
-        period = f"{month_numeric}-{year}"
+        period = parse_period(period_text)
     except Exception as e:
-        return None, f"Invalid format for month and year: {e}"
-
-    try:
-        # Fetch the worksheet by firm_name
-        statement_sheet = spreadsheet.worksheet(firm_name)
-        all_records = statement_sheet.get_all_values()
-
-        # Filter records for the specified month and year
-        filtered_records = []
-        for record in all_records[3:]:  # Skip header row
-            if len(record) >= 3:
-                # Assuming date is in format (YYYY-MM-DD)
-                date_str = record[0].strip('()')
-                record_date = datetime.strptime(date_str, "%d-%m-%Y")
-                if record_date.strftime("%m-%Y") == month_numeric + '-' + year:
-                    filtered_records.append(record)
-
-        if not filtered_records:
-            return None, f"No data found for {firm_name} in {month_text.capitalize()} {year}"
-    except WorksheetNotFound as e:
-        return None, f"Worksheet '{firm_name}' not found: {e}"
-
-    # Prepare PDF content
-    try:
-        pdf = FPDF()
-        pdf.add_page()
-        pdf.set_font("Arial", size=14, style='B')
-
-        pdf.cell(200, 10, txt=f"Statement for {firm_name} of {month_text.capitalize()} {year}", ln=True, align='C')
-
-        # Calculate the starting position to center the table horizontally
-        page_width = pdf.w
-        table_width = 4 * 40  # Assuming each cell is 40 units wide (adjust as necessary)
-        start_x = (page_width - table_width) / 2
-
-        # Add table headers
-        headers = ["Date", "Ref No", "Credit", "Debit"]
-        pdf.set_font("Arial", size=12, style='B')
-        pdf.set_x(start_x)  # Set starting position for headers
-        for header in headers:
-            pdf.cell(40, 10, header, border=1, align='C', ln=False)
-        pdf.ln()
-
-        total_credit = 0.00
-        total_debit = 0.00
-        # Add table rows from filtered_records
-        pdf.set_font("Arial", size=10)
-        for record in filtered_records:
-            pdf.set_x(start_x)  # Set starting position for each row
-            date_str = record[0].strip('()')
-            pdf.cell(40, 7, date_str, border=1, ln=False)
-            pdf.cell(40, 7, record[1], border=1, ln=False)
-            try:
-                credit = float(record[2])
-                debit = float(record[3])
-            except ValueError:
-                credit = 0.00
-                debit = 0.00
-            total_credit += credit
-            total_debit += debit
-            pdf.cell(40, 7, format_decimal(credit, format='#,##,##0.00', locale='en_IN'), border=1, align='R', ln=False)
-            
-            pdf.cell(40, 7, format_decimal(debit, format='#,##,##0.00', locale='en_IN'), border=1, align='R')
-            pdf.ln()
-
-        # Add totals to the PDF
-        pdf.set_x(start_x)
-        pdf.cell(80, 7, "Total:", border=1, ln=False)
-        pdf.cell(40, 7, format_decimal(total_credit, format='#,##,##0.00', locale='en_IN'), border=1, ln=False,align='R')
-        pdf.cell(40, 7, format_decimal(total_debit, format='#,##,##0.00', locale='en_IN'), border=1,align='R')
-        pdf.ln()
-
-        balance = total_credit - total_debit
-        pdf.set_x(start_x-1)
-        if balance > 0:
-            pdf.cell(200, 10, txt=f"Net Payable:  {format_decimal(balance, format='#,##,##0.00', locale='en_IN')}", ln=True, align='L')
+        return None, f"Invalid period: {e}"
+    key = period.key()
+
+    # A closed period that would have to be read from Sheets is served from the
+    # cache as is for a while (STATEMENT_CLOSED_TTL_MINUTES); after that the
+    # sheet is read again so back-dated edits reach the statement
+    closed = period.end < date.today().replace(day=1)
+    in_snapshot = snapshot is not None and firm_name in snapshot
+    live = not in_snapshot and not ledger_mirror.has_firm(firm_name)
+    if closed and live:
+        cached_path = statement_cache.latest(firm_name, key)
+        if cached_path:
+            return cached_path, None
+
+    if not live:
+        if in_snapshot:
+            # Imported here so NumPy is only loaded once a statement is built
+            from ledger_store import FirmLedger
+            ledger = FirmLedger.from_records(snapshot.records(firm_name))
         else:
-            pdf.cell(200, 10, txt=f"Net Receivable:  {format_decimal(-balance, format='#,##,##0.00', locale='en_IN')}", ln=True, align='L')
-
-        # Save the PDF to a file
-        pdf_output_path = f"static/{firm_name.replace(' ', '_')}_{period}.pdf"
-        if os.path.exists(pdf_output_path):
-            os.remove(pdf_output_path)
-
-        pdf.output(pdf_output_path)
-        pdf.output(pdf_output_path)
-
+            ledger = get_ledger_store().get(firm_name)
+        if period.is_month():
+            first, last = ledger.month_bounds(period.start.year, period.start.month)
+        else:
+            first, last = ledger.date_bounds(period.start.isoformat(), period.end.isoformat())
+        filtered_records = ledger.records(first, last)
+        opening_balance = ledger.balance_before(first)
+    else:
+        try:
+            found = shared_cache.get_or_load(f"period:{firm_name}:{key}", lambda: read_period(firm_name, period), CACHE_TTL)
+        except Exception as e:
+            return None, f"Could not read the sheet: {e}"
+        if found is None:
+            return None, f"Worksheet '{firm_name}' not found"
+        filtered_records, opening_balance = found['rows'], found['opening']
+
+    if not filtered_records:
+        return None, f"No data found for {firm_name} in {period.label}"
+
+    # Same rows and opening balance as last time: reuse the PDF. New rows in
+    # the period, or back-dated ones before it, change the hash and it is rendered again.
+    digest = rows_hash([[opening_balance]] + filtered_records)
+    cached_path = statement_cache.get(firm_name, key, digest)
+    if cached_path:
+        if live:
+            statement_cache.confirm(firm_name, key)
+        return cached_path, None
+
+    # Render the PDF into the statement cache
+    try:
+        pdf_output_path = statement_cache.put(firm_name, key, digest,
+                                              lambda path: render_statement(firm_name, period.label, filtered_records, path,
+                                                                            opening_balance=opening_balance))
         return pdf_output_path, None
     except Exception as e:
         return None, f"Failed to generate PDF: {e}"
 
-# Twilio API setup
-account_sid = os.getenv('TWILIO_ACCOUNT_SID')
-if not account_sid:
-    raise ValueError("TWILIO_ACCOUNT_SID environment variable is not set")
+# Statements are built in the background and sent with the REST client, so the
+# webhook answers within Twilio's timeout however large the ledger is
+statement_worker = StatementWorker(max_workers=int(os.getenv('STATEMENT_WORKERS', '2')),
+                                   max_queue=int(os.getenv('STATEMENT_QUEUE_SIZE', '20')))
+
+# Build one statement and send it (or the reason it failed) back to the user.
+# bot_number is the WhatsApp number the request came in on, user_number the sender.
+def send_statement(firm_name, period_text, user_number, bot_number, base_url):
+    pdf_file_path, error = generate_pdf(firm_name, period_text)
+    twilio_client = get_twilio_client()
+    if pdf_file_path:
+        twilio_client.messages.create(from_=bot_number, to=user_number,
+                                      body=f"Statement for {firm_name}",
+                                      media_url=[static_url(base_url, pdf_file_path)])
+        print(f"Sent statement {pdf_file_path} to {user_number}")
+    else:
+        twilio_client.messages.create(from_=bot_number, to=user_number,
+                                      body=f"Failed to generate the statement for '{firm_name}'. {error}\nType 'statement {firm_name}' to try again.")
 
-auth_token = os.getenv('TWILIO_AUTH_TOKEN')
-if not auth_token:
-    raise ValueError("TWILIO_AUTH_TOKEN environment variable is not set")
+# Statement periods the bot accepts, asked for once a firm is chosen
+def period_prompt(firm_name):
+    return (f"Please provide the period for the statement of '{firm_name}': a month (e.g., JAN 24), "
+            f"a quarter (Q1 24-25), a financial year (FY 24-25) or two dates (01-04-24 to 30-06-24).")
 
-twilio_client = Client(account_sid, auth_token)
+# The StatementPeriod a message asks for, or None when it is not a period
+def period_of(text):
+    try:
+        return parse_period(text)
+    except ValueError:
+        return None
 
 # Flask route to handle incoming WhatsApp messages
 @app.route("/whatsapp", methods=['POST'])
@@ -168,25 +263,26 @@ def whatsapp_bot():
     incoming_msg = request.values.get('Body', '').strip().lower()
     resp = MessagingResponse()
     msg = resp.message()
+    # Only a message that reads as a period answers the period prompt
+    period = period_of(incoming_msg) if 'firm_name' in session else None
 
     if incoming_msg == 'firms':
-        firms = get_firm_names()
+        firms = firm_directory.names()
         firm_list = "\n".join(firms)
         msg.body(f"Please choose a firm:\n{firm_list}")
     
     elif incoming_msg.startswith('balance '):
         firm_name_input = incoming_msg[8:].strip().upper()
-        firms = get_firm_names()
-        matches = [firm for firm in firms if firm_name_input in firm]
+        matches, certain = firm_directory.resolve(firm_name_input)
 
-        if len(matches) == 1:
+        if certain:
             firm_name = matches[0]
             balance = get_balance(firm_name)
             if balance:
                 msg.body(f"The balance for {firm_name} is {balance}")
             else:
                 msg.body(f"Sorry, no balance information available for '{firm_name}'.")
-        elif len(matches) > 1:
+        elif matches:
             options = "\n".join([f"{i+1}) {matches[i]}" for i in range(len(matches))])
             msg.body(f"These are the probable results with '{firm_name_input}':\n{options}\nChoose the number which you want to get balance for, or type 'none' to write a new firm name.")
             session['options'] = matches
@@ -196,14 +292,13 @@ def whatsapp_bot():
 
     elif incoming_msg.startswith('statement '):
         firm_name_input = incoming_msg[10:].strip().upper()
-        firms = get_firm_names()
-        matches = [firm for firm in firms if firm_name_input in firm]
+        matches, certain = firm_directory.resolve(firm_name_input)
 
-        if len(matches) == 1:
+        if certain:
             firm_name = matches[0]
-            msg.body(f"Please provide the month and year (e.g., JAN 24) for the statement of '{firm_name}'.")
+            msg.body(period_prompt(firm_name))
             session['firm_name'] = firm_name
-        elif len(matches) > 1:
+        elif matches:
             options = "\n".join([f"{i+1}) {matches[i]}" for i in range(len(matches))])
             msg.body(f"These are the probable results with '{firm_name_input}':\n{options}\nChoose the number which you want to get statement for, or type 'none' to write a new firm name.")
             session['options'] = matches
@@ -223,36 +318,66 @@ def whatsapp_bot():
                 else:
                     msg.body(f"Sorry, no balance information available for '{firm_name}'.")
             elif session['request_type'] == 'statement':
-                msg.body(f"Please provide the month and year (e.g., JAN 24) for the statement of '{firm_name}'.")
+                msg.body(period_prompt(firm_name))
                 session['firm_name'] = firm_name
             session.pop('options', None)
             session.pop('request_type', None)
         else:
             msg.body("Invalid choice. Please try again.")
 
-    elif 'firm_name' in session and (len(incoming_msg.split()) == 2):
-        try:
-            month, year = incoming_msg.split()
-            month_year = f"{month.upper()} {year}"  # Format like "MAY 2024"
-            firm_name = session['firm_name']
-            msg.body(f"Generating PDF statement for {firm_name} of {month.capitalize()} 20{year}.")
-            pdf_file_path, error = generate_pdf(firm_name, month_year)
-            
-            if pdf_file_path:
-                # Send the PDF via WhatsApp using Twilio
-                media_url = f"https://{request.host}/{pdf_file_path}"
-                msg.media(media_url)  # Send the PDF as a media message attachment
-                session.pop('firm_name', None)
-            else:
-                msg.body(f"Failed to generate the statement for '{firm_name}'. {error}")
+    elif period is not None:
+        firm_name = session['firm_name']
+        queued = statement_worker.submit(send_statement, firm_name, incoming_msg,
+                                         request.values.get('From'), request.values.get('To'),
+                                         f"https://{request.host}")
+        if queued:
+            msg.body(f"Generating PDF statement for {firm_name} of {period.label}. It will be sent here shortly.")
+            session.pop('firm_name', None)
+        else:
+            msg.body("Too many statements are being generated right now. Please send the period again in a minute.")
+        print(f"Statement queue depth: {statement_worker.queue_depth()}")
 
-        except ValueError:
-            msg.body("Invalid format. Please provide the month and year in the format 'MMM YY' (e.g., MAY 24).")
+    # A firm is waiting for its period and the message is neither a command nor a period
+    elif 'firm_name' in session:
+        msg.body(f"Invalid format '{incoming_msg}'. Please send the period for {session['firm_name']} as a month (JAN 24), "
+                 f"a quarter (Q1 24-25), a financial year (FY 24-25) or two dates (01-04-24 to 30-06-24).")
 
     else:
         msg.body("Welcome to the MBH's kingdom. Please type 'FIRMS' to get started.")
 
     return str(resp)
 
+# Statement worker counters, including the number of jobs waiting for a worker
+@app.route("/metrics/statements", methods=['GET'])
+def statement_metrics():
+    return statement_worker.stats()
+
+# Sheets and Twilio call counts, latencies and waits since the bot started
+@app.route("/metrics/calls", methods=['GET'])
+def call_metrics():
+    return recorder.summary()
+
+# Shared cache hits, misses, loads and waits of the worker answering the request
+@app.route("/metrics/cache", methods=['GET'])
+def cache_metrics():
+    return shared_cache.stats()
+
+# Optional warm-up: connect to Sheets and Twilio, load the firm list and the PDF
+# font tables so the first user message pays for none of them. Seconds per step.
+@app.route("/warmup", methods=['GET'])
+def warmup():
+    timings = {}
+    for name, step in (('sheets', get_worksheet_index), ('twilio', get_twilio_client),
+                       ('firms', firm_directory.names), ('pdf fonts', char_widths)):
+        start = time.perf_counter()
+        try:
+            step()
+            timings[name] = round(time.perf_counter() - start, 3)
+        except Exception as e:
+            timings[name] = f"failed: {e}"
+    return timings
+
+# Development server only. In production run several workers with
+# gunicorn -c gunicorn.conf.py sendmsg:app
 if __name__ == "__main__":
-    app.run(debug=True)
\ No newline at end of file
+    app.run(debug=os.getenv('FLASK_DEBUG') == '1', threaded=True)
\ No newline at end of file
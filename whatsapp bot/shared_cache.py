@@ -0,0 +1,159 @@
+import os
+import sys
+import json
+import time
+import sqlite3
+import threading
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Cache shared by every bot process on the host (gunicorn workers and their
+# threads), in one SQLite file in WAL mode so readers never block the writer.
+# It holds what the bot would otherwise read from Sheets: the INDEX firm list
+# and the balances and rows of firms the ledger mirror does not have yet.
+# A value missing from the cache is loaded by one process only; the others
+# wait for it instead of making the same Sheets call. invalidate() drops
+# entries for every process at once and bumps a generation number that
+# in-process caches (the firm directory) check to reload.
+CACHE_PATH = os.getenv('BOT_CACHE_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bot_cache.db'))
+# Seconds a process waits for a value another process is loading before loading it itself
+LOAD_WAIT = float(os.getenv('BOT_CACHE_LOAD_WAIT', '10'))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    expires REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS loading (
+    key TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    until REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS generation (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO generation (id, value) VALUES (0, 0);
+"""
+
+# Returned by get() for a key that is not cached; None is a valid cached value
+MISSING = object()
+
+class SharedCache:
+    def __init__(self, path=CACHE_PATH, load_wait=LOAD_WAIT):
+        self.path = path
+        self.load_wait = load_wait
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.counts = {'hits': 0, 'misses': 0, 'loads': 0, 'waits': 0}
+        with self.connect() as conn:
+            conn.executescript(SCHEMA)
+
+    # One connection per thread and process. Connections are opened after
+    # gunicorn forks its workers, never inherited across the fork.
+    def connect(self):
+        conn = getattr(self.local, 'conn', None)
+        if conn is None or self.local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self.local.conn = conn
+            self.local.pid = os.getpid()
+        return conn
+
+    def _count(self, name):
+        with self.lock:
+            self.counts[name] += 1
+
+    # Cached value of key, or MISSING when absent or expired
+    def get(self, key):
+        row = self.connect().execute("SELECT value FROM entries WHERE key = ? AND expires > ?",
+                                     (key, time.time())).fetchone()
+        return json.loads(row[0]) if row else MISSING
+
+    def set(self, key, value, ttl):
+        with self.connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO entries (key, value, expires) VALUES (?, ?, ?)",
+                         (key, json.dumps(value, default=str), time.time() + ttl))
+
+    # Value of key, calling load() when it is not cached. Across all processes
+    # only one load() runs per key at a time; the others wait for its result.
+    def get_or_load(self, key, load, ttl):
+        value = self.get(key)
+        if value is not MISSING:
+            self._count('hits')
+            return value
+        self._count('misses')
+
+        owner = f"{os.getpid()}:{threading.get_ident()}"
+        deadline = time.monotonic() + self.load_wait
+        waited = False
+        while True:
+            if self._claim(key, owner):
+                try:
+                    # Loaded by another process while this one waited for the claim
+                    value = self.get(key)
+                    if value is not MISSING:
+                        return value
+                    self._count('loads')
+                    value = load()
+                    self.set(key, value, ttl)
+                    return value
+                finally:
+                    self._release(key, owner)
+            if not waited:
+                self._count('waits')
+                waited = True
+            time.sleep(0.05)
+            value = self.get(key)
+            if value is not MISSING:
+                return value
+            if time.monotonic() > deadline:
+                # The loading process is stuck or gone; load without the claim
+                self._count('loads')
+                value = load()
+                self.set(key, value, ttl)
+                return value
+
+    # Take the load claim for key; a claim older than load_wait is taken over
+    def _claim(self, key, owner):
+        now = time.time()
+        with self.connect() as conn:
+            conn.execute("DELETE FROM loading WHERE key = ? AND until < ?", (key, now))
+            cursor = conn.execute("INSERT OR IGNORE INTO loading (key, owner, until) VALUES (?, ?, ?)",
+                                  (key, owner, now + self.load_wait))
+            return cursor.rowcount == 1
+
+    def _release(self, key, owner):
+        with self.connect() as conn:
+            conn.execute("DELETE FROM loading WHERE key = ? AND owner = ?", (key, owner))
+
+    # Changes whenever the cache is invalidated, in any process
+    def generation(self):
+        return self.connect().execute("SELECT value FROM generation WHERE id = 0").fetchone()[0]
+
+    # Drop every entry, or those whose key starts with prefix, for all processes
+    def invalidate(self, prefix=None):
+        with self.connect() as conn:
+            if prefix is None:
+                conn.execute("DELETE FROM entries")
+            else:
+                conn.execute("DELETE FROM entries WHERE substr(key, 1, ?) = ?", (len(prefix), prefix))
+            conn.execute("UPDATE generation SET value = value + 1 WHERE id = 0")
+
+    # Counters of this process, plus the entries currently cached
+    def stats(self):
+        entries = self.connect().execute("SELECT COUNT(*) FROM entries WHERE expires > ?",
+                                         (time.time(),)).fetchone()[0]
+        with self.lock:
+            return dict(self.counts, pid=os.getpid(), entries=entries, generation=self.generation())
+
+if __name__ == "__main__":
+    # python shared_cache.py [prefix]: drop cached values for every running bot process
+    cache = SharedCache()
+    prefix = sys.argv[1] if len(sys.argv) > 1 else None
+    cache.invalidate(prefix)
+    print(f"Invalidated {prefix + '*' if prefix else 'all entries'} in {cache.path} (generation {cache.generation()})")
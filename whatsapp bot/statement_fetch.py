@@ -0,0 +1,109 @@
+import os
+import sys
+from datetime import datetime
+
+# Shared Sheets helpers live in the repository root
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from sheets_snapshot import read_ranges, a1_range
+from statement_pdf import month_rows
+from ledger_mirror import parse_date, parse_amount
+
+# Targeted read of one month, or any period, of a firm worksheet. Instead of
+# downloading the whole sheet and parsing every date, read column A from row 4,
+# find the rows dated in the period, then read A:D of just those rows. Ledgers
+# are appended in date order, so the period is one contiguous span and the
+# second read is a single range. Periods whose rows are scattered (back-dated
+# entries) are read as one range per run of rows, in the same batchGet.
+FIRST_DATA_ROW = 4
+# More runs than this and the rest of the sheet is read in one range instead
+MAX_RUNS = 20
+
+# ISO date of a date cell ('YYYY-MM-DD', which sorts as text), or None
+def iso_of(text, date_format="%d-%m-%Y"):
+    text = text.strip().strip('()')
+    if date_format == "%d-%m-%Y" and len(text) == 10 and text[2] == '-' and text[5] == '-':
+        return f"{text[6:]}-{text[3:5]}-{text[:2]}"
+    if date_format == "%Y-%m-%d" and len(text) == 10 and text[4] == '-' and text[7] == '-':
+        return text
+    try:
+        return datetime.strptime(text, date_format).date().isoformat()
+    except ValueError:
+        return None
+
+# Runs of consecutive sheet rows dated start..end (ISO, inclusive) and runs of
+# rows dated after end, from the column A values read from first_row on.
+# None when a non-empty date cannot be parsed.
+def period_runs(dates, start, end, date_format="%d-%m-%Y", first_row=FIRST_DATA_ROW):
+    runs, after = [], []
+    for row_number, cell in enumerate(dates, start=first_row):
+        text = cell[0] if cell else ''
+        if not text.strip():
+            continue
+        day = iso_of(text, date_format)
+        if day is None:
+            return None
+        if day < start:
+            continue
+        target = runs if day <= end else after
+        if target and target[-1][1] == row_number - 1:
+            target[-1][1] = row_number
+        else:
+            target.append([row_number, row_number])
+    return runs, after
+
+# Sheets leaves out trailing empty cells; give every row its four columns
+# (date, ref no, credit, debit) as get_all_values() would
+def padded(record):
+    return record + [''] * (4 - len(record))
+
+def net(rows):
+    return sum(parse_amount(row[2] if len(row) > 2 else 0) - parse_amount(row[3] if len(row) > 3 else 0)
+               for row in rows)
+
+# Ledger rows of one worksheet dated start..end (date objects) and the balance
+# brought forward into the period, from two reads whatever the period's length.
+# The opening balance is the B2 balance less every entry dated from start on,
+# so only the period's rows and the amounts of those dated after it are read.
+def read_period_rows(worksheet, start, end, date_format="%d-%m-%Y"):
+    spreadsheet, title = worksheet.spreadsheet, worksheet.title
+    start, end = start.isoformat(), end.isoformat()
+    dates = read_ranges(spreadsheet, [a1_range(title, f"A{FIRST_DATA_ROW}:A")])[0]
+    found = period_runs(dates, start, end, date_format)
+    if found is None or len(found[0]) + len(found[1]) > MAX_RUNS:
+        # Unparseable or heavily interleaved dates: read every entry and split it here
+        last_row = FIRST_DATA_ROW + len(dates) - 1
+        rows, opening = [], 0.0
+        for record in read_ranges(spreadsheet, [a1_range(title, f"A{FIRST_DATA_ROW}:D{last_row}")])[0]:
+            day = parse_date(record[0]) if len(record) >= 3 and record[0].strip() else None
+            if day is not None and day < start:
+                opening += net([record])
+            elif day is not None and day <= end:
+                rows.append(padded(record))
+        return rows, round(opening, 2)
+
+    runs, after = found
+    ranges = ([a1_range(title, f"A{first}:D{last}") for first, last in runs]
+              + [a1_range(title, f"C{first}:D{last}") for first, last in after] + [a1_range(title, 'B2')])
+    values = read_ranges(spreadsheet, ranges)
+    rows = [padded(record) for block in values[:len(runs)] for record in block if len(record) >= 3]
+    later = [['', ''] + amounts for block in values[len(runs):-1] for amounts in block]
+    balance = parse_amount(values[-1][0][0]) if values[-1] and values[-1][0] else 0.0
+    return rows, round(balance - net(rows) - net(later), 2)
+
+# Ledger rows of one worksheet dated in the given month, as month_rows() would
+# return them from get_all_values(), in two reads of a few cells each
+def read_month_rows(worksheet, month_numeric, year, date_format="%d-%m-%Y"):
+    spreadsheet, title = worksheet.spreadsheet, worksheet.title
+    dates = read_ranges(spreadsheet, [a1_range(title, f"A{FIRST_DATA_ROW}:A")])[0]
+    found = period_runs(dates, f"{year}-{month_numeric}-01", f"{year}-{month_numeric}-31", date_format)
+    runs = found[0] if found is not None else None
+    if runs is None or len(runs) > MAX_RUNS:
+        # Unparseable or heavily interleaved dates: read every entry and filter as before
+        last_row = FIRST_DATA_ROW + len(dates) - 1
+        rows = read_ranges(spreadsheet, [a1_range(title, f"A{FIRST_DATA_ROW}:D{last_row}")])[0]
+        return [padded(record) for record in month_rows([[]] * (FIRST_DATA_ROW - 1) + rows, month_numeric, year, date_format)]
+    if not runs:
+        return []
+
+    values = read_ranges(spreadsheet, [a1_range(title, f"A{first}:D{last}") for first, last in runs])
+    return [padded(record) for rows in values for record in rows if len(record) >= 3]
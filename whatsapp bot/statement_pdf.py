@@ -0,0 +1,353 @@
+import re
+import zlib
+from datetime import date, datetime, timedelta
+from decimal import Decimal, ROUND_HALF_EVEN
+
+# Statement layout shared by the bot, pdf.py and the month-end batch.
+# Nothing here talks to Sheets, so it can run in worker processes.
+
+MONTH_MAPPING = {
+    'january': '01', 'february': '02', 'march': '03', 'april': '04',
+    'may': '05', 'june': '06', 'july': '07', 'august': '08',
+    'september': '09', 'october': '10', 'november': '11', 'december': '12'
+}
+
+# Month number ('01'..'12') of a full or abbreviated month name ("JAN", "Sept")
+def month_numeric_of(text):
+    text = text.lower()
+    for name, number in MONTH_MAPPING.items():
+        if text == name or (len(text) >= 3 and name.startswith(text)):
+            return number
+    raise ValueError(f"unknown month '{text}'")
+
+# "24" or "2024" -> 2024
+def full_year(text):
+    if not text.isdigit() or len(text) not in (2, 4):
+        raise ValueError(f"unknown year '{text}'")
+    return int(text) if len(text) == 4 else 2000 + int(text)
+
+# "MAY 24", "JAN 2024" or "September 24" -> ('May', '05', '2024'); raises on anything else
+def parse_month_year(month_year):
+    month_text, year_input = month_year.split()
+    month_numeric = month_numeric_of(month_text)
+    month_name = list(MONTH_MAPPING)[int(month_numeric) - 1]
+    return month_name.capitalize(), month_numeric, str(full_year(year_input))
+
+def last_day(year, month):
+    return (date(year, month, 28) + timedelta(days=4)).replace(day=1) - timedelta(days=1)
+
+# Dates start..end (inclusive) a statement covers, with the label shown in its title
+class StatementPeriod:
+    def __init__(self, start, end, label):
+        self.start = start
+        self.end = end
+        self.label = label
+
+    def is_month(self):
+        return self.start.day == 1 and self.end == last_day(self.start.year, self.start.month)
+
+    # Name used for cached PDFs: 'MM-YYYY' for a calendar month, as before, else the two dates
+    def key(self):
+        if self.is_month():
+            return self.start.strftime('%m-%Y')
+        return f"{self.start.isoformat()}_{self.end.isoformat()}"
+
+# Start year of a financial year (April to March) written as "24-25",
+# "2024-25", "2024-2025" or "25" (the year it ends, as in FY25)
+def fy_start_year(first, second=None):
+    if second is None:
+        return full_year(first) - 1
+    start = full_year(first)
+    end = full_year(second) if len(second) == 4 else start // 100 * 100 + int(second)
+    if end != start + 1:
+        raise ValueError(f"{first}-{second} is not a financial year")
+    return start
+
+_FY_YEARS = r'(\d{2}|\d{4})(?:\s*[-/]\s*(\d{2}|\d{4}))?$'
+_FINANCIAL_YEAR = re.compile(r'^FY\s*' + _FY_YEARS)
+_QUARTER = re.compile(r'^Q([1-4])\s*(?:FY\s*)?' + _FY_YEARS)
+_DATE = re.compile(r'^(\d{1,2})[-/.](\d{1,2})[-/.](\d{2}|\d{4})$')
+_RANGE_SEPARATOR = re.compile(r'\s+(?:TO|-)\s+')
+
+# (first day, last day) of a date ("01-04-24") or a month ("APR 24")
+def parse_day_or_month(text):
+    match = _DATE.match(text)
+    if match:
+        day = date(full_year(match.group(3)), int(match.group(2)), int(match.group(1)))
+        return day, day
+    _, month_numeric, year = parse_month_year(text)
+    return date(int(year), int(month_numeric), 1), last_day(int(year), int(month_numeric))
+
+# What a user may ask a statement for:
+#   "JAN 24" / "January 2024"        one month
+#   "Q1 24-25" / "Q1 FY25"           a quarter of the financial year (Q1 = Apr-Jun)
+#   "FY 24-25" / "FY25"              a financial year, April to March
+#   "APR 24 TO JUN 24", "01-04-24 to 15-05-24"   any range of months or dates
+def parse_period(text):
+    text = ' '.join(text.upper().split())
+    match = _FINANCIAL_YEAR.match(text)
+    if match:
+        start_year = fy_start_year(match.group(1), match.group(2))
+        return StatementPeriod(date(start_year, 4, 1), date(start_year + 1, 3, 31),
+                               f"FY {start_year}-{str(start_year + 1)[2:]}")
+    match = _QUARTER.match(text)
+    if match:
+        quarter = int(match.group(1))
+        start_year = fy_start_year(match.group(2), match.group(3))
+        first_month = 4 + 3 * (quarter - 1)
+        year = start_year + (first_month - 1) // 12
+        month = (first_month - 1) % 12 + 1
+        return StatementPeriod(date(year, month, 1), last_day(year, month + 2),
+                               f"Q{quarter} FY {start_year}-{str(start_year + 1)[2:]}")
+    parts = _RANGE_SEPARATOR.split(text)
+    if len(parts) == 2:
+        start, _ = parse_day_or_month(parts[0])
+        _, end = parse_day_or_month(parts[1])
+        if end < start:
+            raise ValueError("the period ends before it starts")
+        return StatementPeriod(start, end, f"{start.strftime('%d-%m-%Y')} to {end.strftime('%d-%m-%Y')}")
+    if len(parts) == 1 and len(text.split()) == 2:
+        month_text, month_numeric, year = parse_month_year(text)
+        start = date(int(year), int(month_numeric), 1)
+        return StatementPeriod(start, last_day(start.year, start.month), f"{month_text} {year}")
+    raise ValueError(f"cannot read '{text}' as a month, quarter, financial year or date range")
+
+# Ledger rows (from row 4 of a firm sheet) dated in the given month
+def month_rows(all_records, month_numeric, year, date_format="%d-%m-%Y"):
+    filtered_records = []
+    for record in all_records[3:]:  # Skip header row
+        if len(record) >= 3:
+            date_str = record[0].strip('()')
+            record_date = datetime.strptime(date_str, date_format)
+            if record_date.strftime("%m-%Y") == month_numeric + '-' + year:
+                filtered_records.append(record)
+    return filtered_records
+
+# Indian digit grouping (12,34,567.50): the last three digits, then pairs.
+# Same output as babel's format_decimal(value, format='#,##,##0.00', locale='en_IN')
+# (half-even rounding of the decimal value) at a fraction of the cost.
+_PAIRS = re.compile(r'(\d)(?=(\d\d)+$)')
+_CENTS = Decimal('0.01')
+
+def amount(value):
+    text = format(Decimal(str(value)).quantize(_CENTS, rounding=ROUND_HALF_EVEN), 'f')
+    sign = ''
+    if text[0] == '-':
+        sign, text = '-', text[1:]
+    whole, cents = text.split('.')
+    if len(whole) > 3:
+        whole = _PAIRS.sub(r'\1,', whole[:-3]) + ',' + whole[-3:]
+    return f"{sign}{whole}.{cents}"
+
+# Credit or debit cell of a ledger row as a number; blank, missing (Sheets
+# drops trailing empty cells) or unreadable cells count as 0
+def cell_amount(record, index):
+    try:
+        return float(str(record[index]).replace(',', ''))
+    except (IndexError, ValueError):
+        return 0.0
+
+# Page geometry in mm, matching FPDF's A4 defaults
+PAGE_WIDTH = 210.0
+PAGE_HEIGHT = 297.0
+MARGIN = 10.0
+BOTTOM_MARGIN = 20.0
+CELL_MARGIN = 1.0
+SCALE = 72 / 25.4  # points per mm
+
+COLUMN_WIDTH = 40
+# Five columns when the statement has a running balance
+BALANCE_COLUMN_WIDTH = 36
+ROW_HEIGHT = 7
+HEADER_HEIGHT = 10
+TITLE_HEIGHT = 10
+
+# The standard Helvetica faces need no embedding; FPDF's tables give their widths
+FONTS = {
+    '': ('F1', 'Helvetica', 'helvetica'),
+    'B': ('F2', 'Helvetica-Bold', 'helveticaB'),
+}
+
+# Character widths of each style, loaded on the first render so importing this
+# module (e.g. for parse_month_year) does not import fpdf
+def char_widths():
+    from fpdf.fonts import fpdf_charwidths
+    return {style: fpdf_charwidths[table] for style, (_, _, table) in FONTS.items()}
+
+def pdf_string(text):
+    text = str(text).replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+    return text.encode('latin-1', 'replace').decode('latin-1')
+
+# Minimal PDF writer that streams each page to disk when it is finished.
+# Only the byte offset of every object is kept, so memory stays flat
+# however many pages a statement has.
+class StreamingPdf:
+    CATALOG, PAGES, FIRST_FONT = 1, 2, 3
+
+    def __init__(self, path, compress=True):
+        self.file = open(path, 'wb')
+        self.compress = compress
+        self.offsets = {}
+        self.page_ids = []
+        self.next_id = self.FIRST_FONT + len(FONTS)
+        self.widths = char_widths()
+        self.ops = []
+        self.font = None
+        self.file.write(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+
+    def _object(self, obj_id, body):
+        self.offsets[obj_id] = self.file.tell()
+        self.file.write(f"{obj_id} 0 obj\n".encode('latin-1') + body + b"\nendobj\n")
+
+    def set_font(self, style, size):
+        self.font = (style, size)
+
+    def string_width(self, text):
+        style, size = self.font
+        widths = self.widths[style]
+        return sum(widths.get(ch, 500) for ch in text) * size / 1000 / SCALE
+
+    # A bordered cell at (x, y) mm from the top left, like FPDF.cell(border=1)
+    def cell(self, x, y, w, h, text='', align='L', border=True):
+        text = str(text)
+        top = (PAGE_HEIGHT - y) * SCALE
+        if border:
+            self.ops.append(f"{x * SCALE:.2f} {top:.2f} {w * SCALE:.2f} {-h * SCALE:.2f} re S")
+        if text:
+            if align == 'R':
+                dx = w - CELL_MARGIN - self.string_width(text)
+            elif align == 'C':
+                dx = (w - self.string_width(text)) / 2
+            else:
+                dx = CELL_MARGIN
+            baseline = (PAGE_HEIGHT - (y + 0.5 * h + 0.3 * self.font[1] / SCALE)) * SCALE
+            self.ops.append(f"BT /{FONTS[self.font[0]][0]} {self.font[1]:.2f} Tf "
+                            f"{(x + dx) * SCALE:.2f} {baseline:.2f} Td ({pdf_string(text)}) Tj ET")
+
+    def end_page(self):
+        content = '\n'.join(self.ops).encode('latin-1')
+        self.ops = []
+        content_id, page_id = self.next_id, self.next_id + 1
+        self.next_id += 2
+        if self.compress:
+            content = zlib.compress(content)
+            header = f"<< /Filter /FlateDecode /Length {len(content)} >>\nstream\n"
+        else:
+            header = f"<< /Length {len(content)} >>\nstream\n"
+        self._object(content_id, header.encode('latin-1') + content + b"\nendstream")
+        fonts = ' '.join(f"/{name} {self.FIRST_FONT + i} 0 R" for i, (name, _, _) in enumerate(FONTS.values()))
+        self._object(page_id, (f"<< /Type /Page /Parent {self.PAGES} 0 R "
+                               f"/MediaBox [0 0 {PAGE_WIDTH * SCALE:.2f} {PAGE_HEIGHT * SCALE:.2f}] "
+                               f"/Resources << /Font << {fonts} >> >> /Contents {content_id} 0 R >>").encode('latin-1'))
+        self.page_ids.append(page_id)
+
+    def close(self):
+        if self.ops or not self.page_ids:
+            self.end_page()
+        for i, (_, base_font, _) in enumerate(FONTS.values()):
+            self._object(self.FIRST_FONT + i, (f"<< /Type /Font /Subtype /Type1 /BaseFont /{base_font} "
+                                               f"/Encoding /WinAnsiEncoding >>").encode('latin-1'))
+        kids = ' '.join(f"{page_id} 0 R" for page_id in self.page_ids)
+        self._object(self.PAGES, f"<< /Type /Pages /Kids [{kids}] /Count {len(self.page_ids)} >>".encode('latin-1'))
+        self._object(self.CATALOG, f"<< /Type /Catalog /Pages {self.PAGES} 0 R >>".encode('latin-1'))
+
+        xref = self.file.tell()
+        count = self.next_id
+        lines = [f"xref\n0 {count}\n0000000000 65535 f \n"]
+        lines.extend(f"{self.offsets[obj_id]:010d} 00000 n \n" for obj_id in range(1, count))
+        lines.append(f"trailer\n<< /Size {count} /Root {self.CATALOG} 0 R >>\nstartxref\n{xref}\n%%EOF\n")
+        self.file.write(''.join(lines).encode('latin-1'))
+        self.file.close()
+
+# Render [date, ref no, credit, debit] rows as a statement PDF at path.
+# period_label is shown in the title, e.g. "May 2024". records may be any
+# iterable; rows are drawn as they arrive and each page is written out once
+# full. Every page repeats the table header; pages after the first open with
+# the totals brought forward and all but the last close with the totals carried forward.
+# With opening_balance (credit minus debit of every earlier entry) the table
+# opens with that balance and gains a running Balance column, and the net
+# position at the end includes it.
+def render_statement(firm_name, period_label, records, path, opening_balance=None):
+    pdf = StreamingPdf(path)
+    with_balance = opening_balance is not None
+    columns = 5 if with_balance else 4
+    width = BALANCE_COLUMN_WIDTH if with_balance else COLUMN_WIDTH
+    start_x = (PAGE_WIDTH - columns * width) / 2
+    page_bottom = PAGE_HEIGHT - BOTTOM_MARGIN
+    total_credit = 0.00
+    total_debit = 0.00
+    balance = opening_balance or 0.00
+
+    def header(y):
+        pdf.set_font('B', 12)
+        x = start_x
+        for title in ("Date", "Ref No", "Credit", "Debit", "Balance")[:columns]:
+            pdf.cell(x, y, width, HEADER_HEIGHT, title, align='C')
+            x += width
+        return y + HEADER_HEIGHT
+
+    def totals_row(y, label):
+        pdf.set_font('', 10)
+        pdf.cell(start_x, y, 2 * width, ROW_HEIGHT, label)
+        pdf.cell(start_x + 2 * width, y, width, ROW_HEIGHT, amount(total_credit), align='R')
+        pdf.cell(start_x + 3 * width, y, width, ROW_HEIGHT, amount(total_debit), align='R')
+        if with_balance:
+            pdf.cell(start_x + 4 * width, y, width, ROW_HEIGHT, amount(balance), align='R')
+        return y + ROW_HEIGHT
+
+    def footer():
+        pdf.set_font('', 8)
+        pdf.cell(MARGIN, PAGE_HEIGHT - 15, PAGE_WIDTH - 2 * MARGIN, 10,
+                 f"Page {len(pdf.page_ids) + 1}", align='C', border=False)
+
+    # Close the page with the running totals and open the next one
+    def next_page(y):
+        totals_row(y, "Carried forward:")
+        footer()
+        pdf.end_page()
+        y = header(MARGIN)
+        return totals_row(y, "Brought forward:")
+
+    pdf.set_font('B', 14)
+    pdf.cell(MARGIN, MARGIN, 200, TITLE_HEIGHT, f"Statement for {firm_name} of {period_label}", align='C', border=False)
+    y = header(MARGIN + TITLE_HEIGHT)
+
+    if with_balance:
+        pdf.set_font('', 10)
+        pdf.cell(start_x, y, 4 * width, ROW_HEIGHT, "Opening balance:")
+        pdf.cell(start_x + 4 * width, y, width, ROW_HEIGHT, amount(opening_balance), align='R')
+        y += ROW_HEIGHT
+
+    # Add table rows, keeping room for the carried-forward row
+    pdf.set_font('', 10)
+    for record in records:
+        if y + 2 * ROW_HEIGHT > page_bottom:
+            y = next_page(y)
+        credit = cell_amount(record, 2)
+        debit = cell_amount(record, 3)
+        total_credit += credit
+        total_debit += debit
+        balance += credit - debit
+        pdf.cell(start_x, y, width, ROW_HEIGHT, str(record[0]).strip('()'))
+        pdf.cell(start_x + width, y, width, ROW_HEIGHT, record[1])
+        pdf.cell(start_x + 2 * width, y, width, ROW_HEIGHT, amount(credit), align='R')
+        pdf.cell(start_x + 3 * width, y, width, ROW_HEIGHT, amount(debit), align='R')
+        if with_balance:
+            pdf.cell(start_x + 4 * width, y, width, ROW_HEIGHT, amount(balance), align='R')
+        y += ROW_HEIGHT
+
+    # Totals and net position need a row plus the summary line
+    if y + ROW_HEIGHT + TITLE_HEIGHT > page_bottom:
+        y = next_page(y)
+    y = totals_row(y, "Total:")
+
+    net = balance if with_balance else total_credit - total_debit
+    pdf.set_font('', 10)
+    if net > 0:
+        summary = f"Net Payable:  {amount(net)}"
+    else:
+        summary = f"Net Receivable:  {amount(-net)}"
+    pdf.cell(start_x - 1, y, 200, TITLE_HEIGHT, summary, border=False)
+    footer()
+    pdf.close()
+    return path
@@ -0,0 +1,60 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Runs statement jobs off the webhook thread on a fixed number of workers.
+# At most max_queue jobs wait behind the running ones; further jobs are
+# rejected so a burst of requests cannot pile up unbounded work.
+class StatementWorker:
+    def __init__(self, max_workers=2, max_queue=20):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='statement')
+        self.lock = threading.Lock()
+        self.pending = 0  # queued + running
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+
+    # Jobs waiting for a free worker
+    def queue_depth(self):
+        with self.lock:
+            return self.pending - self.running
+
+    # Queue job(*args); returns False when the queue is full
+    def submit(self, job, *args):
+        with self.lock:
+            if self.pending >= self.max_workers + self.max_queue:
+                self.rejected += 1
+                return False
+            self.pending += 1
+        self.executor.submit(self._run, job, args)
+        return True
+
+    def _run(self, job, args):
+        with self.lock:
+            self.running += 1
+        try:
+            job(*args)
+            with self.lock:
+                self.completed += 1
+        except Exception as e:
+            print(f"Statement job failed: {e}")
+            with self.lock:
+                self.failed += 1
+        finally:
+            with self.lock:
+                self.running -= 1
+                self.pending -= 1
+
+    def stats(self):
+        with self.lock:
+            return {
+                'queue_depth': self.pending - self.running,
+                'running': self.running,
+                'completed': self.completed,
+                'failed': self.failed,
+                'rejected': self.rejected,
+                'max_workers': self.max_workers,
+                'max_queue': self.max_queue,
+            }
@@ -0,0 +1,76 @@
+import time
+import threading
+from backoff import sheets_backoff
+
+# Title -> worksheet lookup built from a single spreadsheet metadata fetch.
+# spreadsheet.worksheet(name) re-downloads the metadata of every tab on each
+# call; with hundreds of firm tabs that is one large read per firm. The index
+# keeps the sheetId and grid size of every tab and is updated in place when
+# worksheets are added through it.
+class WorksheetIndex:
+    def __init__(self, spreadsheet, refresh_after=None):
+        self.spreadsheet = spreadsheet
+        # On a miss, re-fetch the metadata if the index is older than this many
+        # seconds. None never re-fetches, which suits a single upload run.
+        self.refresh_after = refresh_after
+        self.lock = threading.Lock()
+        self.refresh()
+
+    # One metadata fetch for every tab in the spreadsheet
+    def refresh(self):
+        worksheets = sheets_backoff.read(self.spreadsheet.worksheets)
+        with self.lock:
+            self.by_title = {ws.title: ws for ws in worksheets}
+            self.refreshed_at = time.monotonic()
+
+    def _lookup(self, title):
+        with self.lock:
+            ws = self.by_title.get(title)
+            stale = (self.refresh_after is not None
+                     and time.monotonic() - self.refreshed_at > self.refresh_after)
+        if ws is None and stale:
+            self.refresh()
+            with self.lock:
+                ws = self.by_title.get(title)
+        return ws
+
+    def __contains__(self, title):
+        return self._lookup(title) is not None
+
+    def __len__(self):
+        return len(self.by_title)
+
+    def titles(self):
+        with self.lock:
+            return list(self.by_title)
+
+    def get(self, title):
+        return self._lookup(title)
+
+    # Drop-in for spreadsheet.worksheet(title)
+    def worksheet(self, title):
+        ws = self._lookup(title)
+        if ws is None:
+            # Imported here so the index can be loaded without gspread
+            import gspread
+            raise gspread.WorksheetNotFound(title)
+        return ws
+
+    def sheet_id(self, title):
+        return self.worksheet(title).id
+
+    # (rows, cols) of the worksheet grid
+    def grid_size(self, title):
+        ws = self.worksheet(title)
+        return ws.row_count, ws.col_count
+
+    # Record a worksheet created elsewhere during the run
+    def add(self, worksheet):
+        with self.lock:
+            self.by_title[worksheet.title] = worksheet
+        return worksheet
+
+    # Drop-in for spreadsheet.add_worksheet that keeps the index current
+    def add_worksheet(self, title, rows, cols):
+        worksheet = sheets_backoff.write(self.spreadsheet.add_worksheet, title=title, rows=rows, cols=cols)
+        return self.add(worksheet)